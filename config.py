@@ -1,5 +1,4 @@
 import os
-from flask import Flask
 import sys
 
 # 호스트의 주소사용
@@ -13,9 +12,44 @@ TEMPLATES = os.path.join(PROJECT_ROOT, 'droneapp/templates')
 STATIC_FOLDER = os.path.join(PROJECT_ROOT, 'droneapp/static')
 DEBUG = False
 LOG_FILE = 'pytell.log'
+# 같은 곳(파일, 줄)에서 1초에 남길 수 있는 log 수 (넘는 log는 버리고 버린 수를 다음 log에 적는다, 0이면 제한 없음)
+LOG_RATE = 10
 
+# 영상 decoder 선택 : 'ffmpeg' (subprocess + pipe) 또는 'pyav' (프로세스 내부, pip install av 필요)
+VIDEO_DECODER = 'ffmpeg'
 
-app = Flask(__name__, template_folder= TEMPLATES, static_folder= STATIC_FOLDER)
+# 0보다 크면 얼굴인식과 영상의 얼굴 그리기, JPEG 인코딩을 이 수만큼의 프로세스에서 실행한다. (shared memory로 frame 전달)
+# 0이면 하나의 스레드에서 실행한다.
+VIDEO_PROCESS_WORKERS = 0
 
-if DEBUG:
-    app.debug = DEBUG
+# 얼굴인식 방법 선택 : 'haar' (Haar cascade) 또는 'dnn' (OpenCV DNN, 모델 파일은 face_detector.py 참고)
+FACE_DETECTOR = 'haar'
+# 얼굴인식 클래스의 인자 (ex : {'threads': 2, 'input_size': (300, 300), 'confidence': 0.5})
+FACE_DETECTOR_OPTIONS = {}
+
+# 영상 녹화본(H.264 segment와 index)을 저장할 폴더
+RECORD_DIRECTORY = os.path.join(PROJECT_ROOT, 'recordings')
+
+# 여러 대의 드론을 사용할 때 드론 id와 DroneManager의 인자 (드론마다 host_port, state_port, video_port가 달라야 한다)
+# ex : {'tello1': {'host_ip': '192.168.10.2', 'drone_ip': '192.168.10.1', 'host_port': 8889}}
+FLEET_DRONES = {}
+
+_app = None
+
+
+# Flask app은 처음 사용할 때 만든다. (config만 import하는 드론 / tools 코드는 Flask를 읽지 않는다)
+def get_app():
+    global _app
+    if _app is None:
+        from flask import Flask
+        _app = Flask(__name__, template_folder= TEMPLATES, static_folder= STATIC_FOLDER)
+        if DEBUG:
+            _app.debug = DEBUG
+    return _app
+
+
+# 예전처럼 config.app 으로 사용할 수 있도록 한다.
+def __getattr__(name):
+    if name == 'app':
+        return get_app()
+    raise AttributeError(f'module {__name__} has no attribute {name}')
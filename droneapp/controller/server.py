@@ -1,4 +1,8 @@
+from concurrent.futures import Future
 import logging
+import os
+import threading
+import time
 
 from flask import jsonify
 from flask import render_template
@@ -6,17 +10,30 @@ from flask import request
 from flask import Response
 
 import droneapp.models.course
-from droneapp.models.drone_manager import DroneManager
+import droneapp.models.course_simulator
+import droneapp.models.shake_channel
+from droneapp.models.drone_state import DEFAULT_HISTORY_POINTS
+from droneapp.models.fleet import ErrorUnknownDrone
+from droneapp.models.fleet import FleetManager
+from droneapp.models import metrics
+from droneapp.models.video_broadcaster import make_profile
 
 import config
 
 
 logger = logging.getLogger(__name__)
-app = config.app
+app = config.get_app()
 
-# DroneManager를 들고오기 위한 함수
-def get_drone():
-    return DroneManager()
+# 서버를 실행할 때 백그라운드에서 드론을 준비한 결과 (웹 서버는 기다리지 않고 바로 실행된다)
+_startup = Future()
+
+# 여러 대의 드론을 관리하는 FleetManager를 들고오기 위한 함수
+def get_fleet():
+    return FleetManager()
+
+# DroneManager를 들고오기 위한 함수 (drone_id가 없다면 기본 드론)
+def get_drone(drone_id = None):
+    return get_fleet().get(drone_id)
 
 
 # Home 화면
@@ -37,8 +54,11 @@ def command():
     cmd = request.form.get('command')
     logger.info({'action' : 'command', 'cmd' : cmd})
     
-    # 입력받은 명령어에 따라 드론의 움직임을 제어(Web)
-    drone = get_drone()
+    # 입력받은 명령어에 따라 드론의 움직임을 제어(Web), drone 값으로 제어할 드론을 선택한다.
+    try:
+        drone = get_drone(request.form.get('drone'))
+    except ErrorUnknownDrone as ex:
+        return jsonify(status='unknown drone', drone=str(ex)), 404
     if cmd == 'takeoff':
         drone.takeoff()
     if cmd == 'land':
@@ -54,7 +74,7 @@ def command():
     if cmd == 'clockwise':
         drone.clockwise()
     if cmd == 'counterclockwise':
-        drone.counter_clockwise
+        drone.counter_clockwise()
     if cmd == 'left':
         drone.left()
     if cmd == 'right':
@@ -71,6 +91,10 @@ def command():
         drone.patrol()
     if cmd == 'stopPatrol':
         drone.stop_patrol()
+    if cmd == 'faceDetectAndTrack':
+        drone.enable_face_detect()
+    if cmd == 'stopFaceDetectAndTrack':
+        drone.disable_face_detect()
 
     # cmd가 speed인 경우 speed 값을 받아서 해당 값을 같이 보여준다.
     if cmd == 'speed':
@@ -82,58 +106,300 @@ def command():
             drone.set_speed(int(speed))
     return jsonify(status='sucess'), 200
 
+# 등록된 드론들의 주소와 명령어 queue 상태
+@app.route('/api/fleet/')
+def fleet():
+    return jsonify(get_fleet().stats()), 200
+
+# 같은 명령어를 여러 대의 드론에 동시에 보내고 드론마다 응답과 걸린 시간을 돌려준다.
+# drones=tello1,tello2 와 같이 일부 드론만 선택할 수 있다. (없다면 모든 드론)
+@app.route('/api/fleet/command', methods=['POST'])
+def fleet_command():
+    cmd = request.form.get('command')
+    if not cmd:
+        return jsonify(status='no command'), 400
+    drones = request.form.get('drones')
+    drone_ids = drones.split(',') if drones else None
+    try:
+        results = get_fleet().fan_out(cmd, drone_ids)
+    except ErrorUnknownDrone as ex:
+        return jsonify(status='unknown drone', drone=str(ex)), 404
+    return jsonify(results), 200
+
 # Flask를 이용하여 웹을 사용할때 필요한 경우, 해당 웹 주소와 port를 config.py 클래스에서 지정
 
-def video_generator():
-    drone = get_drone()
-    for jpeg in drone.video_jpeg_generator():
+def video_generator(profile, drone):
+    # 시청자마다 인코딩하지 않고 broadcaster가 인코딩한 JPEG를 나누어 받는다.
+    # yield한 뒤 다시 돌아올 때까지가 시청자에게 frame을 보내는(client_write) 시간이다.
+    timer = drone.stage_timer('client_write')
+    for jpeg in drone.video_broadcaster.stream(profile):
+        start = time.perf_counter()
         yield (b'--frame\r\n'
                b'Content-Type: image/jpeg\r\n\r\n' +
                jpeg + 
                b'\r\n\r\n')
+        timer.observe(time.perf_counter() - start)
 
 # x-mixed-replace : HTTP에서 streaming을 하기 위한 방법
+# ?q=60&scale=0.5 와 같이 시청자마다 JPEG 품질과 크기를 정할 수 있다. (drone=tello1 로 드론 선택)
 @app.route('/video/streaming')
 def video_feed():
-    return Response(None, mimetype='multipart/x-mixed-replace; boundary=frame')
+    try:
+        profile = make_profile(request.args.get('q'), request.args.get('scale'))
+        drone = get_drone(request.args.get('drone'))
+    except ValueError:
+        return jsonify(status='invalid profile'), 400
+    except ErrorUnknownDrone as ex:
+        return jsonify(status='unknown drone', drone=str(ex)), 404
+    return Response(video_generator(profile, drone), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+# Prometheus가 읽어가는 명령어 왕복시간, 영상 단계별 시간, 버려진 frame 수와 queue 길이
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.REGISTRY.render(), mimetype=metrics.CONTENT_TYPE)
+
+# 시청자별 품질과 버려진 frame 수
+@app.route('/api/video/stats')
+def video_stats():
+    drone = get_drone()
+    stats = drone.video_broadcaster.stats()
+    stats['ingest'] = drone.video_ingest.stats()
+    return jsonify(stats), 200
+
+# 영상 녹화 : action=start (name이 없다면 현재 시간으로 저장) / action=stop, GET은 녹화 상태
+@app.route('/api/video/record', methods=['GET', 'POST'])
+def video_record():
+    drone = get_drone(request.values.get('drone'))
+    if request.method == 'POST':
+        action = request.form.get('action', 'start')
+        if action == 'start':
+            name = request.form.get('name')
+            directory = os.path.join(config.RECORD_DIRECTORY, os.path.basename(name)) if name else None
+            drone.start_recording(directory)
+        elif action == 'stop':
+            return jsonify(drone.stop_recording()), 200
+        else:
+            return jsonify(status='unknown action'), 400
+    recorder = drone.video_recorder
+    return jsonify(recorder.stats() if recorder else {'recording': False}), 200
+
+# 녹화본(config.RECORD_DIRECTORY/name)을 드론의 영상 대신 재생한다.
+# action=start (realtime=0이면 최대한 빠르게, start=초, loop=1) / action=seek (seconds) / action=stop
+@app.route('/api/video/replay', methods=['GET', 'POST'])
+def video_replay():
+    drone = get_drone(request.values.get('drone'))
+    if request.method == 'POST':
+        action = request.form.get('action', 'start')
+        try:
+            if action == 'start':
+                name = os.path.basename(request.form.get('name', ''))
+                drone.start_replay(os.path.join(config.RECORD_DIRECTORY, name),
+                                   realtime = request.form.get('realtime', '1') == '1',
+                                   start = float(request.form.get('start', 0)),
+                                   loop = request.form.get('loop') == '1')
+            elif action == 'seek' and drone.video_replay is not None:
+                drone.video_replay.seek(float(request.form.get('seconds', 0)))
+            elif action == 'stop':
+                drone.stop_replay()
+            else:
+                return jsonify(status='unknown action'), 400
+        except (OSError, ValueError) as ex:
+            return jsonify(status='error', error=str(ex)), 400
+    replay = drone.video_replay
+    return jsonify(replay.stats() if replay else {'running': False}), 200
+
+# 드론의 가장 최근 state (배터리, 자세, 높이, 속도, 온도 등)
+@app.route('/api/state')
+def state():
+    return jsonify(get_drone().state.latest()), 200
+
+# 최근 seconds초 동안의 state를 points개 이하로 줄여서 돌려준다. (fields=bat,h 와 같이 선택 가능)
+@app.route('/api/state/history')
+def state_history():
+    fields = request.args.get('fields')
+    if fields:
+        fields = fields.split(',')
+    try:
+        seconds = request.args.get('seconds')
+        seconds = float(seconds) if seconds is not None else None
+        points = int(request.args.get('points', DEFAULT_HISTORY_POINTS))
+        history = get_drone().state.history(seconds, points, fields)
+    except ValueError as ex:
+        return jsonify(error=str(ex)), 400
+    return jsonify(history), 200
+
+# 얼굴인식의 실행 주기와 한번 실행할때 걸리는 시간을 확인하고, POST로 rate(Hz)를 조절한다.
+# track=1 이라면 interval frame마다 얼굴인식을 하고 그 사이에는 얼굴을 추적한다.
+# follow에는 rc 명령어를 보낸 수, 얼굴인식 결과의 지연(ms), 축별 오차와 마지막 rc 값이 들어있다.
+@app.route('/api/face_detect/', methods=['GET', 'POST'])
+def face_detect():
+    drone = get_drone()
+    if request.method == 'POST':
+        rate = request.form.get('rate')
+        if rate:
+            drone.face_detection.set_rate(rate)
+        track = request.form.get('track')
+        if track is not None:
+            drone.set_face_tracking(track == '1', request.form.get('interval'))
+    stats = drone.face_detection.stats()
+    stats['tracking'] = drone.is_face_tracking
+    stats['tracker'] = drone.face_tracker.stats()
+    stats['follow'] = drone.face_follow.stats()
+    return jsonify(stats), 200
+
+# 이름으로 등록된 미션(patrol, panorama, dronie)을 실행하거나(POST name, loops) 멈추고(POST action=stop)
+# 단계별로 명령어를 보낸 시간과 응답까지 걸린 시간을 확인한다.
+@app.route('/api/mission/', methods=['GET', 'POST'])
+def mission():
+    drone = get_drone()
+    if request.method == 'POST':
+        if request.form.get('action') == 'stop':
+            drone.stop_mission()
+        else:
+            loops = request.form.get('loops', '1')
+            try:
+                drone.start_mission(request.form.get('name'), loops = int(loops) if loops else None)
+            except ValueError as ex:
+                return jsonify(error=str(ex)), 400
+    if drone.mission is None:
+        return jsonify(running=False), 200
+    return jsonify(drone.mission.stats()), 200
+
+# 드론(socket, 명령어 스레드, decoder, Haar XML)을 백그라운드에서 준비한다.
+def warm_up():
+    try:
+        get_drone()
+        _startup.set_result(True)
+    except Exception as ex:
+        logger.error({'action' : 'warm_up', 'ex' : ex})
+        _startup.set_exception(ex)
+
+# 구성요소별 준비 상태. 모두 준비되었다면 200, 아니라면 503
+@app.route('/health')
+def health():
+    if not _startup.done():
+        return jsonify(status='starting'), 503
+    if _startup.exception() is not None:
+        return jsonify(status='error', error=str(_startup.exception())), 503
+    drones = get_fleet().health()
+    if all(drone['ready'] for drone in drones.values()):
+        return jsonify(status='ready', drones=drones), 200
+    is_error = any(status == 'error' for drone in drones.values() for status in drone['components'].values())
+    return jsonify(status='degraded' if is_error else 'starting', drones=drones), 503
 
 # flask 실행을 위해 필요한 함수.
 def run():
+    thread = threading.Thread(target=warm_up)
+    thread.daemon = True
+    thread.start()
     app.run(host=config.WEB_ADDRESS, port=config.WEB_PORT, threaded=True)
 
-# 코스를 들고오는 함수
+# 코스를 들고오는 함수 (course_id가 있다면 해당 코스 하나, 없는 id라면 None)
 def get_courses(course_id = None):
     drone = get_drone()
     courses = droneapp.models.course.get_courses(drone)
-    if course_id:
+    if course_id is not None:
         return courses.get(course_id)
     return courses
 
 @app.route('/games/shake/')
 def game_shake():
     courses = get_courses()
-    return render_template('game/shake.html', courses = courses)
+    return render_template('games/shake.html', courses = courses)
+
+# shake를 모아서 코스를 진행시키고 상태를 알려주는 channel을 들고오는 함수 (코스마다 하나)
+def get_shake_channel(course_id):
+    try:
+        course = get_courses(int(course_id))
+    except (TypeError, ValueError):
+        return None
+    # 코스 하나를 찾지 못했다면 channel을 만들지 않는다. (404)
+    if not isinstance(course, droneapp.models.course.BaseCourse):
+        return None
+    return droneapp.models.shake_channel.ShakeChannel(course)
 
-@app.route('/api/shake/start', method=['GET','POST'])
+@app.route('/api/shake/start', methods=['GET','POST'])
 def shake_start():
-    course_id = request.args.get('id')
-    # post로 할때는 form을 사용한다.
-    # course_id = request.form.get('id) 
+    # GET은 args, POST는 form으로 id를 받는다.
+    course_id = request.values.get('id')
+    channel = get_shake_channel(course_id)
+    if channel is None:
+        return jsonify(error=f'Unknown course {course_id}'), 404
 
-    course = get_courses(int(course_id))
-    course.start()
+    # mode=timed라면 shake 없이 코스에 정해진 시간(Step.at)에 따라, paced라면 응답을 받는 즉시 다음 단계를 주행한다.
+    # 진행 상태는 shake와 같이 channel의 stream으로 알린다. 이미 진행중인 runner가 있다면 새로 시작하지 않는다.
+    mode = request.values.get('mode')
+    if mode in ('timed', 'paced'):
+        status = channel.start_timed(paced = (mode == 'paced'))
+    else:
+        status = channel.start()
+    if status is None:
+        return jsonify(error='Course is already running', status=channel.latest()[1]), 409
     return jsonify(result='started'), 200
 
-@app.route('/api/shake/run', method=['GET','POST'])
+@app.route('/api/shake/stop', methods=['GET','POST'])
+def shake_stop():
+    course_id = request.values.get('id')
+    channel = get_shake_channel(course_id)
+    if channel is None:
+        return jsonify(error=f'Unknown course {course_id}'), 404
+    return jsonify(result='stopped', status=channel.stop()), 200
+
+# 드론 없이 가상의 시간으로 코스를 끝까지 실행해본 결과 (mode=timed, paced or shake)
+@app.route('/api/shake/simulate')
+def shake_simulate():
+    course_id = request.args.get('id')
+    mode = request.args.get('mode', 'timed')
+    try:
+        course = get_courses(int(course_id))
+    except (TypeError, ValueError):
+        return jsonify(error='id must be an integer'), 400
+    if course is None:
+        return jsonify(error=f'Unknown course {course_id}'), 404
+    try:
+        result = droneapp.models.course_simulator.simulate_course(type(course), mode)
+    except ValueError as ex:
+        return jsonify(error=str(ex)), 400
+    return jsonify(result), 200
+
+# shake 한번마다 요청하는 예전 방식 (events와 같은 channel을 사용한다)
+@app.route('/api/shake/run', methods=['GET','POST'])
 def shake_run():
-    # course_id = request.args.get('id')
-    # post로 할때는 form을 사용한다.
-    course_id = request.form.get('id') 
-
-    course = get_courses(int(course_id))
-    course.run()
-    return jsonify(
-        elapsed = course.elapsed,
-        status = course.status,
-        running = course.is_running), 200
+    course_id = request.values.get('id')
+    channel = get_shake_channel(course_id)
+    if channel is None:
+        return jsonify(error=f'Unknown course {course_id}'), 404
+    status = channel.push(request.values.get('client', request.remote_addr))
+    return jsonify(status), 200
+
+# 참가자가 모아둔 여러번의 shake(count)를 한번에 보낸다. 너무 빠른 shake는 서버에서 버린다.
+@app.route('/api/shake/events', methods=['POST'])
+def shake_events():
+    course_id = request.values.get('id')
+    channel = get_shake_channel(course_id)
+    if channel is None:
+        return jsonify(error=f'Unknown course {course_id}'), 404
+    try:
+        count = int(request.values.get('count', 1))
+    except ValueError:
+        return jsonify(error='count must be an integer'), 400
+    status = channel.push(request.values.get('client', request.remote_addr), count)
+    return jsonify(status), 200
+
+# 코스의 상태(elapsed, status, running)가 바뀔 때마다 Server-Sent Events로 보내준다.
+@app.route('/api/shake/stream')
+def shake_stream():
+    course_id = request.args.get('id')
+    channel = get_shake_channel(course_id)
+    if channel is None:
+        return jsonify(error=f'Unknown course {course_id}'), 404
+    return Response(channel.stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/shake/stats')
+def shake_stats():
+    channel = get_shake_channel(request.args.get('id'))
+    if channel is None:
+        return jsonify(error='Unknown course'), 404
+    return jsonify(channel.stats()), 200
 
@@ -0,0 +1,282 @@
+import asyncio
+import logging
+
+import config
+from droneapp.models.command_dispatcher import SAFETY_COMMANDS
+from droneapp.models.command_dispatcher import command_name
+from droneapp.models.drone_manager import command_retry
+from droneapp.models.drone_manager import command_timeout
+from droneapp.models.drone_manager import DEFAULT_DEGREE
+from droneapp.models.drone_manager import DEFAULT_DISTANCE
+from droneapp.models.drone_manager import DEFAULT_SPEED
+from droneapp.models.drone_manager import DroneManager
+from droneapp.models.drone_manager import FRAME_SHAPE
+from droneapp.models.drone_manager import FRAME_X
+from droneapp.models.drone_manager import FRAME_Y
+from droneapp.models.drone_state import DroneStateBuffer
+from droneapp.models.frame_buffer import FrameRingBuffer
+from droneapp.models.video_broadcaster import DEFAULT_JPEG_QUALITY
+from droneapp.models.video_decoder import create_video_decoder
+from droneapp.models.video_ingest import H264FrameAssembler
+
+logger = logging.getLogger(__name__)
+
+
+# 드론이 보내는 datagram을 받아 manager의 함수로 넘겨주는 protocol
+class _DroneProtocol(asyncio.DatagramProtocol):
+    def __init__(self, on_datagram):
+        self._on_datagram = on_datagram
+
+    def datagram_received(self, data, addr):
+        self._on_datagram(data)
+
+    def error_received(self, exc):
+        logger.warning({'action': 'error_received', 'ex': exc})
+
+
+# 스레드 없이 하나의 event loop에서 드론을 제어하기 위한 DroneManager의 asyncio 버전
+# 여러 대의 드론과 여러명의 시청자를 하나의 event loop에서 처리할 수 있도록 Singletone이 아니다.
+#
+#   async with AsyncDroneManager(...) as drone:
+#       await drone.takeoff()
+#       async for sequence, frame in drone.frames():
+#           ...
+class AsyncDroneManager(object):
+    def __init__(self, host_ip='192.168.10.2', host_port=8889,
+                 drone_ip='192.168.10.1', drone_port=8889,
+                 is_imperial=False, speed=DEFAULT_SPEED,
+                 state_port=8890, video_port=11111, video_decoder=config.VIDEO_DECODER):
+        self.host_ip = host_ip
+        self.host_port = host_port
+        self.drone_address = (drone_ip, drone_port)
+        self.is_imperial = is_imperial
+        self.speed = speed
+        self.state_port = state_port
+        self.video_port = video_port
+
+        self.state = DroneStateBuffer()
+        self.frame_buffer = FrameRingBuffer(FRAME_SHAPE)
+        self.video_ingest = H264FrameAssembler()
+        self._video_decoder_name = video_decoder
+        self.video_decoder = None
+
+        self._loop = None
+        self._transports = []
+        self._command_transport = None
+        self._command_lock = None
+        self._pending_response = None
+        self._frame_event = None
+        # frame_buffer에 등록한 listener (stop에서 지운다)
+        self._frame_listener = None
+        self._video_data = bytearray()
+        self._video_data_event = None
+        self._video_task = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    # socket을 열고 드론을 SDK 모드로 바꾼 뒤 영상을 켠다.
+    async def start(self, video=True):
+        self._loop = asyncio.get_running_loop()
+        self._command_lock = asyncio.Lock()
+        self._frame_event = asyncio.Event()
+
+        self._command_transport, _ = await self._loop.create_datagram_endpoint(
+            lambda: _DroneProtocol(self._on_response),
+            local_addr=(self.host_ip, self.host_port))
+        self._transports.append(self._command_transport)
+
+        state_transport, _ = await self._loop.create_datagram_endpoint(
+            lambda: _DroneProtocol(lambda data: self.state.append(data)),
+            local_addr=(self.host_ip, self.state_port))
+        self._transports.append(state_transport)
+
+        await self.send_command('command')
+        if video:
+            await self.start_video()
+        await self.set_speed(self.speed)
+
+    async def start_video(self):
+        self.video_decoder = create_video_decoder(self._video_decoder_name, FRAME_X, FRAME_Y)
+        self.video_decoder.start(self.frame_buffer)
+        # decoder는 다른 스레드에서 frame을 만들 수 있기 때문에 event loop에 안전하게 알린다.
+        self._remove_frame_listener()
+        self._frame_listener = lambda sequence: self._loop.call_soon_threadsafe(self._on_frame)
+        self.frame_buffer.add_listener(self._frame_listener)
+        self._video_data_event = asyncio.Event()
+        self._video_task = self._loop.create_task(self._decode_video())
+
+        video_transport, _ = await self._loop.create_datagram_endpoint(
+            lambda: _DroneProtocol(self._on_video),
+            local_addr=(self.host_ip, self.video_port))
+        self._transports.append(video_transport)
+        return await self.send_command('streamon')
+
+    def _remove_frame_listener(self):
+        if self._frame_listener is not None:
+            self.frame_buffer.remove_listener(self._frame_listener)
+            self._frame_listener = None
+
+    async def stop(self):
+        # event loop가 닫힌 뒤에 decoder 스레드가 call_soon_threadsafe를 부르지 않도록 먼저 지운다.
+        self._remove_frame_listener()
+        if self._video_task is not None:
+            self._video_task.cancel()
+            try:
+                await self._video_task
+            except asyncio.CancelledError:
+                pass
+        for transport in self._transports:
+            transport.close()
+        self._transports = []
+        if self.video_decoder is not None:
+            self.video_decoder.stop()
+
+    def _on_response(self, data):
+        future = self._pending_response
+        self._pending_response = None
+        if future is None or future.done():
+            logger.warning({'action': 'receive_response', 'response': data, 'status': 'unexpected'})
+            return
+        future.set_result(data.decode('utf-8', errors='replace'))
+
+    # 명령어를 보내고 응답(문자열 or None)을 기다린다. 명령어는 한번에 하나씩만 보내고,
+    # land / emergency는 응답을 기다리고 있는 명령어를 중단시키고 먼저 보낸다.
+    # 움직이는 명령어는 응답이 늦어도 다시 보내지 않는다. (DroneManager와 같다)
+    async def send_command(self, command, timeout=None, retry=None):
+        if command_name(command) in SAFETY_COMMANDS:
+            self._preempt_command()
+        if timeout is None:
+            timeout = command_timeout(command, self.speed)
+        if retry is None:
+            retry = command_retry(command)
+
+        async with self._command_lock:
+            logger.info({'action': 'send_command', 'command': command})
+            for attempt in range(retry + 1):
+                future = self._loop.create_future()
+                self._pending_response = future
+                self._command_transport.sendto(command.encode('utf-8'), self.drone_address)
+                try:
+                    return await asyncio.wait_for(future, timeout)
+                except asyncio.TimeoutError:
+                    logger.warning({'action': 'send_command', 'command': command,
+                                    'status': 'timeout', 'attempt': attempt})
+                finally:
+                    if self._pending_response is future:
+                        self._pending_response = None
+            return None
+
+    def _preempt_command(self):
+        future = self._pending_response
+        self._pending_response = None
+        if future is not None and not future.done():
+            logger.warning({'action': 'send_command', 'status': 'preempted'})
+            future.set_result(None)
+
+    # 응답이 없는 rc 명령어는 기다리지 않고 바로 보낸다.
+    def rc(self, left_right, forward_back, up_down, yaw):
+        command = f'rc {int(left_right)} {int(forward_back)} {int(up_down)} {int(yaw)}'
+        self._command_transport.sendto(command.encode('utf-8'), self.drone_address)
+
+    async def takeoff(self):
+        return await self.send_command('takeoff')
+
+    async def land(self):
+        return await self.send_command('land')
+
+    async def emergency(self):
+        return await self.send_command('emergency')
+
+    async def move(self, direction, distance):
+        distance = float(distance)
+        if self.is_imperial:
+            distance = int(round(distance * 30.48))
+        else:
+            distance = int(round(distance * 100))
+        return await self.send_command(f'{direction} {distance}')
+
+    async def up(self, distance=DEFAULT_DISTANCE):
+        return await self.move('up', distance)
+
+    async def down(self, distance=DEFAULT_DISTANCE):
+        return await self.move('down', distance)
+
+    async def left(self, distance=DEFAULT_DISTANCE):
+        return await self.move('left', distance)
+
+    async def right(self, distance=DEFAULT_DISTANCE):
+        return await self.move('right', distance)
+
+    async def forward(self, distance=DEFAULT_DISTANCE):
+        return await self.move('forward', distance)
+
+    async def back(self, distance=DEFAULT_DISTANCE):
+        return await self.move('back', distance)
+
+    async def set_speed(self, speed):
+        self.speed = speed
+        return await self.send_command(f'speed {speed}')
+
+    async def clockwise(self, degree=DEFAULT_DEGREE):
+        return await self.send_command(f'cw {degree}')
+
+    async def counter_clockwise(self, degree=DEFAULT_DEGREE):
+        return await self.send_command(f'ccw {degree}')
+
+    async def flip_forward(self):
+        return await self.send_command('flip f')
+
+    async def flip_back(self):
+        return await self.send_command('flip b')
+
+    async def flip_right(self):
+        return await self.send_command('flip r')
+
+    async def flip_left(self):
+        return await self.send_command('flip l')
+
+    # 완성된 영상 frame들을 모아두고 decoder task를 깨운다.
+    def _on_video(self, data):
+        if self.video_ingest.feed(data, self._video_data):
+            self._video_data_event.set()
+
+    # decoder는 CPU를 사용하거나 pipe에서 멈출 수 있기 때문에 executor에서 실행한다.
+    async def _decode_video(self):
+        while True:
+            await self._video_data_event.wait()
+            self._video_data_event.clear()
+            data = bytes(self._video_data)
+            self._video_data.clear()
+            try:
+                await self._loop.run_in_executor(None, self.video_decoder.write, data)
+            except Exception as ex:
+                logger.error({'action': '_decode_video', 'ex': ex})
+                return
+            self.video_ingest.writes += 1
+
+    def _on_frame(self):
+        event = self._frame_event
+        self._frame_event = asyncio.Event()
+        event.set()
+
+    # 새로운 frame이 들어올 때마다 (sequence, frame view)를 돌려준다.
+    # 처리가 늦어지면 그 사이의 frame은 건너뛰며, task를 cancel하면 바로 종료된다.
+    async def frames(self):
+        sequence = 0
+        while True:
+            if self.frame_buffer.sequence <= sequence:
+                await self._frame_event.wait()
+                continue
+            sequence, frame = self.frame_buffer.latest()
+            yield sequence, frame
+
+    # frames()의 frame을 JPEG binary로 바꿔서 돌려준다. (인코딩은 executor에서 실행)
+    async def jpeg_frames(self, quality=DEFAULT_JPEG_QUALITY, scale=1.0):
+        async for sequence, frame in self.frames():
+            yield await self._loop.run_in_executor(
+                None, DroneManager.encode_jpeg, frame, quality, scale)
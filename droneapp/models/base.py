@@ -1,3 +1,5 @@
+import inspect
+import threading
 from typing import Any
 
 # 이 클래스를 사용한다면 한번 사용헀을 떄, 다시 호출하여도 이전에 생성된 클래스를 가르킨다.
@@ -10,4 +12,26 @@ class Singletone(type):
             print('call')
             cls._instances[cls] = super(Singletone, cls).__call__(*args, **kwargs)
         return cls._instances[cls]
-    
+
+
+# 같은 key(ex : 드론의 주소)로 호출한다면 이전에 생성된 클래스를 가르키고, 다른 key라면 새로 생성한다.
+# key로 사용할 인자의 이름은 클래스의 instance_key_arguments에 지정한다.
+class Multitone(type):
+
+    _instances = {}
+    _lock = threading.RLock()
+
+    def __call__(cls, *args: Any, **kwargs):
+        bound = inspect.signature(cls.__init__).bind(None, *args, **kwargs)
+        bound.apply_defaults()
+        key = (cls,) + tuple(bound.arguments[name] for name in cls.instance_key_arguments)
+        with Multitone._lock:
+            if key not in cls._instances:
+                cls._instances[key] = super(Multitone, cls).__call__(*args, **kwargs)
+            return cls._instances[key]
+
+    # key에 해당하는 클래스를 지운다. (다음 호출때 새로 생성된다)
+    def remove_instance(cls, *key):
+        with Multitone._lock:
+            return cls._instances.pop((cls,) + key, None)
+
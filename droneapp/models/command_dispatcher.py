@@ -0,0 +1,210 @@
+from concurrent.futures import Future
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+from droneapp.models.log_pipeline import LogThrottle
+
+logger = logging.getLogger(__name__)
+
+# 숫자가 작을수록 먼저 실행된다.
+PRIORITY_SAFETY = 0
+PRIORITY_NORMAL = 1
+
+# 다른 명령어보다 먼저 실행되고, 응답을 기다리고 있는 명령어를 중단시키는 명령어
+SAFETY_COMMANDS = ('emergency', 'land')
+
+# 아직 보내지 않은 같은 명령어가 있다면 가장 최근 것만 남기는 명령어 (ex : 얼굴추적의 go)
+COALESCE_COMMANDS = ('go', 'rc')
+
+# queue에 쌓아둘 수 있는 최대 명령어 수 (넘으면 일반 명령어는 버린다)
+DEFAULT_MAX_QUEUE_SIZE = 32
+
+
+def command_name(command):
+    return command.split(' ', 1)[0]
+
+
+# queue에 들어가 있는 명령어 하나
+class _Entry(object):
+    __slots__ = ('priority', 'sequence', 'command', 'future', 'submit_time', 'is_alive', 'is_preempted')
+
+    def __init__(self, priority, sequence, command, future):
+        self.priority = priority
+        self.sequence = sequence
+        self.command = command
+        self.future = future
+        self.submit_time = time.monotonic()
+        self.is_alive = True
+        # land / emergency가 들어와서 중단해야 하는 명령어
+        self.is_preempted = False
+
+    def __lt__(self, other):
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+
+# 하나의 스레드가 priority queue에서 명령어를 꺼내 순서대로 드론에 보내는 클래스
+class CommandDispatcher(object):
+    def __init__(self, execute, preempt=None, maxsize=DEFAULT_MAX_QUEUE_SIZE):
+        # 명령어를 받아 드론에 보내고 응답을 돌려주는 함수 (ex : DroneManager._send_command)
+        self._execute = execute
+        # 응답을 기다리고 있는 명령어를 중단시키는 함수
+        self._preempt = preempt
+        self.maxsize = maxsize
+
+        self._queue = []
+        # queue에 들어있는 명령어 중 아직 버려지지 않은 명령어의 수
+        self._alive = 0
+        self._coalesce = {}
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._is_executing = False
+        self._current = None
+
+        # 관찰을 위한 값
+        self.executed = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_depth = 0
+        self.wait_ms_avg = None
+        self.wait_ms_max = 0.0
+        self._log_drop = LogThrottle()
+
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    @property
+    def depth(self):
+        return self._alive
+
+    # 실행중인 명령어가 land / emergency로 중단되었는지. 실행하는 함수(dispatcher 스레드)에서 보내기 전에 확인한다.
+    # 명령어를 꺼낸 뒤 응답을 기다리기 전에 중단되었다면 preempt가 중단시킬 것이 없기 때문에 이 값으로 알린다.
+    @property
+    def is_preempted(self):
+        current = self._current
+        return current is not None and current.is_preempted and threading.current_thread() is self._thread
+
+    # 명령어를 queue에 넣고 결과(응답 문자열 or None)를 받을 수 있는 Future를 돌려준다.
+    # blocking이 False라면 다른 명령어가 실행중이거나 기다리고 있을 때 바로 버린다.
+    def submit(self, command, blocking=True):
+        future = Future()
+        name = command_name(command)
+        is_safety = name in SAFETY_COMMANDS
+        priority = PRIORITY_SAFETY if is_safety else PRIORITY_NORMAL
+        preempted = None
+
+        with self._condition:
+            if not is_safety:
+                if not blocking and (self._is_executing or self._alive):
+                    return self._drop(future, command, 'busy')
+                if self._alive >= self.maxsize and name not in self._coalesce:
+                    return self._drop(future, command, 'queue_full')
+
+            entry = _Entry(priority, next(self._sequence), command, future)
+            if name in COALESCE_COMMANDS:
+                # 아직 보내지 않은 같은 명령어는 새로운 명령어로 대신한다.
+                old = self._coalesce.get(name)
+                if old is not None and old.is_alive:
+                    old.is_alive = False
+                    old.future.set_result(None)
+                    self._alive -= 1
+                    self.coalesced += 1
+                self._coalesce[name] = entry
+
+            # 버려진 명령어가 너무 많이 쌓였다면 queue를 다시 만든다.
+            if len(self._queue) > self.maxsize * 2:
+                self._queue = [old for old in self._queue if old.is_alive]
+                heapq.heapify(self._queue)
+            heapq.heappush(self._queue, entry)
+            self._alive += 1
+            self.max_depth = max(self.max_depth, self._alive)
+            self._condition.notify()
+
+            # 실행중인 일반 명령어가 있다면 중단시키고 바로 land / emergency를 보낸다.
+            current = self._current
+            if is_safety and current is not None and current.priority != PRIORITY_SAFETY \
+                    and not current.is_preempted:
+                current.is_preempted = True
+                preempted = current
+
+        # preempt는 응답을 기다리는 lock을 잡기 때문에 condition을 놓고 호출한다. (lock 순서가 엇갈리지 않도록)
+        if preempted is not None and self._preempt is not None:
+            logger.warning({'action': 'submit', 'command': command, 'preempt': preempted.command})
+            self._preempt()
+        return future
+
+    def _drop(self, future, command, reason):
+        self.dropped += 1
+        # queue가 가득 찼을 때는 계속해서 버려지기 때문에 1초에 정해진 수만 남긴다.
+        if self._log_drop.allow():
+            logger.warning({'action': 'submit', 'command': command, 'status': reason},
+                           extra=self._log_drop.extra())
+        future.set_result(None)
+        return future
+
+    def _next_entry(self):
+        with self._condition:
+            while not self._stop_event.is_set():
+                while self._queue:
+                    entry = heapq.heappop(self._queue)
+                    if self._coalesce.get(command_name(entry.command)) is entry:
+                        del self._coalesce[command_name(entry.command)]
+                    if entry.is_alive:
+                        self._alive -= 1
+                        self._is_executing = True
+                        self._current = entry
+                        return entry
+                self._condition.wait(timeout=1)
+        return None
+
+    def _run(self):
+        while True:
+            entry = self._next_entry()
+            if entry is None:
+                return
+            self._record_wait(time.monotonic() - entry.submit_time)
+            try:
+                if entry.future.set_running_or_notify_cancel():
+                    entry.future.set_result(self._execute(entry.command))
+            except Exception as ex:
+                logger.error({'action': 'dispatch', 'command': entry.command, 'ex': ex})
+                entry.future.set_exception(ex)
+            finally:
+                with self._condition:
+                    self._is_executing = False
+                    self._current = None
+                    self.executed += 1
+
+    def _record_wait(self, wait):
+        wait_ms = wait * 1000
+        self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+        if self.wait_ms_avg is None:
+            self.wait_ms_avg = wait_ms
+        else:
+            self.wait_ms_avg += 0.1 * (wait_ms - self.wait_ms_avg)
+
+    def stop(self):
+        self._stop_event.set()
+        with self._condition:
+            for entry in self._queue:
+                if entry.is_alive:
+                    entry.future.set_result(None)
+            self._queue = []
+            self._alive = 0
+            self._coalesce = {}
+            self._condition.notify_all()
+
+    def stats(self):
+        return {
+            'depth': self.depth,
+            'max_depth': self.max_depth,
+            'executed': self.executed,
+            'dropped': self.dropped,
+            'coalesced': self.coalesced,
+            'wait_ms_avg': self.wait_ms_avg,
+            'wait_ms_max': self.wait_ms_max,
+        }
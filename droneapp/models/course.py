@@ -1,13 +1,52 @@
+import collections
 import logging
-import time
 
-from droneapp.models.base import Singletone
+from droneapp.models.base import Multitone
+from droneapp.models.mission import MissionRunner
+from droneapp.models.mission import RealClock
 
 logger = logging.getLogger(__name__)
 
-class BaseCourse(metaclass=Singletone):
+# 코스의 한 단계
+#   count : shake 횟수가 이 값이 되었을 때 실행 (shake로 진행할 때)
+#   at : 코스 시작 후 이 시간(초)이 되었을 때 실행 (시간으로 진행할 때)
+#   action, args : 드론에서 실행할 메소드와 인자 (ex : 'clockwise', (90,)), None이면 명령어를 보내지 않는다.
+#   elapsed : (min, max) 주행시간이 이 범위일 때만 실행
+#   jump_to : 실행한 뒤 shake 횟수를 이 값으로 바꾼다.
+#   end : 실행한 뒤 코스를 끝낸다.
+Step = collections.namedtuple('Step', ['count', 'at', 'action', 'args', 'elapsed', 'jump_to', 'end'])
+Step.__new__.__defaults__ = ((), None, None, False)
 
-    def __init__(self, name, drone):
+# jump_to가 계속 이어지는 잘못된 코스에서 무한 반복을 막기 위한 값
+MAX_JUMPS = 16
+
+
+# 코스의 단계들을 shake 횟수로 바로 찾을 수 있는 dict와 시간 순서로 정렬된 list로 만들어둔다.
+class CourseSchedule(object):
+    def __init__(self, steps):
+        self.steps = tuple(steps)
+        self._by_count = collections.defaultdict(list)
+        for step in self.steps:
+            if step.count is not None:
+                self._by_count[step.count].append(step)
+        self._by_count = {count: tuple(steps) for count, steps in self._by_count.items()}
+        self.timed_steps = tuple(sorted((step for step in self.steps if step.at is not None),
+                                        key=lambda step: step.at))
+        self.last_count = max(self._by_count) if self._by_count else 0
+
+    # shake 횟수에 해당하는 단계들 (O(1))
+    def steps_for(self, count):
+        return self._by_count.get(count, ())
+
+
+class BaseCourse(metaclass=Multitone):
+    # 드론마다 코스가 하나씩 생성된다.
+    instance_key_arguments = ('drone',)
+
+    # 코스를 구성하는 단계들 (Step의 tuple). 코스를 추가할 때는 이 값만 정의하면 된다.
+    steps = ()
+
+    def __init__(self, name, drone, clock=None):
         self.name = name
         self.status = 0
         # 코스에서 드론이 주행중에 있는지 확인하기 위한 변수
@@ -17,11 +56,21 @@ class BaseCourse(metaclass=Singletone):
         # 주행시간(소요시간)
         self.elapsed = None
         self.drone = drone
+        self.clock = clock or RealClock()
+        self.schedule = self.compile()
 
+    # 코스의 단계들은 클래스마다 한번만 schedule로 만든다.
+    @classmethod
+    def compile(cls):
+        if cls.__dict__.get('_schedule') is None:
+            cls._schedule = CourseSchedule(cls.steps)
+        return cls._schedule
 
     # 코스 주행이 시작된 경우
     def start(self):
-        self.start_time = time.time()
+        self.start_time = self.clock.time()
+        self.elapsed = 0.0
+        self.status = 0
         self.is_running = True
 
     # 코스 주행이 끝난 경우
@@ -35,64 +84,125 @@ class BaseCourse(metaclass=Singletone):
     def update_elapsed(self):
         if not self.is_running:
             return None
-        self.elapsed = time.time() - self.start_time
+        self.elapsed = self.clock.time() - self.start_time
         return self.elapsed
-    
-    # 코스 A or 코스 B와 같은 주행중 실행시키고 싶은 cmd가 overriding 될 부분 BaseCourse의 class인 경우에서는 틀만 잡아놓는다.
+
+    # 하나의 단계를 실행한다. 드론 메소드의 결과(Future 또는 응답)를 돌려준다.
+    def execute(self, step):
+        if step.elapsed is not None:
+            low, high = step.elapsed
+            if not (self.elapsed and low < self.elapsed < high):
+                return None
+        result = None
+        if step.action is not None:
+            logger.info({'action': 'execute', 'course': self.name, 'step': step.action,
+                         'status': self.status})
+            result = getattr(self.drone, step.action)(*step.args)
+        if step.jump_to is not None:
+            self.status = step.jump_to
+        if step.end:
+            self.stop()
+        return result
+
+    # 현재 shake 횟수(status)에 해당하는 단계들을 실행
     def _run(self):
-        raise NotImplemented
-    
+        for _ in range(MAX_JUMPS):
+            status = self.status
+            for step in self.schedule.steps_for(status):
+                self.execute(step)
+                if not self.is_running:
+                    return
+            # jump_to로 shake 횟수가 바뀌었다면 바뀐 횟수의 단계들도 이어서 실행한다.
+            if self.status == status:
+                return
+
     # 모바일 폰이 shake 이벤트를 감지한 경우 실행시킬 함수 해당 함수가 실행된다면 private 함수인 _run()을 실행시킴으로써 cmd를 보내준다.
     def run(self):
         if not self.is_running:
             return False
         self.status += 1
+        self.update_elapsed()
         self._run()
         self.update_elapsed()
 
+
 class CourseA(BaseCourse):
 
     # 코스 A로 주행할때 원하는 주행방법
-    def _run(self):
-        if self.status == 1:
-            self.drone.takeoff()
-        
-        if self.status == 10 or self.status == 15 or self.status == 20 or self.status == 25:
-            self.drone.clockwise(90)
-        
-        if self.status == 30:
-            self.drone.flip_forward()
-        
-        if self.status == 40:
-            self.drone.flip_back()
-        
-        if self.status == 50:
-            self.drone.land()
-            self.stop()
+    steps = (
+        Step(1, 0, 'takeoff'),
+        Step(10, 6, 'clockwise', (90,)),
+        Step(15, 8, 'clockwise', (90,)),
+        Step(20, 10, 'clockwise', (90,)),
+        Step(25, 12, 'clockwise', (90,)),
+        Step(30, 14, 'flip_forward'),
+        Step(40, 17, 'flip_back'),
+        Step(50, 20, 'land', end=True),
+    )
+
 
 class CourseB(BaseCourse):
 
-    # 코스 B로 주행할때 원하는 주행방법
-    def _run(self):
-        if self.status == 1:
-            self.drone.takeoff()
-        
-        if self.status == 10:
-            self.drone.flip_forward()
-            if self.elapsed and 10 < self.elapsed < 15:
-                self.status = 45
-        
-        if self.status == 30:
-            self.drone.flip_right()
-        if self.status == 45:
-            self.drone.flip_left()
-        
-        if self.status == 50:
-            self.drone.land()
-            self.drone.stop()
-        
+    # 코스 B로 주행할때 원하는 주행방법 (10 ~ 15초 사이에 10번을 흔들었다면 45번으로 건너뛴다)
+    steps = (
+        Step(1, 0, 'takeoff'),
+        Step(10, 6, 'flip_forward'),
+        Step(10, None, None, elapsed=(10, 15), jump_to=45),
+        Step(30, 10, 'flip_right'),
+        Step(45, 13, 'flip_left'),
+        Step(50, 16, 'land', end=True),
+    )
+
+
+# 코스를 시간(at)에 따라 실행하는 클래스. 각 단계는 이전 단계의 응답을 받은 뒤에 실행한다.
+# paced=True라면 at을 기다리지 않고 응답을 받는 즉시 다음 단계를 실행한다. (가장 짧은 시간으로 주행)
+class TimedCourseRunner(MissionRunner):
+    def __init__(self, course, paced=False, on_progress=None, **options):
+        steps = course.schedule.timed_steps
+        if paced:
+            steps = [step._replace(at=None) for step in steps]
+        super().__init__(course.drone, steps, name=course.name, clock=course.clock,
+                         abort_on_error=False, **options)
+        self.course = course
+        self.paced = paced
+        # 코스의 상태가 바뀔 때마다(시작, 단계 실행, 끝) 부르는 함수 (ex : ShakeChannel이 구독자에게 알린다)
+        self.on_progress = on_progress
+
+    def _notify(self):
+        if self.on_progress is None:
+            return
+        try:
+            self.on_progress()
+        except Exception as ex:
+            logger.error({'action': 'on_progress', 'course': self.course.name, 'ex': ex})
+
+    def execute(self, step):
+        self.course.update_elapsed()
+        try:
+            return self.course.execute(step)
+        finally:
+            self._notify()
+
+    def should_continue(self):
+        return self.course.is_running
+
+    # (단계, 실행한 시간, 예정보다 늦어진 시간)의 목록을 돌려준다.
+    def run(self):
+        self.course.start()
+        self._notify()
+        try:
+            timings = super().run()
+        finally:
+            self.course.stop()
+            self._notify()
+        return [(self.steps[timing.index], timing.start, timing.late) for timing in timings]
+
+    def stop(self):
+        self.abort()
+
+
 def get_courses(drone):
     return {
         1 : CourseA('Course A', drone),
         2 : CourseB('Course B', drone)
-    }
\ No newline at end of file
+    }
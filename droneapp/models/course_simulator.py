@@ -0,0 +1,201 @@
+from concurrent.futures import Future
+import logging
+
+from droneapp.models.course import TimedCourseRunner
+from droneapp.models.drone_manager import DEFAULT_DEGREE
+from droneapp.models.drone_manager import DEFAULT_DISTANCE
+from droneapp.models.drone_manager import DEFAULT_SPEED
+from droneapp.models.mission import create_mission
+from droneapp.models.mission import VirtualClock
+
+logger = logging.getLogger(__name__)
+
+# 명령어마다 드론이 동작을 끝내고 응답을 보낼 때까지 걸리는 대략적인 시간(초)
+TAKEOFF_SECONDS = 5.0
+LAND_SECONDS = 4.0
+FLIP_SECONDS = 2.0
+# 회전 속도 (도/초)
+ROTATE_DEGREE_PER_SECOND = 90.0
+# 응답만 받는 명령어 (speed 등)
+COMMAND_SECONDS = 0.05
+
+# shake로 진행할 때 기본 흔드는 간격(초)
+DEFAULT_SHAKE_INTERVAL = 0.3
+
+
+# 실제 드론 대신 명령어를 기록하고, 동작에 걸리는 시간을 가상의 시간으로 계산하는 드론
+# DroneManager와 같이 명령어마다 응답('ok' or 'error')이 들어있는 Future를 돌려준다.
+#   blocking : True이면 동작이 끝날 때까지 시간을 보낸 뒤 돌려준다. (응답을 기다리는 runner)
+#              False이면 dispatcher처럼 명령어를 차례대로 쌓아두고 바로 돌려준다. (shake)
+class MockDrone(object):
+    def __init__(self, clock, speed=DEFAULT_SPEED, is_imperial=False, blocking=True):
+        self.clock = clock
+        self.speed = speed
+        self.is_imperial = is_imperial
+        self.blocking = blocking
+        self.is_flying = False
+        # 앞의 명령어들이 모두 끝나는 시간
+        self.busy_until = clock.time()
+        # (명령어가 실행된 시간, 명령어, 응답)
+        self.commands = []
+        # 코스를 검증하면서 발견한 문제들
+        self.errors = []
+
+    def send_command(self, command, blocking=True):
+        name, _, argument = command.partition(' ')
+        start = max(self.clock.time(), self.busy_until)
+        response = 'ok'
+        if name == 'takeoff' and self.is_flying:
+            response = self._error(start, command, 'already flying')
+        elif name not in ('takeoff', 'speed', 'emergency') and not self.is_flying:
+            response = self._error(start, command, 'not flying')
+        self.commands.append((start, command, response))
+        self.busy_until = start + self._duration(name, argument)
+        if self.blocking:
+            self.clock.sleep(self.busy_until - self.clock.time())
+        if response == 'ok':
+            if name == 'takeoff':
+                self.is_flying = True
+            elif name in ('land', 'emergency'):
+                self.is_flying = False
+        future = Future()
+        future.set_result(response)
+        return future
+
+    def _error(self, start, command, reason):
+        self.errors.append((start, command, reason))
+        return 'error'
+
+    def _duration(self, name, argument):
+        if name == 'takeoff':
+            return TAKEOFF_SECONDS
+        if name == 'land':
+            return LAND_SECONDS
+        if name == 'flip':
+            return FLIP_SECONDS
+        if name in ('cw', 'ccw'):
+            return float(argument) / ROTATE_DEGREE_PER_SECOND
+        if name in ('up', 'down', 'left', 'right', 'forward', 'back'):
+            return float(argument) / self.speed
+        return COMMAND_SECONDS
+
+    def takeoff(self):
+        return self.send_command('takeoff')
+
+    def land(self):
+        return self.send_command('land')
+
+    def move(self, direction, distance):
+        distance = float(distance)
+        if self.is_imperial:
+            distance = int(round(distance * 30.48))
+        else:
+            distance = int(round(distance * 100))
+        return self.send_command(f'{direction} {distance}')
+
+    def up(self, distance=DEFAULT_DISTANCE):
+        return self.move('up', distance)
+
+    def down(self, distance=DEFAULT_DISTANCE):
+        return self.move('down', distance)
+
+    def left(self, distance=DEFAULT_DISTANCE):
+        return self.move('left', distance)
+
+    def right(self, distance=DEFAULT_DISTANCE):
+        return self.move('right', distance)
+
+    def forward(self, distance=DEFAULT_DISTANCE):
+        return self.move('forward', distance)
+
+    def back(self, distance=DEFAULT_DISTANCE):
+        return self.move('back', distance)
+
+    def set_speed(self, speed):
+        self.speed = speed
+        return self.send_command(f'speed {speed}')
+
+    def clockwise(self, degree=DEFAULT_DEGREE):
+        return self.send_command(f'cw {degree}')
+
+    def counter_clockwise(self, degree=DEFAULT_DEGREE):
+        return self.send_command(f'ccw {degree}')
+
+    def flip_forward(self):
+        return self.send_command('flip f')
+
+    def flip_back(self):
+        return self.send_command('flip b')
+
+    def flip_right(self):
+        return self.send_command('flip r')
+
+    def flip_left(self):
+        return self.send_command('flip l')
+
+
+# 코스를 가상의 시간으로 끝까지 빠르게 실행해보고 결과를 돌려준다.
+#   mode : 'timed'이면 Step.at에 따라, 'paced'이면 응답을 받는 즉시 다음 단계로,
+#          'shake'이면 shake_interval마다 흔든 것처럼 진행
+# 실제로 기다리지 않기 때문에 코스를 추가하거나 바꾼 뒤 드론 없이 검증할 수 있다.
+def simulate_course(course_class, mode='timed', shake_interval=DEFAULT_SHAKE_INTERVAL, max_shakes=None):
+    clock = VirtualClock()
+    drone = MockDrone(clock, blocking=(mode != 'shake'))
+    course = course_class(course_class.__name__, drone, clock=clock)
+    late = []
+    try:
+        if mode in ('timed', 'paced'):
+            runner = TimedCourseRunner(course, paced=(mode == 'paced'))
+            for step, elapsed, late_seconds in runner.run():
+                if late_seconds > 0:
+                    late.append({'action': step.action, 'at': step.at, 'late': late_seconds})
+        elif mode == 'shake':
+            course.start()
+            max_shakes = max_shakes or course.schedule.last_count
+            for _ in range(max_shakes):
+                if not course.is_running:
+                    break
+                course.run()
+                # 드론이 명령어를 처리하는 동안에도 흔드는 간격은 그대로이다.
+                next_shake = course.start_time + course.status * shake_interval
+                clock.sleep(next_shake - clock.time())
+            course.stop()
+        else:
+            raise ValueError(f'Unknown mode {mode}')
+    finally:
+        course_class.remove_instance(drone)
+
+    errors = [{'time': t, 'command': command, 'reason': reason} for t, command, reason in drone.errors]
+    duration = max(clock.time(), drone.busy_until)
+    if drone.is_flying:
+        errors.append({'time': duration, 'command': None, 'reason': 'course ended while flying'})
+    result = {
+        'course': course_class.__name__,
+        'mode': mode,
+        'duration': duration,
+        'commands': [{'time': t, 'command': command, 'response': response}
+                     for t, command, response in drone.commands],
+        'late_steps': late,
+        'errors': errors,
+    }
+    logger.info({'action': 'simulate_course', 'course': result['course'], 'mode': mode,
+                 'duration': result['duration'], 'errors': len(errors)})
+    return result
+
+
+# 이름으로 등록된 미션(mission.MISSIONS)을 이륙한 드론으로 가상의 시간에서 실행해본 결과
+def simulate_mission(name, loops=1):
+    clock = VirtualClock()
+    drone = MockDrone(clock)
+    drone.is_flying = True
+    runner = create_mission(name, drone, loops=loops, clock=clock)
+    runner.run()
+    errors = [{'time': t, 'command': command, 'reason': reason} for t, command, reason in drone.errors]
+    return {
+        'mission': name,
+        'result': runner.result,
+        'duration': clock.time(),
+        'cycle_seconds': list(runner.cycle_seconds),
+        'steps': [timing._asdict() for timing in runner.timings],
+        'errors': errors,
+    }
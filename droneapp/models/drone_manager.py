@@ -1,14 +1,44 @@
 import contextlib
+from concurrent.futures import CancelledError
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
 import logging
+import math
 import socket
-import sys
 import time
 import os
-import subprocess
 import cv2 as cv
-import numpy as np
 
-from droneapp.models.base import Singletone
+import config
+from droneapp.models.base import Multitone
+from droneapp.models.command_dispatcher import CommandDispatcher
+from droneapp.models.command_dispatcher import command_name
+from droneapp.models.drone_state import DroneStateBuffer
+from droneapp.models.face_detection import FaceDetectionWorker
+from droneapp.models.face_detector import create_face_detector
+from droneapp.models.face_detector import draw_faces
+from droneapp.models.face_detector import HAAR_MIN_NEIGHBORS
+from droneapp.models.face_detector import HAAR_SCALE_FACTOR
+from droneapp.models.face_detector import HAAR_XML_FILE
+from droneapp.models.face_follow import FaceFollowController
+from droneapp.models.face_tracker import FaceTracker
+from droneapp.models.frame_buffer import FrameRingBuffer
+from droneapp.models.log_pipeline import LogThrottle
+from droneapp.models import metrics
+from droneapp.models.mission import create_mission
+from droneapp.models.motion_gate import MotionGate
+from droneapp.models.process_pipeline import ProcessVideoBroadcaster
+from droneapp.models.process_pipeline import ProcessVideoPipeline
+from droneapp.models.video_broadcaster import DEFAULT_JPEG_QUALITY
+from droneapp.models.video_broadcaster import encode_jpeg
+from droneapp.models.video_broadcaster import VideoBroadcaster
+from droneapp.models.video_decoder import create_video_decoder
+from droneapp.models.video_ingest import H264FrameAssembler
+from droneapp.models.video_ingest import open_video_socket
+from droneapp.models.video_ingest import receive_batch
+from droneapp.models.video_recorder import ReplaySource
+from droneapp.models.video_recorder import StreamRecorder
+from droneapp.models.video_recorder import VideoRecording
 
 # 언제 드론에서 컴퓨터로 정보가 전달될지 모르기 때문에 스레딩 사용
 import threading
@@ -22,6 +52,49 @@ DEFAULT_SPEED = 10
 # 드론이 회전할때의 기본 각도 값 설정
 DEFAULT_DEGREE = 10
 
+# 명령어의 응답을 기다리는 시간(초)과 응답이 없을 때 다시 보내는 횟수
+DEFAULT_COMMAND_TIMEOUT = 1.5
+DEFAULT_COMMAND_RETRY = 1
+
+# 움직임이 끝난 뒤에 응답하는 명령어는 응답까지 오래 걸린다.
+# 응답이 늦었을 뿐 드론은 움직이고 있을 수 있기 때문에 다시 보내지 않는다. (두번 움직이지 않도록)
+MOTION_COMMAND_TIMEOUT = 10
+MOTION_COMMANDS = ('takeoff', 'land', 'up', 'down', 'left', 'right', 'forward', 'back',
+                   'cw', 'ccw', 'flip', 'go', 'curve')
+# 거리 / 속도로 구한 움직이는 시간에 더하는 여유 시간(초)
+MOTION_TIMEOUT_MARGIN = 5
+# 응답을 기다리는 시간을 구할 때 사용하는 회전 속도(도/초). 실제보다 느리게 잡는다.
+TIMEOUT_ROTATE_DEGREE_PER_SECOND = 30
+
+
+# 명령어의 응답을 기다리는 시간(초). 움직이는 명령어는 거리(cm)를 속도(cm/s)로 나눈 시간만큼 더 기다린다.
+def command_timeout(command, speed = DEFAULT_SPEED):
+    name, _, argument = command.partition(' ')
+    if name not in MOTION_COMMANDS:
+        return DEFAULT_COMMAND_TIMEOUT
+    try:
+        values = [float(value) for value in argument.split()]
+    except ValueError:
+        values = []
+    seconds = 0.0
+    if name in ('up', 'down', 'left', 'right', 'forward', 'back') and values:
+        seconds = abs(values[0]) / max(speed, 1)
+    elif name in ('cw', 'ccw') and values:
+        seconds = abs(values[0]) / TIMEOUT_ROTATE_DEGREE_PER_SECOND
+    elif name == 'go' and len(values) >= 4:
+        seconds = math.dist((0, 0, 0), values[:3]) / max(values[3], 1)
+    elif name == 'curve' and len(values) >= 7:
+        seconds = (math.dist((0, 0, 0), values[:3]) + math.dist(values[:3], values[3:6])) / max(values[6], 1)
+    return max(MOTION_COMMAND_TIMEOUT, seconds + MOTION_TIMEOUT_MARGIN)
+
+
+# 응답이 없을 때 다시 보내는 횟수. 질문(battery?)과 설정(speed 등) 명령어만 다시 보낸다.
+def command_retry(command):
+    return 0 if command.split(' ', 1)[0] in MOTION_COMMANDS else DEFAULT_COMMAND_RETRY
+
+# 미션을 멈출 때 스레드가 끝나기를 기다리는 최대 시간(초)
+MISSION_STOP_TIMEOUT = 5
+
 # tello 드론의 경우 X : 960. Y : 720 하지만, 너무 크면 얼굴인식에서 시간이 소요되기 때문에 다음과 같이 3분의 1로 설정
 FRAME_X = int(960/3)
 FRAME_Y = int(720/3)
@@ -29,31 +102,39 @@ FRAME_AREA = FRAME_X * FRAME_Y
 
 # FFMPEG에서 정보를 처리하기 위해 필요한 사이즈
 FRAME_SIZE = FRAME_AREA * 3
+FRAME_SHAPE = (FRAME_Y, FRAME_X, 3)
 FRAME_CENTER_X = FRAME_X / 2
 FRAME_CENTER_Y = FRAME_Y / 2
 
-CMD_FFMPEG = (f'ffmpeg - hwaccel auto -hwaccel_device opencl -i pipe:0 '
-            f'-pix_fmt bgr24 -s {FRAME_X}x{FRAME_Y} -f rawvideo pipe:1')
 
+# Haar cascade 얼굴인식의 설정 (face_detector.HaarFaceDetector의 기본값)
+FACE_DETECT_XML_FILE = HAAR_XML_FILE
+FACE_DETECT_SCALE_FACTOR = HAAR_SCALE_FACTOR
+FACE_DETECT_MIN_NEIGHBORS = HAAR_MIN_NEIGHBORS
 
-FACE_DETECT_XML_FILE = './droneapp/models/haarcascade_frontalface_default.xml' 
+# 프로세스에서 하는 얼굴인식의 결과를 기다리는 최대 시간(초)
+PROCESS_DETECT_TIMEOUT = 2
 
 logger = logging.getLogger(__name__)
 
-# XML File에서 이미지 감지가 되지 않았을때를 위한 클래스
-class ErrorNoFaceDetectXMLFile(Exception):
-    """Error no face detect xml file"""
-
 # 드론을 관리하기 위한 클래스
-class DroneManager(metaclass = Singletone):
+# 드론의 주소마다 하나의 클래스만 생성된다. (여러 대의 드론은 fleet.FleetManager에서 관리)
+class DroneManager(metaclass = Multitone):
+    instance_key_arguments = ('drone_ip', 'drone_port')
+
     def __init__(self, host_ip ='192.168.10.2', host_port = 8889,
                 drone_ip ='192.168.10.1', drone_port = 8889,
-                is_imperial = False, speed = DEFAULT_SPEED):
+                is_imperial = False, speed = DEFAULT_SPEED,
+                video_decoder = config.VIDEO_DECODER, state_port = 8890, video_port = 11111,
+                face_detector = config.FACE_DETECTOR, face_detector_options = None,
+                video_workers = config.VIDEO_PROCESS_WORKERS):
         self.host_ip = host_ip
         self.host_port = host_port
         self.drone_ip = drone_ip
         self.drone_port = drone_port
         self.drone_address = (drone_ip, drone_port)
+        # metric의 drone label (여러 대의 드론을 구분)
+        self.metrics_label = f'{drone_ip}:{drone_port}'
         # 단위계를 영국단위계를 사용하는지 확인
         self.is_imperial = is_imperial 
         
@@ -63,16 +144,18 @@ class DroneManager(metaclass = Singletone):
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.socket.bind((self.host_ip, self.host_port))
         
-        # 반응에 대한 default 값
-        self.response = None
+        # 응답을 기다리고 있는 명령어의 Future (한번에 하나의 명령어만 응답을 기다린다)
+        self._pending_response = None
+        self._response_lock = threading.Lock()
 
-        # 순찰 기능을 수행중인지 확인하는 변수
-        self.patrol_event = None
-        self.is_patrol = False
+        # rc처럼 빠르게 반복되는 명령어와 응답, 영상 수신의 log는 1초에 정해진 수만 남긴다.
+        self._log_command = LogThrottle()
+        self._log_response = LogThrottle()
+        self._log_video = LogThrottle(rate = 1, burst = 1)
 
-        # 순찰기능을 수행하는 스레드 1개를 세마포어를 이용하여 제어
-        self._patrol_semaphore = threading.Semaphore(1)
-        self._thread_patrol = None
+        # 실행중인 미션(순찰, 촬영 등). 한번에 하나의 미션만 실행한다.
+        self.mission = None
+        self._mission_lock = threading.Lock()
 
         # 어떤 이벤트로 멈추고 싶을때 사용할 이벤트 설정
         self.stop_event = threading.Event()
@@ -80,48 +163,233 @@ class DroneManager(metaclass = Singletone):
         self._response_thread = threading.Thread(target = self.receive_response, args = (self.stop_event,))
         # 스레드 실행
         self._response_thread.start()
-        
-        self.proc = subprocess.Popen(CMD_FFMPEG.split(' ',
-                                                      stdin = subprocess.PIPE,
-                                                      stdout = subprocess.PIPE))
 
-        self.proc_stdin = self.proc.stdin
-        self.proc_stdout = self.proc.stdout
-
-        # manual을 보면 11111이 video port임
-        self.video_port = 11111
-
-        # video streaming을 위한 Thread설정
-        self._receive_video_thread = threading.Thread(
-            target= self.receive_video,
-            args = (self.stop_event, self.proc_stdin,
-                    self.host_ip, self.video_port,))
+        # 드론이 state port로 보내는 배터리, 자세, 높이 등의 값을 저장
+        self.state_port = state_port
+        self.state = DroneStateBuffer()
+        self._state_thread = threading.Thread(
+            target = self.receive_state,
+            args = (self.stop_event, self.host_ip, self.state_port,))
+        self._state_thread.daemon = True
+        self._state_thread.start()
         
-        if not os.path.exists(FACE_DETECT_XML_FILE):
-            raise ErrorNoFaceDetectXMLFile(f'No {FACE_DETECT_XML_FILE}')
-        self.face_cascade = cv.CascadeClassifier(FACE_DETECT_XML_FILE)
+        # manual을 보면 11111이 video port임 (여러 대의 드론을 사용할 때는 드론마다 다른 port)
+        self.video_port = video_port
+
+        # 디코딩된 frame을 미리 할당된 버퍼에 바로 넣는다.
+        self.frame_buffer = FrameRingBuffer(FRAME_SHAPE)
+
+        # 조각난 영상 패킷을 frame 단위로 모으고 수신량을 기록
+        self.video_ingest = H264FrameAssembler()
+        self.video_ingest.timer = self.stage_timer('receive')
+
+        # video streaming을 위한 Thread는 첫번째 시청자가 영상을 요청할 때(start_video) 실행한다.
+        self._video_lock = threading.Lock()
+        self._receive_video_thread = None
+        # 수신한 영상을 저장하는 recorder와 녹화본을 decoder에 넣는 replay
+        self.video_recorder = None
+        self.video_replay = None
+        # 녹화본을 재생하는 동안은 드론의 영상을 decoder에 넣지 않는다. (두 H.264 stream이 섞이지 않도록)
+        # _live_video_lock은 수신 스레드가 decoder에 넣는 동안 잡고 있어서 재생을 시작할 때 끝나기를 기다린다.
+        self._live_video_paused = threading.Event()
+        self._live_video_lock = threading.Lock()
+
+        # config.FACE_DETECTOR로 Haar cascade 또는 DNN 얼굴인식을 선택 (파일이 없다면 바로 예외가 발생)
+        if face_detector_options is None:
+            face_detector_options = config.FACE_DETECTOR_OPTIONS
+        self._face_detector = create_face_detector(face_detector, **face_detector_options)
+
+        # 여러명의 시청자가 있어도 얼굴인식과 JPEG 인코딩은 frame마다 한번만 실행한다.
+        # video_workers가 있다면 얼굴인식, 얼굴 그리기와 인코딩을 여러 프로세스에서 나누어 실행하고 결과는 frame 순서대로 보낸다.
+        # 얼굴인식은 face_detection 스레드가 프로세스에 맡기고, 받은 얼굴의 위치로 드론을 움직이고 영상에 그린다.
+        self.video_pipeline = None
+        if video_workers:
+            self.video_pipeline = ProcessVideoPipeline(FRAME_SHAPE, workers = video_workers,
+                                                       detector = (face_detector, face_detector_options))
+            self.video_broadcaster = ProcessVideoBroadcaster(
+                self.video_binary_genertor, self.video_pipeline, faces = self.overlay_faces,
+                timer = self.stage_timer('jpeg_encode'))
+        else:
+            self.video_broadcaster = VideoBroadcaster(self.video_frame_generator, self.encode_jpeg,
+                                                      timer = self.stage_timer('jpeg_encode'))
+        # 시간이 걸리는 decoder(ffmpeg) 실행과 얼굴인식 모델 읽기는 백그라운드에서 하고 결과는 Future로 받는다.
+        # config.VIDEO_DECODER로 ffmpeg subprocess 또는 프로세스 내부(pyav) decoder를 선택
+        self._video_decoder_name = video_decoder
+        self._decoder_future = Future()
+        self._detector_future = Future()
+        self._warm_up_thread = threading.Thread(target = self._warm_up)
+        self._warm_up_thread.daemon = True
+        self._warm_up_thread.start()
+
         self._is_enable_face_detect = False
+        # 얼굴인식은 영상 스트리밍과 별도의 스레드에서 가장 최근 frame을 대상으로 실행한다.
+        # 제자리 비행으로 화면이 바뀌지 않는 동안은 얼굴인식을 건너뛰고 마지막 결과를 사용한다.
+        self.face_detection = FaceDetectionWorker(self.frame_buffer, self.detect_faces,
+                                                  on_faces = self.follow_face,
+                                                  timer = self.stage_timer('face_detect'),
+                                                  motion_gate = MotionGate())
+        # 가장 최근의 얼굴 위치로 일정한 간격마다 rc 명령어를 보내 얼굴이 화면 가운데에 오도록 따라간다.
+        self.face_follow = FaceFollowController(self.send_rc, (FRAME_X, FRAME_Y))
+        # 얼굴인식은 N frame마다 실행하고 그 사이에는 얼굴을 추적하는 모드
+        self.face_tracker = FaceTracker(self._detect)
+        self.is_face_tracking = False
 
         # 하나의 cmd가 실행중일때는 다른 cmd는 실행하지 않도록 하기 위한 세마포어
         self._command_semaphore = threading.Semaphore(1)
-        self._command_thread = None
+        # 명령어마다 스레드를 만들지 않고 하나의 스레드가 priority queue의 명령어를 차례대로 보낸다.
+        self.command_dispatcher = CommandDispatcher(self._send_command,
+                                                    preempt = self._preempt_command)
 
         # 어떤 기능을 수행하기 위해서는 command라는 명령이 먼저 Drone에 전달 되어야한다.
-        self.socket.sendto(b'command', self.drone_address)
-        self.socket.sendto(b'streamon',self.drone_address)
-        
+        # dispatcher는 같은 우선순위의 명령어를 들어온 순서대로 보낸다.
+        # streamon은 영상이 필요할 때(start_video) 보낸다.
+        self._sdk_future = self.send_command('command')
         self.set_speed(self.speed)
-        
+
+        # /metrics를 요청할 때 queue 길이와 버려진 frame 수를 읽어간다.
+        metrics.REGISTRY.register_collector(self.collect_metrics)
+
+    # decoder를 먼저 실행해서 ffmpeg가 준비되는 동안 얼굴인식 모델을 읽는다.
+    def _warm_up(self):
+        try:
+            decoder = create_video_decoder(self._video_decoder_name, FRAME_X, FRAME_Y)
+            decoder.timer = self.stage_timer('decode')
+            decoder.start(self.frame_buffer)
+            self._decoder_future.set_result(decoder)
+            # 준비하는 동안 stop()이 호출되었다면 decoder도 종료
+            if self.stop_event.is_set():
+                decoder.stop()
+        except Exception as ex:
+            logger.error({'action' : '_warm_up', 'component' : 'decoder', 'ex' : ex})
+            self._decoder_future.set_exception(ex)
+
+        try:
+            self._detector_future.set_result(self._face_detector.load())
+        except Exception as ex:
+            logger.error({'action' : '_warm_up', 'component' : 'detector', 'ex' : ex})
+            self._detector_future.set_exception(ex)
+        logger.info({'action' : '_warm_up', 'status' : 'done'})
+
+    # 준비가 끝날 때까지 기다린다. (준비에 실패했다면 예외가 발생)
+    @property
+    def video_decoder(self):
+        return self._decoder_future.result()
+
+    @property
+    def face_detector(self):
+        return self._detector_future.result()
+
+    @staticmethod
+    def _future_status(future):
+        if not future.done():
+            return 'starting'
+        if future.cancelled() or future.exception() is not None:
+            return 'error'
+        return 'ready'
+
+    # 구성요소별 준비 상태 (/health)
+    def health(self):
+        sdk = self._future_status(self._sdk_future)
+        if sdk == 'ready' and self._sdk_future.result() is None:
+            # 응답을 받지 못했다면 드론이 꺼져있거나 다른 네트워크에 연결되어 있다.
+            sdk = 'error'
+        components = {
+            'command' : sdk,
+            'state' : 'ready' if self.state.latest() is not None else 'waiting',
+            'decoder' : self._future_status(self._decoder_future),
+            'detector' : self._future_status(self._detector_future),
+        }
+        if self._receive_video_thread is None:
+            video = 'idle'
+        elif not self._receive_video_thread.is_alive():
+            video = 'stopped'
+        elif self._live_video_paused.is_set():
+            video = 'paused'
+        elif self.video_ingest.frames:
+            video = 'streaming'
+        else:
+            video = 'waiting'
+        return {
+            'ready' : all(components[name] == 'ready' for name in ('command', 'decoder', 'detector')),
+            'components' : components,
+            'video' : video,
+        }
+
+    # 영상 처리 단계(stage)별 시간을 기록할 histogram
+    def stage_timer(self, stage):
+        return metrics.VIDEO_STAGE.labels(self.metrics_label, stage)
+
+    # 요청할 때만 계산하는 값들 (측정하는 곳에는 비용이 없다)
+    def collect_metrics(self):
+        labels = {'drone' : self.metrics_label}
+        dispatcher = self.command_dispatcher
+        queued, subscriber_dropped = self.video_broadcaster.queue_stats()
+        dropped = metrics.Sample('tello_frames_dropped_total', 'counter',
+                                 'Video frames dropped per stage', None, None)
+        depth = metrics.Sample('tello_queue_depth', 'gauge', 'Items waiting in each queue', None, None)
+        return [
+            dropped._replace(labels = dict(labels, stage = 'ingest'), value = self.video_ingest.dropped_frames),
+            dropped._replace(labels = dict(labels, stage = 'frame_buffer'), value = self.frame_buffer.dropped),
+            dropped._replace(labels = dict(labels, stage = 'subscriber'), value = subscriber_dropped),
+            depth._replace(labels = dict(labels, queue = 'command'), value = dispatcher.depth),
+            depth._replace(labels = dict(labels, queue = 'video_subscribers'), value = queued),
+            metrics.Sample('tello_command_queue_max_depth', 'gauge', 'Largest command queue depth seen',
+                           labels, dispatcher.max_depth),
+            metrics.Sample('tello_commands_dropped_total', 'counter',
+                           'Commands dropped because the queue was busy or full', labels, dispatcher.dropped),
+            metrics.Sample('tello_commands_coalesced_total', 'counter',
+                           'Commands replaced by a newer command of the same type', labels, dispatcher.coalesced),
+            metrics.Sample('tello_video_subscribers', 'gauge', 'Clients watching the video stream',
+                           labels, self.video_broadcaster.subscriber_count),
+            metrics.Sample('tello_video_frames_total', 'counter', 'Frames assembled from UDP packets',
+                           labels, self.video_ingest.frames),
+            metrics.Sample('tello_face_detect_skipped_total', 'counter',
+                           'Frames whose face detection was skipped because the scene did not change',
+                           labels, self.face_detection.motion_gate.skipped),
+        ]
+
     # 스레딩 돌릴 함수( 해당 함수는 stop_event가 아닌 경우 계속해서 돌면서 정보를 받는다)
     def receive_response(self, stop_event):
+        # stop()을 호출했을 때 recvfrom에서 계속 멈춰있지 않도록 timeout 설정
+        self.socket.settimeout(.5)
         while not stop_event.is_set():
             try:
-                self.response, ip = self.socket.recvfrom(3000)
-                logger.info({'action' : 'receive_response' , 'response' : self.response})
+                response, ip = self.socket.recvfrom(3000)
+                if self._log_response.allow():
+                    logger.info({'action' : 'receive_response' , 'response' : response},
+                                extra = self._log_response.extra())
+            except socket.timeout:
+                continue
             except socket.error as ex:
                 logger.error({'action' : 'receive_response', 'ex' : ex})
                 break
+
+            # 응답을 기다리고 있는 명령어에 바로 결과를 전달한다.
+            with self._response_lock:
+                future = self._pending_response
+                self._pending_response = None
+            if future is None:
+                # 이미 timeout된 명령어의 늦은 응답은 다음 명령어의 응답으로 사용하지 않는다.
+                logger.warning({'action' : 'receive_response', 'response' : response, 'status' : 'unexpected'})
+                continue
+            future.set_result(response.decode('utf-8', errors='replace'))
                 
+    # 드론의 state(약 10Hz)를 받아 ring buffer에 저장하는 스레드
+    def receive_state(self, stop_event, host_ip, state_port):
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock_state:
+            sock_state.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock_state.settimeout(.5)
+            sock_state.bind((host_ip, state_port))
+            while not stop_event.is_set():
+                try:
+                    packet, ip = sock_state.recvfrom(1024)
+                except socket.timeout:
+                    continue
+                except socket.error as ex:
+                    logger.error({'action' : 'receive_state', 'ex' : ex})
+                    break
+                self.state.append(packet)
+
     # 클래스가 메모리에서 삭제될때 하는 메직메소드
     def __dell__(self):
         self.stop()
@@ -130,35 +398,49 @@ class DroneManager(metaclass = Singletone):
     def stop(self):
         # 드론이 멈춘다면 해당 스레드 또한 종료시켜라
         self.stop_event.set()
+        self.face_follow.stop()
+        self.stop_mission()
+        self.stop_recording()
+        self.stop_replay()
         
         # receive_response에 while문이 실행 중이라면 종료 후 실행시키기 위한 구문
         retry = 0
-        while self._response_thread.isAlive():
+        while self._response_thread.is_alive():
             time.sleep(0.3)
             if retry > 30:
                 break
             # 너무 오랜시간을 기다리지 않기 위한 retry 값 수정
             retry += 1
         
+        self.command_dispatcher.stop()
         self.socket.close()
-        
-        # Linux에서 kill을 실행하는 방법
-        # os.kill(self.proc.pid,9)
-
-        # Window에서 kill을 실행하는 방법
-        import signal
-        os.kill(self.proc.pid, signal.CTRL_C_EVENT)
+        if self._future_status(self._decoder_future) == 'ready':
+            self.video_decoder.stop()
+        if self.video_pipeline is not None:
+            self.video_pipeline.stop()
+        metrics.REGISTRY.unregister_collector(self.collect_metrics)
     
     # 해당 호출을 cmd를 입력받았을 때 행동한다. 하지만 만약 하나의 cmd가 실행중에 있고 실행 종료가 되지 않았다면 기다린다.
+    # 명령어의 결과(응답 문자열 or None)는 돌려준 Future로 받을 수 있다.
+    # land / emergency는 먼저 실행되고, go / rc는 아직 보내지 않은 같은 명령어를 대신한다.
     def send_command(self, command, blocking = True):
-        self._command_thread = threading.Thread(
-            target=self._send_command,
-            args=(command, blocking,))
-        self._command_thread.start()
-    
+        return self.command_dispatcher.submit(command, blocking)
+
+    # 응답을 기다리고 있는 명령어를 중단시킨다. (land / emergency를 바로 보내기 위해 사용)
+    def _preempt_command(self):
+        with self._response_lock:
+            future = self._pending_response
+            self._pending_response = None
+        if future is not None:
+            future.cancel()
+
+    # 명령어의 종류와 지금 속도에 따라 응답을 기다리는 시간이 다르다.
+    def command_timeout(self, command):
+        return command_timeout(command, self.speed)
 
     # 이착륙과 같은 명령을 수향하기 위한 함수
-    def _send_command(self, command, blocking = True):
+    # retry가 None이면 움직이는 명령어는 다시 보내지 않고 나머지는 DEFAULT_COMMAND_RETRY만큼 다시 보낸다.
+    def _send_command(self, command, blocking = True, timeout = None, retry = None):
         # 만약 right가 3개 이때, 첫번째 right는 세마포어를 얻고 해당 cmd를 실행한다. 하지만 2번째부터는 1번째가 끝나기 전까지 실행하지 않고 기다린다.
         # 처음 블로킹이 True라면 해당 실행을 거친다. 
         is_acquire = self._command_semaphore.acquire(blocking=blocking)
@@ -166,23 +448,52 @@ class DroneManager(metaclass = Singletone):
             with contextlib.ExitStack() as stack:
                 stack.callback(self._command_semaphore.release)
                 # 로그 작성
-                logger.info({'action' : 'send_command', 'command' : command}) 
-                
-                # 문자열로 명령어(command)가 들어오기 때문에 인코딩 후 통해 전달
-                self.socket.sendto(command.encode('utf-8'),self.drone_address)
-                retry = 0
-                while self.response is None:
-                    time.sleep(0.3)
-                    if retry > 3:
-                        break
-                    retry += 1
+                if self._log_command.allow():
+                    logger.info({'action' : 'send_command', 'command' : command},
+                                extra = self._log_command.extra())
                 
-                if self.response is None:
-                    response = None
-                else:
-                    response = self.response.decode('utf-8')
-                self.response = None
-                return response
+                if timeout is None:
+                    timeout = self.command_timeout(command)
+                if retry is None:
+                    retry = command_retry(command)
+                labels = (self.metrics_label, command_name(command))
+
+                for attempt in range(retry + 1):
+                    if attempt:
+                        metrics.COMMAND_RETRIES.labels(*labels).inc()
+                    future = Future()
+                    with self._response_lock:
+                        # dispatcher가 꺼낸 뒤 여기까지 오는 사이에 land / emergency가 들어왔다면 보내지 않는다.
+                        # 같은 lock 안에서 확인하기 때문에 이후의 preempt는 _pending_response를 중단시킨다.
+                        is_preempted = self.command_dispatcher.is_preempted
+                        if not is_preempted:
+                            self._pending_response = future
+                    if is_preempted:
+                        logger.warning({'action' : 'send_command', 'command' : command, 'status' : 'preempted'})
+                        metrics.COMMAND_PREEMPTED.labels(*labels).inc()
+                        return None
+                    start = time.perf_counter()
+                    # 문자열로 명령어(command)가 들어오기 때문에 인코딩 후 통해 전달
+                    self.socket.sendto(command.encode('utf-8'),self.drone_address)
+                    try:
+                        # receive_response에서 응답을 받는 즉시 결과가 전달된다.
+                        response = future.result(timeout)
+                        metrics.COMMAND_LATENCY.labels(*labels).observe(time.perf_counter() - start)
+                        return response
+                    except CancelledError:
+                        logger.warning({'action' : 'send_command', 'command' : command, 'status' : 'preempted'})
+                        metrics.COMMAND_PREEMPTED.labels(*labels).inc()
+                        return None
+                    except FutureTimeoutError:
+                        logger.warning({'action' : 'send_command', 'command' : command,
+                                        'status' : 'timeout', 'attempt' : attempt})
+                        metrics.COMMAND_TIMEOUTS.labels(*labels).inc()
+                    finally:
+                        with self._response_lock:
+                            if self._pending_response is future:
+                                self._pending_response = None
+                metrics.COMMAND_FAILURES.labels(*labels).inc()
+                return None
         else:
             logger.warning({'action' : 'send_command', 'command' : command, 'status' : 'not_acquire'})
 
@@ -191,8 +502,18 @@ class DroneManager(metaclass = Singletone):
         return self.send_command('takeoff')
         
     def land(self):
+        # 착륙하는 동안 rc 명령어를 보내지 않도록 얼굴 따라가기를 멈춘다. (enable_face_detect로 다시 시작)
+        self.face_follow.stop()
         # land의 수행여부 판단을 위해 return을 사용
         return self.send_command('land')
+
+    # rc 명령어는 드론이 응답하지 않고 가장 최근 값만 의미가 있기 때문에 dispatcher를 거치지 않고 바로 보낸다.
+    # 값은 -100 ~ 100 (left_right : 오른쪽 +, forward_back : 앞 +, up_down : 위 +, yaw : 시계방향 +)
+    def send_rc(self, left_right, forward_back, up_down, yaw):
+        command = f'rc {int(left_right)} {int(forward_back)} {int(up_down)} {int(yaw)}'
+        if self._log_command.allow():
+            logger.info({'action' : 'send_rc', 'command' : command}, extra = self._log_command.extra())
+        self.socket.sendto(command.encode('utf-8'), self.drone_address)
     
     # 거리와 원하는 방향을 입력받으면 해당 방향과 거리로 움직이기 위한 함수
     def move(self, direction, distance):
@@ -252,141 +573,226 @@ class DroneManager(metaclass = Singletone):
     def flip_left(self):
         return self.send_command(f'flip l')
     
-    # 순찰기능을 수행하는 스레드를 실행시키는 메소드
+    # 이름으로 등록된 미션(mission.MISSIONS)을 실행한다. 실행중인 미션이 있다면 멈추고 새로 실행한다.
+    # 각 단계는 앞의 명령어의 응답을 받는 즉시 실행된다. loops가 None이면 멈출 때까지 반복
+    def start_mission(self, name, loops = 1):
+        with self._mission_lock:
+            self._stop_mission()
+            self.mission = create_mission(name, self, loops = loops)
+            self.mission.run_in_background()
+        return self.mission
+
+    def stop_mission(self):
+        with self._mission_lock:
+            self._stop_mission()
+
+    def _stop_mission(self, timeout = MISSION_STOP_TIMEOUT):
+        if self.mission is not None and self.mission.is_running:
+            self.mission.abort()
+            self.mission.join(timeout)
+
+    # 순찰 기능을 수행중인지 확인
+    @property
+    def is_patrol(self):
+        mission = self.mission
+        return mission is not None and mission.name == 'patrol' and mission.is_running
+
+    # 순찰기능을 수행하는 미션을 실행시키는 메소드 (멈출 때까지 반복)
     def patrol(self):
         if not self.is_patrol:
-            self.patrol_event = threading.Event()
-            self._thread_patrol = threading.Thread(target = self._patrol,
-                                                  args = (self._patrol_semaphore, self.patrol_event,))
-            self._thread_patrol.start()
-            self.is_patrol = True
-            
-    #  patrol에서 실행시키기 위해 필요한 메소드
-    def _patrol(self, semaphore, stop_event):
-        is_acquire = semaphore.acquire(blocking = False)
-        if is_acquire:
-            #logger.info({'action' : '_patrol', 'status' : 'acquire'})
-            with contextlib.ExitStack() as stack:
-                stack.callback(semaphore.release)
-                status = 0
-                while not stop_event.is_set():
-                    if status == 1:
-                        self.up()
-                    if status == 2:
-                        self.clockwise(2)
-                    if status == 3:
-                        self.down()
-                    if status == 4:
-                        status = 0
-                    time.sleep(5)
-        else:
-            logger.warning({'action' : '_patrol', 'status' : 'not_acquire'})
-            
+            self.start_mission('patrol', loops = None)
+
     # 순찰을 멈추는 기능
     def stop_patrol(self):
         if self.is_patrol:
-            self.patrol_event.set()
-            retry = 0
-            while self._thread_patrol.isAlive():
-                time.sleep(0.3)
-                if retry > 300:
-                    break
-                retry += 1
-            self.is_patrol = False
+            self.stop_mission()
+
+    # 첫번째 시청자(또는 얼굴인식)가 영상을 요청할 때 streamon을 보내고 영상 수신 스레드를 실행한다.
+    def start_video(self):
+        with self._video_lock:
+            # 녹화본을 재생하는 중이라면 드론의 영상은 받지 않는다.
+            if self._receive_video_thread is not None or self.video_replay is not None:
+                return False
+            self.send_command('streamon')
+            self._receive_video_thread = threading.Thread(
+                target = self.receive_video,
+                args = (self.stop_event, self.host_ip, self.video_port,))
+            self._receive_video_thread.daemon = True
+            self._receive_video_thread.start()
+        logger.info({'action' : 'start_video', 'video_port' : self.video_port})
+        return True
 
     # 드론에서 촬영한 영상을 입력받을때 스레드가 실행시킬 함수.
-    def receive_video(self, stop_event, pipe_in, host_ip, video_port):
-        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock_video:
-            sock_video.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            sock_video.settimeout(.5)
-            sock_video.bind((host_ip, video_port))
-            data = bytearray(2048)
+    # 도착해 있는 패킷을 한번에 읽고, 완성된 frame들을 모아서 한번에 decoder에 넣는다.
+    def receive_video(self, stop_event, host_ip, video_port):
+        try:
+            # decoder가 준비될 때까지 기다린다.
+            decoder = self.video_decoder
+        except Exception as ex:
+            logger.error({'action' : 'receive_video', 'ex' : ex})
+            return
+        with open_video_socket(host_ip, video_port) as sock_video:
+            packet = bytearray(2048)
+            frames = bytearray()
             while not stop_event.is_set():
-                # 해당 try문에서는 성공한다면 데이터를 size와 addr에 저장된다.
                 try:
-                    # size와 addr에 대한 정보를 2048로 설정한 binary array에 삽입
-                    size, addr = sock_video.recvfrom_into(data)
-                    logger.info({'action' : 'receive_video', 'data' : data})
+                    receive_batch(sock_video, packet, self.video_ingest, frames)
                 except socket.timeout as ex:
-                    logger.warning({'action' : 'receive_video', 'ex' : ex})
-                    time.sleep(0.4)
+                    # 영상이 오지 않는 동안은 0.5초마다 발생하기 때문에 1초에 한번만 남긴다.
+                    if self._log_video.allow():
+                        logger.warning({'action' : 'receive_video', 'ex' : ex}, extra = self._log_video.extra())
                     continue
                 except socket.error as ex:
                     logger.warning({'action' : 'receive_video', 'ex' : ex})
                     break
-                
-                # 입력받은 데이터를 pipe를 통해 0번에 넣어죽 싶은 작업을 위한 try 해당 구문은 데이터를 수신하지 못한다면 실행하지 않는다.
-                try:
-                    pipe_in.write(data[:size])
-                    pipe_in.flush()
-                except Exception as ex:
-                    logger.error({'action' : 'receive_video', 'ex' : ex})
-                    break
+
+                # 완성된 frame이 없다면 decoder에 넣지 않는다.
+                if not frames:
+                    continue
+                with self._live_video_lock:
+                    # 녹화본을 재생하는 중이라면 socket은 계속 비우고 받은 frame은 버린다.
+                    if self._live_video_paused.is_set():
+                        frames.clear()
+                        continue
+                    try:
+                        decoder.write(frames)
+                    except Exception as ex:
+                        logger.error({'action' : 'receive_video', 'ex' : ex})
+                        break
+                self.video_ingest.writes += 1
+                frames.clear()
     
+    # 수신한 H.264 영상을 directory(없다면 config.RECORD_DIRECTORY/시간)에 저장하기 시작한다.
+    def start_recording(self, directory = None):
+        self.stop_recording()
+        if directory is None:
+            directory = os.path.join(config.RECORD_DIRECTORY, time.strftime('%Y%m%d_%H%M%S'))
+        self.video_recorder = StreamRecorder(directory).start()
+        self.video_ingest.on_frame = self.video_recorder.write
+        self.start_video()
+        return self.video_recorder
+
+    def stop_recording(self):
+        recorder = self.video_recorder
+        if recorder is None:
+            return None
+        self.video_ingest.on_frame = None
+        self.video_recorder = None
+        recorder.stop()
+        return recorder.stats()
+
+    # 녹화본을 드론의 영상 대신 decoder에 넣는다. realtime이 False라면 최대한 빠르게 넣는다.
+    # 드론의 영상을 받는 중이라면 stop_replay까지 decoder에 넣지 않고 버린다.
+    def start_replay(self, directory, realtime = True, start = 0.0, loop = False):
+        recording = VideoRecording(directory)
+        decoder = self.video_decoder
+        with self._video_lock:
+            if self.video_replay is not None:
+                self.video_replay.stop()
+            # 수신 스레드가 decoder에 넣는 중인 frame이 있다면 끝날 때까지 기다린 뒤 멈춘다.
+            with self._live_video_lock:
+                self._live_video_paused.set()
+            self.video_replay = ReplaySource(recording, decoder.write,
+                                             realtime = realtime, start = start, loop = loop)
+            self.video_replay.start()
+        logger.info({'action' : 'start_replay', 'directory' : directory, 'realtime' : realtime})
+        return self.video_replay
+
+    # 재생을 멈추고 드론의 영상을 다시 decoder에 넣는다.
+    def stop_replay(self):
+        with self._video_lock:
+            replay = self.video_replay
+            self.video_replay = None
+            if replay is not None:
+                # 재생 스레드가 decoder에 넣는 중인 frame이 끝난 뒤에 드론의 영상을 다시 받는다.
+                replay.stop()
+            self._live_video_paused.clear()
+        if replay is not None:
+            logger.info({'action' : 'stop_replay', 'stats' : replay.stats()})
+
+    # 가장 최근의 frame만 돌려준다. 처리가 늦어지면 그 사이의 frame은 건너뛴다.
+    # 돌려받은 frame은 ring buffer의 view이기 때문에 다음 frame을 요청하기 전에 사용해야 한다.
     def video_binary_genertor(self):
-        while True:
-            try:
-                frame = self.proc_stdout.read(FRAME_SIZE)
-            except Exception as ex:
-                logger.error({'action' : 'video_binary_generator', 'ex' : ex})
+        self.start_video()
+        sequence = 0
+        while not self.stop_event.is_set():
+            sequence, frame = self.frame_buffer.wait_next(sequence, timeout = 1)
+            if frame is None:
                 continue
-
-            if not frame:
-                continue
-            
-            # opencv로 받은 데이터를 FFMPEG에서 처리할 수 있는 형태로 바꿔주기 위한 작업
-            frame = np.fromstring(frame, np.uint8).reshape(FRAME_Y, FRAME_X)
             yield frame
 
     # 얼굴인식 감지가 된 경우에 실행하는 함수
     def enable_face_detect(self):
         self._is_enable_face_detect = True
+        if self.is_patrol:
+            self.stop_patrol()
+        self.start_video()
+        self.face_detection.start()
+        self.face_follow.start()
     
     # 얼굴인식 감지가 안된 경우에서 실행하는 함수
     def disable_face_detect(self):
         self._is_enable_face_detect = False
-
-    def video_jpeg_generator(self):
+        self.face_detection.stop()
+        self.face_follow.stop()
+
+    # 얼굴인식과 추적을 함께 사용하는 모드를 켜고 끈다. interval : 몇 frame마다 얼굴인식을 다시 할지
+    def set_face_tracking(self, enable, interval = None):
+        if interval:
+            self.face_tracker.detect_interval = max(1, int(interval))
+        self.face_tracker.reset()
+        self.is_face_tracking = enable
+        # 다음 frame은 바뀐 방식으로 다시 얼굴인식
+        self.face_detection.motion_gate.reset()
+
+    def _detect(self, image):
+        return self.face_detector.detect(image)
+
+    # frame에서 얼굴의 위치를 찾는다. (FaceDetectionWorker의 스레드에서 실행)
+    def detect_faces(self, frame):
+        if self.is_face_tracking:
+            # 추적(template matching)은 흑백 이미지를 사용한다.
+            return self.face_tracker.update(cv.cvtColor(frame, cv.COLOR_BGR2GRAY))
+        if self.video_pipeline is not None:
+            # 얼굴인식도 프로세스에서 한다. 빈 slot이 없다면 이 스레드에서 한다.
+            future = self.video_pipeline.detect(frame)
+            if future is not None:
+                return future.result(timeout = PROCESS_DETECT_TIMEOUT)
+        return self._detect(frame)
+
+    # 얼굴인식 결과를 얼굴 따라가기에 넘겨준다. (명령어는 face_follow의 스레드가 일정한 간격으로 보낸다)
+    # frame이 decoder에서 나온 시간을 함께 넘겨서 얼굴인식까지 걸린 지연을 보정한다.
+    def follow_face(self, faces, sequence = None):
+        if not self._is_enable_face_detect or not faces:
+            return
+        frame_time = self.frame_buffer.frame_time(sequence) if sequence else None
+        self.face_follow.update(faces, frame_time)
+
+    # 영상에 그릴 얼굴의 위치. 얼굴인식을 기다리지 않고 가장 최근의 얼굴인식 결과를 사용한다.
+    def overlay_faces(self):
+        if not self._is_enable_face_detect:
+            return ()
+        return self.face_detection.latest_faces()
+
+    # 얼굴인식 결과를 그린 frame을 돌려준다.
+    def video_frame_generator(self):
         for frame in self.video_binary_genertor():
-            if self._is_enable_face_detect:
-                if self.is_patrol:
-                    self.stop_patrol()
-                gray = cv.cvtColor(frame, cv.COLOR_BGR2GRAY)
-                faces = self.face_cascade.detectMultiScale(gray, 1.3, 5)
-                for (x,y,w,h) in faces:
-                    cv.rectangle(frame, (x,y), (x+w, y+h), (255, 0, 0), 2)
-
-                    # 인식된 이미지 사각형의 중간
-                    face_center_x = x + (w/2)
-                    face_center_y = y + (h/2)
-
-                    # 인식된 이미지와 카메라의 사각형의 중간이 얼마나 차이나는지
-                    diff_x = FRAME_CENTER_X - face_center_x
-                    diff_y = FRAME_CENTER_Y - face_center_y
-
-                    # 인식된 이미지의 영역이 어느정도의 퍼센트를 차지하는지
-                    face_area = w * h
-                    percent_face = face_area / FRAME_AREA
-
-                    drone_x, drone_y, drone_z, speed = 0, 0, 0, self.speed
-
-                    if diff_x < -30:
-                        drone_y = -30
-                    if diff_x > 30:
-                        drone_y = 30
-                    if diff_y < -15:
-                        drone_z = -30
-                    if diff_y > 15:
-                        drone_z = 30
-                    if percent_face > 0.30:
-                        drone_x = -30
-                    if percent_face < 0.02:
-                        drone_x = 30
-
-                    self.send_command(f'go {drone_x} {drone_y} {drone_z} {speed}')
+            faces = self.overlay_faces()
+            if faces:
+                frame = self.draw_faces(frame, faces)
+            yield frame
 
-                    break
+    # 얼굴의 위치를 그린 frame을 돌려준다.
+    # ring buffer의 frame은 얼굴인식 스레드도 사용하기 때문에 복사본에 그린다.
+    @staticmethod
+    def draw_faces(frame, faces):
+        return draw_faces(frame, faces)
+
+    # frame을 원하는 품질(quality)과 크기(scale)의 JPEG binary로 바꾼다.
+    @staticmethod
+    def encode_jpeg(frame, quality = DEFAULT_JPEG_QUALITY, scale = 1.0):
+        return encode_jpeg(frame, quality, scale)
 
-            _, jpeg = cv.imencode('.jpg', frame)
-            jpeg_binary = jpeg.tobytes()
-            yield jpeg_binary
+    def video_jpeg_generator(self):
+        for frame in self.video_frame_generator():
+            yield self.encode_jpeg(frame)
@@ -0,0 +1,109 @@
+import math
+import threading
+import time
+
+import numpy as np
+
+# Tello가 state port(8890)로 보내는 값들 (ex : pitch:0;roll:0;...;agz:-1000.00;\r\n)
+STATE_FIELDS = ('pitch', 'roll', 'yaw', 'vgx', 'vgy', 'vgz', 'templ', 'temph',
+                'tof', 'h', 'bat', 'baro', 'time', 'agx', 'agy', 'agz')
+
+# 샘플 하나를 dict가 아닌 고정된 크기의 structured array 한 행으로 저장한다.
+STATE_DTYPE = np.dtype([('timestamp', 'f8')] + [(field, 'f4') for field in STATE_FIELDS])
+
+_FIELD_KEYS = {field.encode('ascii'): field for field in STATE_FIELDS}
+
+# 10Hz로 10분 동안의 state를 저장 (약 400KB)
+DEFAULT_STATE_CAPACITY = 6000
+
+# history를 요청할 때 돌려줄 최대 점의 수
+DEFAULT_HISTORY_POINTS = 300
+
+# f4로 저장할 수 있는 가장 큰 값 (넘는 값은 inf가 된다)
+_MAX_VALUE = float(np.finfo(np.float32).max)
+
+
+# state 패킷을 structured array의 한 행에 바로 채워 넣는다.
+# 숫자가 아니거나 유한하지 않은 값(nan, inf)은 NaN으로 저장하고, 돌려줄 때 None으로 바꾼다. (JSON에는 NaN이 없다)
+def parse_state(packet, row):
+    for item in packet.split(b';'):
+        key, _, value = item.partition(b':')
+        field = _FIELD_KEYS.get(key.strip())
+        if field is None:
+            continue
+        try:
+            number = float(value)
+        except ValueError:
+            number = math.nan
+        row[field] = number if abs(number) <= _MAX_VALUE else math.nan
+
+
+# NaN(값이 없음)을 None으로 바꾼 list
+def _to_list(values):
+    return [None if math.isnan(value) else value for value in values.tolist()]
+
+
+# 드론의 state를 고정된 크기의 ring buffer에 저장하는 클래스
+class DroneStateBuffer(object):
+    def __init__(self, capacity=DEFAULT_STATE_CAPACITY):
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=STATE_DTYPE)
+        # 지금까지 저장한 샘플의 수 (다음에 쓸 위치는 count % capacity)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, packet, timestamp=None):
+        with self._lock:
+            index = self.count % self.capacity
+            self._data[index] = 0
+            row = self._data[index]
+            row['timestamp'] = time.time() if timestamp is None else timestamp
+            parse_state(packet, row)
+            self.count += 1
+
+    # 가장 최근의 샘플 (없다면 None)
+    def latest(self):
+        with self._lock:
+            if self.count == 0:
+                return None
+            row = self._data[(self.count - 1) % self.capacity]
+            values = {name: float(row[name]) for name in STATE_DTYPE.names}
+        return {name: None if math.isnan(value) else value for name, value in values.items()}
+
+    # 시간 순서로 정렬된 복사본
+    def _ordered(self):
+        if self.count <= self.capacity:
+            return self._data[:self.count].copy()
+        start = self.count % self.capacity
+        return np.concatenate((self._data[start:], self._data[:start]))
+
+    # 최근 seconds초 동안의 state를 최대 points개의 구간 평균으로 줄여서 돌려준다.
+    # 값이 없는(None) 샘플은 평균에서 빼고, 구간의 모든 샘플에 값이 없다면 None이다.
+    def history(self, seconds=None, points=DEFAULT_HISTORY_POINTS, fields=None):
+        if seconds is not None and not (math.isfinite(seconds) and seconds > 0):
+            raise ValueError('seconds must be a positive number')
+        if points is not None and points <= 0:
+            raise ValueError('points must be a positive integer')
+        with self._lock:
+            data = self._ordered()
+        if seconds is not None and len(data):
+            data = data[data['timestamp'] >= data['timestamp'][-1] - seconds]
+
+        fields = [field for field in (fields or STATE_FIELDS) if field in STATE_FIELDS]
+        names = ['timestamp'] + fields
+        if points and len(data) > points:
+            # 같은 크기의 구간으로 나누어 평균을 구한다.
+            edges = np.linspace(0, len(data), points + 1).astype(np.int64)[:-1]
+            columns = {}
+            for name in names:
+                values = data[name].astype(np.float64)
+                valid = ~np.isnan(values)
+                sums = np.add.reduceat(np.where(valid, values, 0.0), edges)
+                counts = np.add.reduceat(valid.astype(np.int64), edges)
+                columns[name] = np.divide(sums, counts, out=np.full(len(edges), np.nan), where=counts > 0)
+        else:
+            columns = {name: data[name] for name in names}
+        return {name: _to_list(np.round(values, 3)) for name, values in columns.items()}
@@ -0,0 +1,138 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 1초에 몇번 얼굴인식을 실행할지 (영상의 fps와는 별개로 동작한다)
+DEFAULT_DETECT_RATE = 10
+
+# 너무 오래된 얼굴인식 결과는 영상에 그리지 않는다(초)
+FACE_MAX_AGE = 1.0
+
+# 측정값의 이동평균에 사용하는 가중치
+STATS_ALPHA = 0.1
+
+
+# 영상 스트리밍과는 별도의 스레드에서 가장 최근 frame만 가져와 얼굴인식을 하는 클래스
+class FaceDetectionWorker(object):
+    def __init__(self, frame_buffer, detect, on_faces=None, rate=DEFAULT_DETECT_RATE, timer=None,
+                 motion_gate=None):
+        self.frame_buffer = frame_buffer
+        # frame을 받아 [(x, y, w, h), ...]를 돌려주는 함수
+        self._detect = detect
+        # 얼굴인식이 끝날때마다 호출되는 함수 (faces, sequence)
+        self._on_faces = on_faces
+        self.rate = rate
+        # 얼굴인식에 걸린 시간을 기록할 histogram (metrics.VIDEO_STAGE의 child)
+        self.timer = timer
+        # 화면이 바뀌지 않았다면 얼굴인식을 건너뛰고 마지막 결과를 다시 사용 (motion_gate.MotionGate)
+        self.motion_gate = motion_gate
+
+        # 가장 최근의 얼굴인식 결과
+        self.faces = ()
+        self.face_sequence = 0
+        self.face_time = None
+
+        # 튜닝을 위한 측정값
+        self.detections = 0
+        self.detect_ms = None
+        self.detect_ms_avg = None
+        self.measured_rate = None
+        self._last_detect_time = None
+
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.is_running and not self._stop_event.is_set():
+            return
+        if self.motion_gate is not None:
+            self.motion_gate.reset()
+        # 이전 스레드가 아직 종료되지 않았을 수 있기 때문에 새로운 이벤트를 사용
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(self._stop_event,))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self.faces = ()
+
+    def set_rate(self, rate):
+        self.rate = max(0.1, float(rate))
+
+    # 영상에 그릴 얼굴의 위치 (오래된 결과라면 빈 tuple)
+    def latest_faces(self, max_age=FACE_MAX_AGE):
+        if self.face_time is None or time.monotonic() - self.face_time > max_age:
+            return ()
+        return self.faces
+
+    def _run(self, stop_event):
+        sequence = 0
+        while not stop_event.is_set():
+            sequence, frame = self.frame_buffer.wait_next(sequence, timeout=1)
+            if frame is None:
+                continue
+
+            start = time.perf_counter()
+            # 화면이 그대로라면 얼굴인식을 하지 않고 마지막 결과를 이번 frame의 결과로 사용
+            if self.motion_gate is None or self.motion_gate.should_detect(frame):
+                try:
+                    faces = self._detect(frame)
+                except Exception as ex:
+                    logger.error({'action': 'face_detection', 'ex': ex})
+                    if self.motion_gate is not None:
+                        self.motion_gate.reset()
+                    continue
+                cost = time.perf_counter() - start
+                if self.timer is not None:
+                    self.timer.observe(cost)
+                self.faces = tuple(tuple(int(v) for v in face) for face in faces)
+                self._update_stats(cost)
+
+            self.face_sequence = sequence
+            self.face_time = time.monotonic()
+
+            if self._on_faces is not None and not stop_event.is_set():
+                try:
+                    self._on_faces(self.faces, sequence)
+                except Exception as ex:
+                    logger.error({'action': 'face_detection', 'ex': ex})
+
+            # 설정된 rate보다 빠르게 실행되지 않도록 남은 시간만큼 기다린다.
+            wait = 1.0 / self.rate - (time.perf_counter() - start)
+            if wait > 0:
+                stop_event.wait(wait)
+
+    def _update_stats(self, cost):
+        self.detections += 1
+        self.detect_ms = cost * 1000
+        if self.detect_ms_avg is None:
+            self.detect_ms_avg = self.detect_ms
+        else:
+            self.detect_ms_avg += STATS_ALPHA * (self.detect_ms - self.detect_ms_avg)
+
+        now = time.monotonic()
+        if self._last_detect_time is not None:
+            rate = 1.0 / max(now - self._last_detect_time, 1e-6)
+            if self.measured_rate is None:
+                self.measured_rate = rate
+            else:
+                self.measured_rate += STATS_ALPHA * (rate - self.measured_rate)
+        self._last_detect_time = now
+
+    def stats(self):
+        return {
+            'running': self.is_running,
+            'rate': self.rate,
+            'measured_rate': self.measured_rate,
+            'detect_ms': self.detect_ms,
+            'detect_ms_avg': self.detect_ms_avg,
+            'detections': self.detections,
+            'motion_gate': self.motion_gate.stats() if self.motion_gate is not None else None,
+        }
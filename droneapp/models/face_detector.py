@@ -0,0 +1,166 @@
+import logging
+import os
+
+import cv2 as cv
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+HAAR_XML_FILE = './droneapp/models/haarcascade_frontalface_default.xml'
+# detectMultiScale의 scaleFactor와 minNeighbors
+HAAR_SCALE_FACTOR = 1.3
+HAAR_MIN_NEIGHBORS = 5
+
+# OpenCV DNN 얼굴인식 모델 (res10 SSD, Caffe)
+# 용량 때문에 저장소에는 들어있지 않다. OpenCV 저장소의 samples/dnn/face_detector/ 에 있는
+# deploy.prototxt 와 weights.meta4(download_models.py)에 적혀있는
+# res10_300x300_ssd_iter_140000_fp16.caffemodel 을 아래 경로에 넣어서 배포한다.
+DNN_MODEL_FILE = './droneapp/models/dnn/res10_300x300_ssd_iter_140000_fp16.caffemodel'
+DNN_CONFIG_FILE = './droneapp/models/dnn/deploy.prototxt'
+DNN_INPUT_SIZE = (300, 300)
+DNN_CONFIDENCE = 0.5
+DNN_THREADS = 1
+# 모델을 학습할 때 사용한 BGR 평균값
+DNN_MEAN = (104.0, 177.0, 123.0)
+
+
+# XML File에서 이미지 감지가 되지 않았을때를 위한 클래스
+class ErrorNoFaceDetectXMLFile(Exception):
+    """Error no face detect xml file"""
+
+
+# 설정한 얼굴인식 방법을 사용할 수 없을 때를 위한 클래스
+class ErrorFaceDetectorNotAvailable(Exception):
+    """Error face detector not available"""
+
+
+# 이미지(BGR 또는 흑백)를 받아 얼굴의 위치 [(x, y, w, h), ...]를 돌려주는 얼굴인식의 기본 틀
+class BaseFaceDetector(object):
+    name = None
+
+    # 시간이 걸리는 준비(모델 읽기)는 load()에서 한다. (DroneManager는 백그라운드에서 호출)
+    def load(self):
+        pass
+
+    def detect(self, image):
+        raise NotImplementedError
+
+    # 여러 frame을 한번에 처리한다. 한번에 처리할 수 없는 방법은 하나씩 처리한다.
+    def detect_batch(self, images):
+        return [self.detect(image) for image in images]
+
+    # benchmark에서 결과를 구분하기 위한 설정값
+    def options(self):
+        return {}
+
+
+# Haar cascade (cv.CascadeClassifier) 얼굴인식. 흑백 이미지를 사용한다.
+class HaarFaceDetector(BaseFaceDetector):
+    name = 'haar'
+
+    def __init__(self, xml_file=HAAR_XML_FILE, scale_factor=HAAR_SCALE_FACTOR,
+                 min_neighbors=HAAR_MIN_NEIGHBORS):
+        if not os.path.exists(xml_file):
+            raise ErrorNoFaceDetectXMLFile(f'No {xml_file}')
+        self.xml_file = xml_file
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.cascade = None
+
+    def load(self):
+        if self.cascade is None:
+            cascade = cv.CascadeClassifier(self.xml_file)
+            if cascade.empty():
+                raise ErrorNoFaceDetectXMLFile(f'Cannot load {self.xml_file}')
+            self.cascade = cascade
+        return self
+
+    def detect(self, image):
+        if image.ndim == 3:
+            image = cv.cvtColor(image, cv.COLOR_BGR2GRAY)
+        return self.cascade.detectMultiScale(image, self.scale_factor, self.min_neighbors)
+
+    def options(self):
+        return {'scale_factor': self.scale_factor, 'min_neighbors': self.min_neighbors}
+
+
+# OpenCV DNN(res10 SSD) 얼굴인식. 옆을 보는 얼굴도 잘 찾고, 비용은 해상도가 아닌 input_size에 따라 정해진다.
+# CPU에서만 실행하며 여러 frame을 하나의 blob으로 만들어 한번에 처리할 수 있다.
+class DnnFaceDetector(BaseFaceDetector):
+    name = 'dnn'
+
+    def __init__(self, model_file=DNN_MODEL_FILE, config_file=DNN_CONFIG_FILE,
+                 input_size=DNN_INPUT_SIZE, confidence=DNN_CONFIDENCE, threads=DNN_THREADS):
+        for path in (model_file, config_file):
+            if not os.path.exists(path):
+                raise ErrorFaceDetectorNotAvailable(
+                    f'No {path} (see DNN_MODEL_FILE in droneapp/models/face_detector.py)')
+        self.model_file = model_file
+        self.config_file = config_file
+        self.input_size = tuple(input_size)
+        self.confidence = confidence
+        self.threads = threads
+        self.net = None
+
+    def load(self):
+        if self.net is None:
+            # OpenCV의 스레드 수는 프로세스 전체에 적용된다.
+            cv.setNumThreads(self.threads)
+            net = cv.dnn.readNet(self.model_file, self.config_file)
+            net.setPreferableBackend(cv.dnn.DNN_BACKEND_OPENCV)
+            net.setPreferableTarget(cv.dnn.DNN_TARGET_CPU)
+            self.net = net
+        return self
+
+    @staticmethod
+    def _to_bgr(image):
+        if image.ndim == 2:
+            return cv.cvtColor(image, cv.COLOR_GRAY2BGR)
+        return image
+
+    def detect(self, image):
+        return self.detect_batch([image])[0]
+
+    def detect_batch(self, images):
+        if not images:
+            return []
+        images = [self._to_bgr(image) for image in images]
+        blob = cv.dnn.blobFromImages(images, 1.0, self.input_size, DNN_MEAN, swapRB=False, crop=False)
+        self.net.setInput(blob)
+        # (1, 1, N, 7) : [이미지 번호, class, confidence, x1, y1, x2, y2] (좌표는 0 ~ 1)
+        detections = self.net.forward()[0, 0]
+        detections = detections[detections[:, 2] >= self.confidence]
+
+        results = [[] for _ in images]
+        for image_id, _, _, x1, y1, x2, y2 in detections:
+            height, width = images[int(image_id)].shape[:2]
+            x1, x2 = max(0, int(x1 * width)), min(width, int(x2 * width))
+            y1, y2 = max(0, int(y1 * height)), min(height, int(y2 * height))
+            if x2 > x1 and y2 > y1:
+                results[int(image_id)].append((x1, y1, x2 - x1, y2 - y1))
+        return [np.array(faces, dtype=np.int32).reshape(-1, 4) for faces in results]
+
+    def options(self):
+        return {'input_size': self.input_size, 'confidence': self.confidence, 'threads': self.threads}
+
+
+# 얼굴의 위치를 frame에 그린다. copy=True라면 다른 스레드도 사용하는 frame 대신 복사본에 그린다.
+def draw_faces(frame, faces, copy=True):
+    if copy and len(faces):
+        frame = frame.copy()
+    for (x, y, w, h) in faces:
+        cv.rectangle(frame, (x, y), (x + w, y + h), (255, 0, 0), 2)
+    return frame
+
+
+FACE_DETECTORS = {
+    HaarFaceDetector.name: HaarFaceDetector,
+    DnnFaceDetector.name: DnnFaceDetector,
+}
+
+
+# config.FACE_DETECTOR 와 같은 이름으로 얼굴인식 방법을 만든다. (options는 각 클래스의 인자)
+def create_face_detector(name, **options):
+    if name not in FACE_DETECTORS:
+        raise ErrorFaceDetectorNotAvailable(f'Unknown face detector {name}')
+    return FACE_DETECTORS[name](**options)
@@ -0,0 +1,254 @@
+import collections
+import logging
+import threading
+import time
+
+from droneapp.models.mission import RealClock
+
+logger = logging.getLogger(__name__)
+
+# 1초에 몇번 rc 명령어를 보낼지 (얼굴인식 rate와는 별개로 일정한 간격으로 보낸다)
+DEFAULT_CONTROL_RATE = 20
+
+# rc 값의 최대 크기 (드론은 -100 ~ 100을 받는다)
+DEFAULT_MAX_RC = 60
+
+# 화면에서 얼굴이 차지했으면 하는 면적의 비율 (예전의 0.02 ~ 0.30 사이에서 멀리 떨어진 쪽)
+DEFAULT_TARGET_FACE_RATIO = 0.03
+
+# 이 시간(초)보다 오래된 얼굴 위치로는 움직이지 않고 제자리에서 기다린다.
+DEFAULT_LOST_TIMEOUT = 0.5
+
+# 카메라에서 찍힌 뒤 decoder에서 frame이 나오기까지 걸리는 시간(초). 측정할 수 없기 때문에 추정값을 더한다.
+DEFAULT_CAMERA_LATENCY = 0.12
+
+# 오차가 이 값보다 작다면 움직이지 않는다. (화면 가운데 근처에서 흔들리지 않도록)
+DEFAULT_DEAD_ZONE = 0.03
+
+# 지연 보정에 사용하는 최대 시간(초). 너무 오래된 변화율로 멀리 예측하면 오히려 흔들린다.
+MAX_COMPENSATION = 0.5
+
+# 오차의 변화율 이동평균에 사용하는 가중치
+RATE_ALPHA = 0.5
+
+# 축마다 (kp, ki, kd). 오차는 -1 ~ 1로 정규화된 값이고 결과는 rc 값이다. (tools/benchmark_tracking.py로 조정)
+#   yaw : 화면 가로 위치 -> 회전, up_down : 화면 세로 위치 -> 상승/하강, forward_back : 얼굴 크기 -> 전진/후진
+DEFAULT_GAINS = {
+    'yaw': (100.0, 5.0, 10.0),
+    'up_down': (100.0, 5.0, 10.0),
+    'forward_back': (80.0, 10.0, 8.0),
+}
+
+AXES = ('yaw', 'up_down', 'forward_back')
+
+# 얼굴인식 결과 하나에서 구한 값
+#   errors : 축별 오차, rates : 축별 오차의 변화율(1초당), time : 카메라에서 찍힌 시간(추정)
+Measurement = collections.namedtuple('Measurement', ['errors', 'rates', 'time'])
+
+
+# 하나의 축을 제어하는 PID. 결과가 limit을 넘는 동안은 적분값을 더 쌓지 않는다. (anti-windup)
+class PID(object):
+    def __init__(self, kp, ki=0.0, kd=0.0, limit=DEFAULT_MAX_RC):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.limit = limit
+        self.integral = 0.0
+
+    def reset(self):
+        self.integral = 0.0
+
+    # error : 지금의 오차, rate : 오차의 변화율(1초당), dt : 앞의 update 이후 지난 시간(초)
+    def update(self, error, rate, dt):
+        integral = self.integral + error * dt
+        output = self.kp * error + self.ki * integral + self.kd * rate
+        if abs(output) <= self.limit or (output > 0) != (error > 0):
+            self.integral = integral
+        output = self.kp * error + self.ki * self.integral + self.kd * rate
+        return max(-self.limit, min(self.limit, output))
+
+
+# 가장 최근의 얼굴 위치만 기억해두고 일정한 간격(rate)으로 PID 결과를 rc 명령어로 보내는 클래스
+# 얼굴인식 결과가 늦게 도착한 만큼(frame 지연) 오차의 변화율로 지금의 오차를 예측해서 제어한다.
+# 얼굴인식마다 go 명령어를 쌓아두지 않기 때문에 드론이 끊기지 않고 부드럽게 따라간다.
+class FaceFollowController(object):
+    def __init__(self, send_rc, frame_size, rate=DEFAULT_CONTROL_RATE, gains=None, max_rc=DEFAULT_MAX_RC,
+                 target_face_ratio=DEFAULT_TARGET_FACE_RATIO, lost_timeout=DEFAULT_LOST_TIMEOUT,
+                 camera_latency=DEFAULT_CAMERA_LATENCY, dead_zone=DEFAULT_DEAD_ZONE, compensate=True,
+                 clock=None):
+        # (left_right, forward_back, up_down, yaw)를 받아 드론에 rc 명령어를 보내는 함수
+        self._send_rc = send_rc
+        self.frame_width, self.frame_height = frame_size
+        self.rate = rate
+        self.target_face_ratio = target_face_ratio
+        self.lost_timeout = lost_timeout
+        self.camera_latency = camera_latency
+        self.dead_zone = dead_zone
+        # False라면 지연 보정 없이 마지막 얼굴 위치로만 제어한다. (비교용)
+        self.compensate = compensate
+        self.clock = clock or RealClock()
+
+        gains = dict(DEFAULT_GAINS, **(gains or {}))
+        self.pids = {axis: PID(*gains[axis], limit=max_rc) for axis in AXES}
+
+        self._lock = threading.Lock()
+        self._measurement = None
+        self._last_step = None
+        self._is_moving = False
+
+        # 튜닝을 위한 측정값
+        self.measurements = 0
+        self.steps = 0
+        self.sent = 0
+        self.latency_ms = None
+        self.latency_ms_avg = None
+        self.last_errors = None
+        self.last_rc = (0, 0, 0, 0)
+
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    # 얼굴 (x, y, w, h)의 축별 오차. 여러개라면 가장 큰 얼굴을 따라간다.
+    def face_errors(self, faces):
+        x, y, w, h = max(faces, key=lambda face: face[2] * face[3])
+        half_width, half_height = self.frame_width / 2, self.frame_height / 2
+        yaw = (x + w / 2 - half_width) / half_width
+        up_down = (half_height - (y + h / 2)) / half_height
+        # 얼굴의 폭은 거리에 반비례하기 때문에 면적 비율의 제곱근으로 비교한다. (목표 거리에 대한 거리의 차이)
+        ratio = max(w * h, 1) / (self.frame_width * self.frame_height)
+        forward_back = (self.target_face_ratio / ratio) ** 0.5 - 1.0
+        return {'yaw': yaw, 'up_down': up_down, 'forward_back': max(-1.0, min(1.0, forward_back))}
+
+    # 새로운 얼굴인식 결과. frame_time은 frame이 decoder에서 나온 시간(clock.time 기준)이다.
+    # 가장 최근 결과만 남기고 앞의 결과는 오차의 변화율을 구하는 데만 사용한다.
+    def update(self, faces, frame_time=None):
+        now = self.clock.time()
+        capture_time = (frame_time if frame_time is not None else now) - self.camera_latency
+        with self._lock:
+            previous = self._measurement
+            if not faces:
+                return
+            errors = self.face_errors(faces)
+            rates = dict.fromkeys(AXES, 0.0)
+            if previous is not None and capture_time - previous.time < self.lost_timeout:
+                dt = capture_time - previous.time
+                if dt <= 0:
+                    return
+                for axis in AXES:
+                    rate = (errors[axis] - previous.errors[axis]) / dt
+                    rates[axis] = previous.rates[axis] + RATE_ALPHA * (rate - previous.rates[axis])
+            self._measurement = Measurement(errors, rates, capture_time)
+            self.measurements += 1
+
+    # 한번의 제어. 보낸 (left_right, forward_back, up_down, yaw)를 돌려준다.
+    def step(self):
+        now = self.clock.time()
+        with self._lock:
+            measurement = self._measurement
+        dt = now - self._last_step if self._last_step is not None else 1.0 / self.rate
+        self._last_step = now
+        self.steps += 1
+
+        if measurement is None or now - measurement.time > self.lost_timeout + self.camera_latency:
+            # 얼굴을 놓쳤다면 한번만 멈추라고 보내고 기다린다.
+            if self._is_moving:
+                logger.info({'action': 'face_follow', 'status': 'lost'})
+                self._send((0, 0, 0, 0))
+                self._is_moving = False
+            for pid in self.pids.values():
+                pid.reset()
+            return (0, 0, 0, 0)
+
+        latency = now - measurement.time
+        self._update_latency(latency)
+        horizon = min(latency, MAX_COMPENSATION) if self.compensate else 0.0
+        output = {}
+        errors = {}
+        for axis in AXES:
+            rate = measurement.rates[axis]
+            error = measurement.errors[axis] + rate * horizon
+            errors[axis] = error
+            if abs(error) < self.dead_zone:
+                error = 0.0
+            output[axis] = int(round(self.pids[axis].update(error, rate, dt)))
+        self.last_errors = errors
+
+        rc = (0, output['forward_back'], output['up_down'], output['yaw'])
+        if not self._is_moving:
+            logger.info({'action': 'face_follow', 'status': 'tracking'})
+        self._send(rc)
+        self._is_moving = True
+        return rc
+
+    def _send(self, rc):
+        self.last_rc = rc
+        self.sent += 1
+        try:
+            self._send_rc(*rc)
+        except Exception as ex:
+            logger.error({'action': 'face_follow', 'rc': rc, 'ex': ex})
+
+    def _update_latency(self, latency):
+        self.latency_ms = latency * 1000
+        if self.latency_ms_avg is None:
+            self.latency_ms_avg = self.latency_ms
+        else:
+            self.latency_ms_avg += 0.1 * (self.latency_ms - self.latency_ms_avg)
+
+    def start(self):
+        if self.is_running and not self._stop_event.is_set():
+            return
+        self.reset()
+        # 이전 스레드가 아직 종료되지 않았을 수 있기 때문에 새로운 이벤트를 사용
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(self._stop_event,))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def reset(self):
+        with self._lock:
+            self._measurement = None
+        self._last_step = None
+        for pid in self.pids.values():
+            pid.reset()
+
+    def _run(self, stop_event):
+        period = 1.0 / self.rate
+        next_time = time.monotonic()
+        while not stop_event.is_set():
+            try:
+                self.step()
+            except Exception as ex:
+                logger.error({'action': 'face_follow', 'ex': ex})
+            next_time += period
+            wait = next_time - time.monotonic()
+            if wait < 0:
+                # 늦어졌다면 밀린 만큼 한꺼번에 보내지 않고 지금부터 다시 간격을 맞춘다.
+                next_time = time.monotonic()
+                wait = 0
+            stop_event.wait(wait)
+        # 멈출 때는 드론이 제자리에 떠 있도록 한다.
+        if self._is_moving:
+            self._send((0, 0, 0, 0))
+            self._is_moving = False
+
+    def stats(self):
+        return {
+            'running': self.is_running,
+            'rate': self.rate,
+            'compensate': self.compensate,
+            'measurements': self.measurements,
+            'steps': self.steps,
+            'sent': self.sent,
+            'latency_ms': self.latency_ms,
+            'latency_ms_avg': self.latency_ms_avg,
+            'errors': self.last_errors,
+            'rc': self.last_rc,
+        }
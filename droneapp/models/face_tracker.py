@@ -0,0 +1,101 @@
+import cv2 as cv
+
+# 몇 frame마다 한번씩 얼굴인식(cascade)을 다시 실행할지
+DEFAULT_DETECT_INTERVAL = 5
+
+# template matching 결과가 이 값보다 낮다면 추적에 실패했다고 보고 다시 얼굴인식을 실행
+DEFAULT_MIN_CONFIDENCE = 0.6
+
+# 마지막 얼굴 위치 주변을 얼마나 넓게 볼지 (얼굴 크기에 대한 비율)
+TRACK_SEARCH_MARGIN = 0.5
+DETECT_ROI_MARGIN = 1.0
+
+
+# 얼굴인식(cascade)은 N frame마다 또는 추적 신뢰도가 떨어졌을 때만 실행하고
+# 그 사이에는 마지막 얼굴 주변에서 template matching으로 얼굴을 따라가는 클래스
+class FaceTracker(object):
+    def __init__(self, detect, detect_interval=DEFAULT_DETECT_INTERVAL,
+                 min_confidence=DEFAULT_MIN_CONFIDENCE):
+        # 흑백 이미지를 받아 [(x, y, w, h), ...]를 돌려주는 함수
+        self._detect = detect
+        self.detect_interval = detect_interval
+        self.min_confidence = min_confidence
+
+        self.box = None
+        self.confidence = 0.0
+        self._template = None
+        self._frames_since_detect = 0
+
+        # 실행 횟수 (full : 전체 화면 얼굴인식, roi : 주변 영역 얼굴인식, track : template matching)
+        self.full_detections = 0
+        self.roi_detections = 0
+        self.tracks = 0
+
+    def reset(self):
+        self.box = None
+        self.confidence = 0.0
+        self._template = None
+        self._frames_since_detect = 0
+
+    # 흑백 이미지에서 얼굴의 위치를 찾아 [(x, y, w, h)] 또는 []를 돌려준다.
+    def update(self, gray):
+        if self.box is not None and self._frames_since_detect < self.detect_interval:
+            if self._track(gray):
+                self._frames_since_detect += 1
+                return [self.box]
+
+        faces = self._detect_around_box(gray) if self.box is not None else ()
+        if len(faces) == 0:
+            faces = self._detect(gray)
+            self.full_detections += 1
+        if len(faces) == 0:
+            self.reset()
+            return []
+
+        # 여러개의 얼굴이 인식되었다면 가장 큰 얼굴을 따라간다.
+        x, y, w, h = (int(v) for v in max(faces, key=lambda face: face[2] * face[3]))
+        self.box = (x, y, w, h)
+        self.confidence = 1.0
+        self._template = gray[y:y + h, x:x + w].copy()
+        self._frames_since_detect = 0
+        return [self.box]
+
+    @staticmethod
+    def _expand(box, margin, shape):
+        x, y, w, h = box
+        dx, dy = int(w * margin), int(h * margin)
+        x1, y1 = max(0, x - dx), max(0, y - dy)
+        x2, y2 = min(shape[1], x + w + dx), min(shape[0], y + h + dy)
+        return x1, y1, x2, y2
+
+    # 마지막 얼굴 주변만 얼굴인식을 실행
+    def _detect_around_box(self, gray):
+        x1, y1, x2, y2 = self._expand(self.box, DETECT_ROI_MARGIN, gray.shape)
+        self.roi_detections += 1
+        faces = self._detect(gray[y1:y2, x1:x2])
+        return [(x + x1, y + y1, w, h) for (x, y, w, h) in faces]
+
+    # 마지막 얼굴 주변에서 template matching으로 얼굴을 찾는다. 신뢰도가 낮다면 False
+    def _track(self, gray):
+        x1, y1, x2, y2 = self._expand(self.box, TRACK_SEARCH_MARGIN, gray.shape)
+        h, w = self._template.shape
+        if x2 - x1 < w or y2 - y1 < h:
+            return False
+
+        self.tracks += 1
+        result = cv.matchTemplate(gray[y1:y2, x1:x2], self._template, cv.TM_CCOEFF_NORMED)
+        _, confidence, _, location = cv.minMaxLoc(result)
+        self.confidence = confidence
+        if confidence < self.min_confidence:
+            return False
+        self.box = (x1 + location[0], y1 + location[1], w, h)
+        return True
+
+    def stats(self):
+        return {
+            'detect_interval': self.detect_interval,
+            'confidence': self.confidence,
+            'full_detections': self.full_detections,
+            'roi_detections': self.roi_detections,
+            'tracks': self.tracks,
+        }
@@ -0,0 +1,100 @@
+from concurrent.futures import wait
+import logging
+import threading
+import time
+
+import config
+from droneapp.models.base import Singletone
+from droneapp.models.drone_manager import DroneManager
+
+logger = logging.getLogger(__name__)
+
+# 드론 id를 지정하지 않았을 때 사용하는 드론
+DEFAULT_DRONE_ID = 'default'
+
+# 여러 대의 드론에 명령어를 보낼 때 응답을 기다리는 최대 시간(초)
+DEFAULT_FAN_OUT_TIMEOUT = 15
+
+
+# 드론을 찾지 못했을 때를 위한 클래스
+class ErrorUnknownDrone(Exception):
+    """Error unknown drone"""
+
+
+# 여러 대의 드론을 id로 관리하고 같은 명령어를 동시에 보내는 클래스
+class FleetManager(metaclass=Singletone):
+    def __init__(self, drones=None):
+        self._drones = {}
+        self._lock = threading.Lock()
+        # config.FLEET_DRONES = {'tello1': {'host_ip': ..., 'drone_ip': ..., 'host_port': ...}, ...}
+        for drone_id, options in (config.FLEET_DRONES if drones is None else drones).items():
+            self.add(drone_id, **options)
+
+    @property
+    def drone_ids(self):
+        with self._lock:
+            return list(self._drones)
+
+    # 드론마다 다른 주소와 port(host_port, state_port, video_port)를 사용해야 한다.
+    def add(self, drone_id, **options):
+        drone = DroneManager(**options)
+        with self._lock:
+            self._drones[drone_id] = drone
+        logger.info({'action': 'add', 'drone_id': drone_id, 'address': drone.drone_address})
+        return drone
+
+    def get(self, drone_id=None):
+        with self._lock:
+            if drone_id is None or drone_id == DEFAULT_DRONE_ID:
+                if DEFAULT_DRONE_ID not in self._drones:
+                    self._drones[DEFAULT_DRONE_ID] = DroneManager()
+            drone = self._drones.get(drone_id or DEFAULT_DRONE_ID)
+        if drone is None:
+            raise ErrorUnknownDrone(f'Unknown drone {drone_id}')
+        return drone
+
+    def remove(self, drone_id):
+        with self._lock:
+            drone = self._drones.pop(drone_id, None)
+        if drone is None:
+            raise ErrorUnknownDrone(f'Unknown drone {drone_id}')
+        drone.stop()
+        DroneManager.remove_instance(*drone.drone_address)
+
+    # 명령어를 여러 대의 드론에 동시에 보내고 드론마다 응답과 걸린 시간(ms)을 돌려준다.
+    # 각 드론은 자신의 dispatcher 스레드에서 명령어를 보내기 때문에 병렬로 실행된다.
+    def fan_out(self, command, drone_ids=None, timeout=DEFAULT_FAN_OUT_TIMEOUT):
+        drones = {drone_id: self.get(drone_id) for drone_id in (drone_ids or self.drone_ids)}
+        start = time.perf_counter()
+        finished = {}
+        futures = {}
+        for drone_id, drone in drones.items():
+            future = drone.send_command(command)
+            # wait()는 callback보다 먼저 깨어날 수 있기 때문에 결과를 읽을 때 없다면 현재 시간을 사용
+            future.add_done_callback(
+                lambda _, drone_id=drone_id: finished.setdefault(drone_id, time.perf_counter()))
+            futures[drone_id] = future
+
+        wait(futures.values(), timeout=timeout)
+        results = {}
+        for drone_id, future in futures.items():
+            result = {'response': None, 'latency_ms': None}
+            if future.done() and not future.cancelled() and future.exception() is None:
+                result['response'] = future.result()
+                result['latency_ms'] = (finished.get(drone_id, time.perf_counter()) - start) * 1000
+            results[drone_id] = result
+        logger.info({'action': 'fan_out', 'command': command, 'results': results})
+        return results
+
+    # 드론마다 구성요소(명령어, state, decoder, Haar XML, 영상)의 준비 상태
+    def health(self):
+        with self._lock:
+            drones = dict(self._drones)
+        return {drone_id: drone.health() for drone_id, drone in drones.items()}
+
+    def stats(self):
+        with self._lock:
+            drones = dict(self._drones)
+        return {drone_id: {'drone_ip': drone.drone_ip, 'drone_port': drone.drone_port,
+                           'dispatcher': drone.command_dispatcher.stats()}
+                for drone_id, drone in drones.items()}
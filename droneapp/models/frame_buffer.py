@@ -0,0 +1,99 @@
+import threading
+import time
+
+import numpy as np
+
+# 기본적으로 미리 만들어둘 frame의 개수
+DEFAULT_RING_SIZE = 4
+
+
+# 디코딩된 영상을 미리 할당해둔 NumPy 배열에 바로 읽어 넣는 ring buffer
+# 가장 최근 frame만 읽어가며, 읽지 못한 오래된 frame은 덮어쓴다(drop-oldest).
+# 읽어간 frame은 복사본이 아닌 view이기 때문에 ring size - 1개의 frame이 더 쓰이기 전까지만 유효하다.
+class FrameRingBuffer(object):
+    def __init__(self, frame_shape, size=DEFAULT_RING_SIZE, dtype=np.uint8):
+        if size < 2:
+            raise ValueError('ring size must be at least 2')
+        self.frame_shape = tuple(frame_shape)
+        self.size = size
+        self._frames = np.zeros((size,) + self.frame_shape, dtype=dtype)
+        # 각 slot을 byte 단위로 바로 채우기 위한 memoryview
+        self._views = [memoryview(self._frames[i]).cast('B') for i in range(size)]
+        self.frame_bytes = self._frames[0].nbytes
+        # 각 slot의 frame이 디코딩되어 들어온 시간 (time.monotonic)
+        self._times = [None] * size
+
+        # 마지막으로 쓰여진 frame의 sequence 번호 (0이면 아직 frame이 없다)
+        self.sequence = 0
+        # 한번도 읽히지 않고 지나간 frame의 수
+        self.dropped = 0
+        self._read_sequence = 0
+        self._condition = threading.Condition()
+        # 새로운 frame이 들어올 때마다 sequence를 받아 호출되는 함수들 (ex : asyncio event loop에 알림)
+        self._listeners = []
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _slot(self, sequence):
+        return sequence % self.size
+
+    # stream에서 frame 하나를 다음 slot에 바로 읽어 넣는다. 끝(EOF)에 도달하면 False
+    def read_from(self, stream):
+        view = self._views[self._slot(self.sequence + 1)]
+        filled = 0
+        while filled < self.frame_bytes:
+            size = stream.readinto(view[filled:])
+            if not size:
+                return False
+            filled += size
+        self._publish()
+        return True
+
+    # 이미 만들어진 frame을 복사해서 넣는다. (pipe가 아닌 decoder를 사용할 때)
+    def write(self, frame):
+        self._frames[self._slot(self.sequence + 1)][...] = frame
+        self._publish()
+
+    def _publish(self):
+        with self._condition:
+            self._times[self._slot(self.sequence + 1)] = time.monotonic()
+            self.sequence += 1
+            sequence = self.sequence
+            self._condition.notify_all()
+        for callback in list(self._listeners):
+            callback(sequence)
+
+    # 가장 최근 frame의 (sequence, frame view)
+    def latest(self):
+        with self._condition:
+            sequence = self.sequence
+            self._mark_read(sequence)
+        if sequence == 0:
+            return 0, None
+        return sequence, self._frames[self._slot(sequence)]
+
+    # last_sequence 보다 새로운 frame이 들어올 때까지 기다린 뒤 가장 최근 frame을 돌려준다.
+    def wait_next(self, last_sequence, timeout=None):
+        with self._condition:
+            if not self._condition.wait_for(lambda: self.sequence > last_sequence, timeout):
+                return last_sequence, None
+            sequence = self.sequence
+            self._mark_read(sequence)
+        return sequence, self._frames[self._slot(sequence)]
+
+    # frame이 들어온 시간 (time.monotonic). 이미 덮어썼거나 아직 들어오지 않은 frame이라면 None
+    def frame_time(self, sequence):
+        with self._condition:
+            if sequence <= 0 or sequence > self.sequence or sequence <= self.sequence - self.size:
+                return None
+            return self._times[self._slot(sequence)]
+
+    def _mark_read(self, sequence):
+        if sequence > self._read_sequence:
+            self.dropped += sequence - self._read_sequence - 1
+            self._read_sequence = sequence
@@ -0,0 +1,152 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+
+# 파일과 화면에 쓰지 못하고 쌓아둘 수 있는 최대 log 수 (넘으면 새로운 log는 버린다)
+DEFAULT_QUEUE_SIZE = 10000
+
+# 같은 곳(파일, 줄)에서 1초에 남길 수 있는 log 수와 한번에 남길 수 있는 최대 수
+DEFAULT_RATE = 10
+DEFAULT_BURST = 20
+
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s [%(threadName)s] %(message)s'
+
+
+# 로그를 부르는 스레드에서는 queue에 넣기만 하고 문자열로 바꾸는 일(format)은 기록하는 스레드에서 한다.
+# logger.info({'action': ..., 'response': response})의 dict도 파일에 쓸 때 문자열이 된다.
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        # queue가 가득 차서 버린 log의 수
+        self.dropped = 0
+
+    # 기본 QueueHandler는 여기서 메시지를 format한다. record를 그대로 넘겨서 format을 미룬다.
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+# 같은 곳에서 너무 자주 남기는 log는 버리고, 버린 수를 다음에 남기는 log에 적어준다.
+# 영상 / 명령어처럼 빠르게 반복되는 곳의 log가 스레드와 디스크를 막지 않도록 한다. (ERROR 이상은 모두 남긴다)
+class RateLimitFilter(logging.Filter):
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, max_level=logging.WARNING):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.max_level = max_level
+        # (파일, 줄) -> [남은 token, 마지막으로 채운 시간, 버린 수]
+        self._sites = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > self.max_level:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None:
+                site = self._sites[key] = [self.burst, now, 0]
+            site[0] = min(self.burst, site[0] + (now - site[1]) * self.rate)
+            site[1] = now
+            if site[0] < 1:
+                site[2] += 1
+                return False
+            site[0] -= 1
+            suppressed, site[2] = site[2], 0
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+    # 지금까지 버린 log 수 (곳별)
+    def stats(self):
+        with self._lock:
+            return {f'{path}:{line}': site[2] for (path, line), site in self._sites.items() if site[2]}
+
+
+# 빠르게 반복되는 곳(명령어 응답, 영상 수신 등)에서 log record를 만들기 전에 남길지 먼저 정한다.
+# record를 만드는 비용(호출 위치 찾기 등)도 들지 않기 때문에 버리는 log는 비용이 거의 없다.
+#   if self._log_response.allow():
+#       logger.info({...}, extra=self._log_response.extra())
+class LogThrottle(object):
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._last = time.monotonic()
+        # 마지막으로 남긴 뒤 버린 log 수
+        self.suppressed = 0
+
+    def allow(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+        if self._tokens < 1:
+            self.suppressed += 1
+            return False
+        self._tokens -= 1
+        return True
+
+    # 이번 log에 적을 버린 수 (SuppressedFormatter가 메시지 뒤에 적는다)
+    def extra(self):
+        suppressed, self.suppressed = self.suppressed, 0
+        return {'suppressed': suppressed}
+
+
+# 앞에서 버린 log가 있다면 메시지 뒤에 그 수를 적는다.
+class SuppressedFormatter(logging.Formatter):
+    def format(self, record):
+        message = super().format(record)
+        suppressed = getattr(record, 'suppressed', None)
+        if suppressed:
+            message = f'{message} (suppressed {suppressed})'
+        return message
+
+
+# root logger에 queue handler를 등록하고, 별도의 스레드(QueueListener)가 log_file과 stream에 기록한다.
+# 프로그램이 끝날 때 남은 log를 모두 기록한 뒤 종료한다. stop_logging(listener)으로 직접 멈출 수도 있다.
+def setup_logging(level=logging.INFO, log_file=None, stream=sys.stdout,
+                  rate=DEFAULT_RATE, burst=DEFAULT_BURST, queue_size=DEFAULT_QUEUE_SIZE):
+    formatter = SuppressedFormatter(LOG_FORMAT)
+    handlers = []
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    if stream is not None:
+        handlers.append(logging.StreamHandler(stream))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(queue_size)
+    queue_handler = LazyQueueHandler(log_queue)
+    if rate:
+        queue_handler.addFilter(RateLimitFilter(rate, burst))
+
+    # format에서 사용하지 않는 값은 record를 만들 때 구하지 않는다.
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(stop_logging, listener)
+    return listener
+
+
+# 남은 log를 모두 기록하고 기록하는 스레드를 멈춘다. (여러번 불러도 된다)
+def stop_logging(listener):
+    if listener._thread is not None:
+        listener.stop()
@@ -0,0 +1,211 @@
+import bisect
+import collections
+import math
+import threading
+import time
+
+# Prometheus text format(0.0.4)으로 내보내는 가벼운 metric들
+# 측정하는 곳에서는 숫자를 더하기만 하고, 문자열은 /metrics를 요청할 때만 만든다.
+
+# 명령어 왕복시간(초)의 구간 (움직임 명령어는 응답까지 수 초가 걸린다)
+COMMAND_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+# 영상 처리 단계별 시간(초)의 구간
+STAGE_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4'
+
+# collector가 돌려주는 값 하나 (type : 'counter' or 'gauge')
+Sample = collections.namedtuple('Sample', ['name', 'type', 'help', 'labels', 'value'])
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value is None:
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+class _Metric(object):
+    type = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    # 같은 label 값에 대해서는 같은 child를 돌려준다. (자주 사용하는 곳에서는 child를 저장해두고 사용)
+    def labels(self, *values):
+        values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def remove(self, *values):
+        with self._lock:
+            self._children.pop(tuple(str(value) for value in values), None)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+        with self._lock:
+            children = list(self._children.items())
+        for values, child in children:
+            lines.extend(child.render(self.name, list(zip(self.labelnames, values))))
+        return lines
+
+
+class _CounterChild(object):
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def render(self, name, labels):
+        return [f'{name}{_format_labels(labels)} {_format_value(self.value)}']
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+
+class _HistogramChild(object):
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # 마지막 칸은 +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += seconds
+
+    # with histogram.labels(...).time(): 로 걸린 시간을 측정한다.
+    def time(self):
+        return _Timer(self)
+
+    def render(self, name, labels):
+        with self._lock:
+            counts = list(self.counts)
+            total = self.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{_format_labels(labels + [("le", _format_value(bound))])} '
+                         f'{cumulative}')
+        lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(total)}')
+        lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+        return lines
+
+
+class _Timer(object):
+    def __init__(self, child):
+        self._child = child
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._start)
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=STAGE_BUCKETS):
+        super(Histogram, self).__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+
+# metric들과, 요청할 때 현재 값(queue 길이, 버려진 frame 수 등)을 읽어오는 collector들을 모아둔다.
+class Registry(object):
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    # collector : Sample들을 돌려주는 함수
+    def register_collector(self, collector):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def unregister_collector(self, collector):
+        with self._lock:
+            if collector in self._collectors:
+                self._collectors.remove(collector)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+
+        # 여러 collector(드론)가 같은 이름의 값을 돌려줄 수 있기 때문에 이름별로 모아서 쓴다.
+        samples = collections.OrderedDict()
+        for collector in collectors:
+            for sample in collector():
+                samples.setdefault(sample.name, []).append(sample)
+        for name, group in samples.items():
+            lines.append(f'# HELP {name} {group[0].help}')
+            lines.append(f'# TYPE {name} {group[0].type}')
+            for sample in group:
+                lines.append(f'{name}{_format_labels(sorted(sample.labels.items()))} '
+                             f'{_format_value(sample.value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+COMMAND_LATENCY = REGISTRY.register(Histogram(
+    'tello_command_latency_seconds', 'Command round trip time until the drone replies',
+    ('drone', 'command'), COMMAND_BUCKETS))
+COMMAND_TIMEOUTS = REGISTRY.register(Counter(
+    'tello_command_timeouts_total', 'Command attempts that got no reply in time', ('drone', 'command')))
+COMMAND_RETRIES = REGISTRY.register(Counter(
+    'tello_command_retries_total', 'Commands sent again after a timeout', ('drone', 'command')))
+COMMAND_FAILURES = REGISTRY.register(Counter(
+    'tello_command_failures_total', 'Commands that got no reply after all retries', ('drone', 'command')))
+COMMAND_PREEMPTED = REGISTRY.register(Counter(
+    'tello_command_preempted_total', 'Commands cancelled by land or emergency', ('drone', 'command')))
+VIDEO_STAGE = REGISTRY.register(Histogram(
+    'tello_video_stage_seconds',
+    'Time spent per frame in each video stage (receive, decode, face_detect, jpeg_encode, client_write)',
+    ('drone', 'stage'), STAGE_BUCKETS))
@@ -0,0 +1,235 @@
+import collections
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 앞의 명령어를 보낸 뒤 다음 명령어를 보내기까지 최소한 기다리는 시간(초)
+DEFAULT_MIN_SPACING = 0.1
+
+# 단계별 시간 기록을 몇개까지 남겨둘지 (계속 반복하는 patrol에서 메모리가 늘어나지 않도록)
+MAX_TIMINGS = 200
+
+# 미션의 한 단계
+#   action, args : 드론에서 실행할 메소드와 인자 (ex : 'clockwise', (90,))
+#   timeout : 응답을 기다리는 최대 시간(초), None이면 MissionRunner.step_timeout
+#   at : 반복(loop)이 시작된 뒤 이 시간(초)보다 먼저 실행하지 않는다. None이면 응답을 받는 즉시 실행
+MissionStep = collections.namedtuple('MissionStep', ['action', 'args', 'timeout', 'at'])
+MissionStep.__new__.__defaults__ = ((), None, None)
+
+# 실행한 단계의 시간 기록
+#   start : 미션 시작 후 명령어를 보낸 시간, late : at보다 늦어진 시간, ack : 응답을 받기까지 걸린 시간
+StepTiming = collections.namedtuple('StepTiming', ['loop', 'index', 'action', 'start', 'late', 'ack', 'status'])
+
+# 이름으로 실행할 수 있는 미션들 (거리는 m, 각도는 도)
+MISSIONS = {
+    # 위로 올라가서 회전한 뒤 다시 내려오기를 반복
+    'patrol': (
+        MissionStep('up'),
+        MissionStep('clockwise', (2,)),
+        MissionStep('down'),
+    ),
+    # 제자리에서 90도씩 돌면서 주변을 촬영
+    'panorama': (
+        MissionStep('clockwise', (90,)),
+        MissionStep('clockwise', (90,)),
+        MissionStep('clockwise', (90,)),
+        MissionStep('clockwise', (90,)),
+    ),
+    # 사람을 바라본 채로 뒤로 멀어지면서 올라간 뒤 다시 돌아오기
+    # 기본 속도(10cm/s)에서도 한 단계가 MOTION_COMMAND_TIMEOUT 안에 끝나도록 50cm씩 움직인다.
+    'dronie': (
+        MissionStep('back', (0.5,)),
+        MissionStep('up', (0.5,)),
+        MissionStep('down', (0.5,)),
+        MissionStep('forward', (0.5,)),
+    ),
+}
+
+
+# 실제 시간
+class RealClock(object):
+    def __init__(self):
+        self.stop_event = threading.Event()
+
+    def time(self):
+        return time.monotonic()
+
+    # 중간에 멈추라는 이벤트가 들어오면 True
+    def sleep(self, seconds):
+        return self.stop_event.wait(max(0, seconds))
+
+
+# 기다리지 않고 시간만 앞으로 보내는 가상의 시간 (fast-forward 시뮬레이션용)
+class VirtualClock(object):
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(0, seconds)
+        return False
+
+
+# 명령어 목록을 차례대로 실행하는 클래스. 정해진 시간만큼 쉬지 않고 앞의 명령어의 응답을 받는 즉시
+# (min_spacing만큼은 띄워서) 다음 명령어를 보낸다. 반복(loops)과 중단(abort)을 지원하고 단계별 시간을 기록한다.
+class MissionRunner(object):
+    def __init__(self, drone, steps, name='mission', loops=1, min_spacing=DEFAULT_MIN_SPACING,
+                 step_timeout=None, abort_on_error=True, clock=None):
+        self.drone = drone
+        self.steps = tuple(steps)
+        self.name = name
+        # 반복 횟수 (None이면 abort할 때까지 반복)
+        self.loops = loops
+        self.min_spacing = min_spacing
+        self.step_timeout = step_timeout
+        # 응답이 없거나 error라면 남은 단계를 실행하지 않는다.
+        self.abort_on_error = abort_on_error
+        self.clock = clock or RealClock()
+
+        self.is_running = False
+        # 'done', 'aborted', 'timeout', 'error', 'failed'
+        self.result = None
+        self.start_time = None
+        self.loop = 0
+        self.index = None
+        self.timings = collections.deque(maxlen=MAX_TIMINGS)
+        # 반복(loop) 한번에 걸린 시간
+        self.cycle_seconds = collections.deque(maxlen=MAX_TIMINGS)
+
+        self._aborted = False
+        # run_in_background가 스레드를 시작하기 전에 중단 상태를 미리 지웠는지
+        self._prepared = False
+        self._wake = threading.Event()
+        self._thread = None
+
+    # 하나의 단계를 실행한다. 드론 메소드의 결과(Future 또는 응답)를 돌려준다.
+    def execute(self, step):
+        return getattr(self.drone, step.action)(*step.args)
+
+    # 다음 단계를 계속 실행할지 (코스처럼 중간에 끝나는 경우 override)
+    def should_continue(self):
+        return True
+
+    # DroneManager는 Future를 돌려주기 때문에 응답이 오는 즉시 깨어나도록 callback을 등록한다.
+    def _wait_ack(self, result, timeout):
+        if not hasattr(result, 'add_done_callback'):
+            return 'ok'
+        wake = threading.Event()
+        self._wake = wake
+        result.add_done_callback(lambda _: wake.set())
+        if not self._aborted:
+            wake.wait(timeout)
+        if not result.done():
+            return 'aborted' if self._aborted else 'timeout'
+        if result.cancelled():
+            return 'failed'
+        response = result.result()
+        if response is None:
+            # 재시도 후에도 응답이 없었거나 land / emergency 때문에 중단되었다.
+            return 'failed'
+        if isinstance(response, str) and response.startswith('error'):
+            return 'error'
+        return 'ok'
+
+    # 새로 실행하기 전에 이전의 중단 상태를 지운다.
+    def _prepare(self):
+        stop_event = getattr(self.clock, 'stop_event', None)
+        if stop_event is not None:
+            stop_event.clear()
+        self._aborted = False
+        self._prepared = True
+
+    def run(self):
+        clock = self.clock
+        # run_in_background에서 이미 지웠다면 그 사이에 들어온 abort를 지우지 않는다.
+        if not self._prepared:
+            self._prepare()
+        self._prepared = False
+        self.is_running = True
+        self.result = None
+        self.start_time = clock.time()
+        self.loop = 0
+        last_issue = None
+        logger.info({'action': 'mission', 'name': self.name, 'status': 'start', 'loops': self.loops})
+        try:
+            while self.steps and (self.loops is None or self.loop < self.loops):
+                loop_start = clock.time()
+                for index, step in enumerate(self.steps):
+                    self.index = index
+                    now = clock.time()
+                    wait = 0.0 if last_issue is None else last_issue + self.min_spacing - now
+                    if step.at is not None:
+                        wait = max(wait, loop_start + step.at - now)
+                    if self._aborted or (wait > 0 and clock.sleep(wait)):
+                        self.result = 'aborted'
+                        return self.timings
+
+                    issue = clock.time()
+                    late = max(0.0, issue - (loop_start + step.at)) if step.at is not None else 0.0
+                    last_issue = issue
+                    # 코스의 Step처럼 timeout이 없는 단계도 실행할 수 있다.
+                    timeout = getattr(step, 'timeout', None) or self.step_timeout
+                    status = self._wait_ack(self.execute(step), timeout)
+                    ack = clock.time() - issue
+                    self.timings.append(StepTiming(self.loop, index, step.action, issue - self.start_time,
+                                                   late, ack, status))
+                    logger.info({'action': 'mission', 'name': self.name, 'step': step.action,
+                                 'status': status, 'ack': round(ack, 3)})
+                    if status == 'aborted' or (status != 'ok' and self.abort_on_error):
+                        self.result = status
+                        return self.timings
+                    if not self.should_continue():
+                        self.result = 'done'
+                        return self.timings
+                self.cycle_seconds.append(clock.time() - loop_start)
+                self.loop += 1
+            self.result = 'done'
+            return self.timings
+        finally:
+            self.is_running = False
+            self.index = None
+            logger.info({'action': 'mission', 'name': self.name, 'status': self.result,
+                         'loops': self.loop, 'elapsed': clock.time() - self.start_time})
+
+    # 스레드가 시작되기 전에 abort를 부르더라도 무시되지 않도록 중단 상태는 여기서 지운다.
+    def run_in_background(self):
+        self._prepare()
+        self._thread = threading.Thread(target=self.run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self._thread
+
+    # 기다리고 있던 응답이나 시간을 더 기다리지 않고 멈춘다. (이미 보낸 명령어는 드론이 끝까지 실행한다)
+    def abort(self):
+        self._aborted = True
+        stop_event = getattr(self.clock, 'stop_event', None)
+        if stop_event is not None:
+            stop_event.set()
+        self._wake.set()
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'running': self.is_running,
+            'result': self.result,
+            'loop': self.loop,
+            'loops': self.loops,
+            'step': self.index,
+            'last_cycle_seconds': self.cycle_seconds[-1] if self.cycle_seconds else None,
+            'steps': [timing._asdict() for timing in self.timings],
+        }
+
+
+# MISSIONS의 이름으로 미션을 만든다.
+def create_mission(name, drone, loops=1, **options):
+    if name not in MISSIONS:
+        raise ValueError(f'Unknown mission {name}')
+    return MissionRunner(drone, MISSIONS[name], name=name, loops=loops, **options)
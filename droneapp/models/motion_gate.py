@@ -0,0 +1,74 @@
+import cv2 as cv
+import numpy as np
+
+# 변화를 비교할 때 사용하는 작은 흑백 이미지의 크기 (width, height)
+DEFAULT_GATE_SIZE = (64, 48)
+
+# 작은 이미지에서 밝기가 이 값보다 많이 바뀐 pixel을 바뀐 pixel로 본다. (0 ~ 255)
+DEFAULT_PIXEL_THRESHOLD = 12
+
+# 바뀐 pixel의 비율이 이 값 이하라면 화면이 그대로라고 보고 얼굴인식을 건너뛴다.
+DEFAULT_CHANGED_RATIO = 0.002
+
+# 화면이 그대로여도 이 수만큼 건너뛰었다면 한번은 얼굴인식을 실행한다. (조명이 천천히 바뀌는 경우)
+DEFAULT_MAX_SKIP_FRAMES = 30
+
+
+# 드론이 제자리에 떠 있어서 화면이 바뀌지 않았다면 얼굴인식을 건너뛰고 마지막 결과를 다시 사용하도록 알려주는 클래스
+# 마지막으로 얼굴인식을 실행한 frame과 비교하기 때문에 조금씩 쌓이는 변화도 놓치지 않는다.
+class MotionGate(object):
+    def __init__(self, size=DEFAULT_GATE_SIZE, pixel_threshold=DEFAULT_PIXEL_THRESHOLD,
+                 changed_ratio=DEFAULT_CHANGED_RATIO, max_skip_frames=DEFAULT_MAX_SKIP_FRAMES):
+        self.size = tuple(size)
+        self.pixel_threshold = pixel_threshold
+        self.max_changed = int(changed_ratio * self.size[0] * self.size[1])
+        self.max_skip_frames = max_skip_frames
+
+        # 마지막으로 얼굴인식을 실행한 frame의 작은 흑백 이미지
+        self._reference = None
+        self._skipped_in_row = 0
+
+        self.frames = 0
+        self.skipped = 0
+        # 마지막 frame에서 바뀐 pixel의 비율
+        self.changed = None
+
+    def reset(self):
+        self._reference = None
+        self._skipped_in_row = 0
+
+    # 크기를 먼저 줄인 뒤 흑백으로 바꾼다. (전체 frame을 흑백으로 바꾸는 것보다 훨씬 싸다)
+    def _thumbnail(self, frame):
+        small = cv.resize(frame, self.size, interpolation=cv.INTER_AREA)
+        if small.ndim == 3:
+            small = cv.cvtColor(small, cv.COLOR_BGR2GRAY)
+        return small
+
+    # 얼굴인식을 해야 한다면 True, 마지막 결과를 다시 사용해도 된다면 False
+    def should_detect(self, frame):
+        self.frames += 1
+        thumbnail = self._thumbnail(frame)
+        if self._reference is not None and self._skipped_in_row < self.max_skip_frames:
+            changed = np.count_nonzero(cv.absdiff(thumbnail, self._reference) > self.pixel_threshold)
+            self.changed = changed / thumbnail.size
+            if changed <= self.max_changed:
+                self._skipped_in_row += 1
+                self.skipped += 1
+                return False
+        self._reference = thumbnail
+        self._skipped_in_row = 0
+        return True
+
+    @property
+    def skip_ratio(self):
+        return self.skipped / self.frames if self.frames else 0.0
+
+    def stats(self):
+        return {
+            'frames': self.frames,
+            'skipped': self.skipped,
+            'skip_ratio': self.skip_ratio,
+            'changed': self.changed,
+            'pixel_threshold': self.pixel_threshold,
+            'max_skip_frames': self.max_skip_frames,
+        }
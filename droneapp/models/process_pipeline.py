@@ -0,0 +1,363 @@
+import collections
+from concurrent.futures import Future
+import logging
+import multiprocessing
+from multiprocessing import shared_memory
+import queue
+import threading
+import time
+
+import numpy as np
+
+from droneapp.models.face_detector import create_face_detector
+from droneapp.models.face_detector import draw_faces
+from droneapp.models.video_broadcaster import DEFAULT_SUBSCRIBER_QUEUE_SIZE
+from droneapp.models.video_broadcaster import encode_jpeg
+from droneapp.models.video_broadcaster import VideoBroadcaster
+
+logger = logging.getLogger(__name__)
+
+# 얼굴인식, 얼굴 그리기와 JPEG 인코딩을 실행할 프로세스 수의 기본값
+DEFAULT_WORKERS = 2
+# 프로세스마다 동시에 처리할 수 있는 frame 수 (shared memory slot 수 = workers * SLOTS_PER_WORKER)
+SLOTS_PER_WORKER = 2
+# 순서대로 내보내기 위해 늦은 frame을 기다리는 최대 시간(초). 넘으면 그 frame은 건너뛴다.
+REORDER_TIMEOUT = 1.0
+
+# 프로세스가 처리한 한 frame의 결과
+#   jpegs : {VideoProfile: JPEG binary}
+PipelineResult = collections.namedtuple('PipelineResult', ['sequence', 'jpegs', 'encode_seconds'])
+
+# 프로세스가 얼굴인식을 한 결과
+#   detection_id : detect()가 돌려준 Future를 찾기 위한 번호, faces : ((x, y, w, h), ...), error : 실패한 이유
+DetectResult = collections.namedtuple('DetectResult', ['detection_id', 'faces', 'error'])
+
+
+# 프로세스에서 실행되는 함수. frame(pixel)은 queue로 주고받지 않고 shared memory의 slot으로 전달한다.
+#   ('encode', ...) : slot의 frame에 얼굴을 그리고 JPEG 인코딩을 한 뒤 결과(JPEG binary)만 돌려준다.
+#   ('detect', ...) : slot의 frame에서 얼굴인식을 하고 얼굴의 위치만 돌려준다.
+# detector는 (이름, 옵션)이며 첫번째 얼굴인식을 할 때 프로세스 안에서 모델을 읽는다.
+def _worker_main(shm_name, frame_shape, slots, tasks, results, detector=None):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    frames = np.ndarray((slots,) + tuple(frame_shape), dtype=np.uint8, buffer=shm.buf)
+    frame = None
+    face_detector = None
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            kind, slot = task[:2]
+            if kind == 'detect':
+                detection_id = task[2]
+                faces, error = None, None
+                try:
+                    if face_detector is None:
+                        name, options = detector
+                        face_detector = create_face_detector(name, **options).load()
+                    # numpy 배열 대신 int tuple로 돌려준다. (queue로 보내는 크기를 줄이기 위해)
+                    faces = tuple(tuple(int(value) for value in face)
+                                  for face in face_detector.detect(frames[slot]))
+                except Exception as ex:
+                    logger.error({'action': '_worker_main', 'detection_id': detection_id, 'ex': ex})
+                    error = repr(ex)
+                results.put((slot, DetectResult(detection_id, faces, error)))
+                continue
+
+            sequence, profiles, faces = task[2:]
+            # slot은 결과를 돌려줄 때까지 이 프로세스만 사용하기 때문에 복사하지 않고 바로 그린다.
+            frame = frames[slot]
+            jpegs = {}
+            encode_seconds = None
+            try:
+                start = time.perf_counter()
+                if faces:
+                    draw_faces(frame, faces, copy=False)
+                jpegs = {profile: encode_jpeg(frame, profile.quality, profile.scale) for profile in profiles}
+                encode_seconds = time.perf_counter() - start
+            except Exception as ex:
+                logger.error({'action': '_worker_main', 'sequence': sequence, 'ex': ex})
+            results.put((slot, PipelineResult(sequence, jpegs, encode_seconds)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        del frame, frames
+        shm.close()
+
+
+# frame을 shared memory slot에 복사한 뒤 여러 프로세스에 나누어 처리한다.
+# GIL에 막히지 않고 여러 core에서 얼굴인식, 얼굴 그리기와 JPEG 인코딩을 할 수 있다.
+#   submit : 얼굴 그리기와 인코딩. 결과는 sequence 순서대로 on_result로 돌려준다.
+#   detect : 얼굴인식. 결과(얼굴의 위치)는 Future로 돌려준다. (순서를 맞추지 않는다)
+class ProcessVideoPipeline(object):
+    def __init__(self, frame_shape, workers=DEFAULT_WORKERS, slots=None, on_result=None, detector=None):
+        self.frame_shape = tuple(frame_shape)
+        self.workers = workers
+        self.slots = slots or workers * SLOTS_PER_WORKER
+        # 순서대로 정리된 PipelineResult를 받는 함수 (결과를 모으는 스레드에서 호출된다)
+        self._on_result = on_result
+        # 프로세스에서 사용할 얼굴인식 (이름, 옵션). ex : ('haar', {})
+        self.detector = detector
+
+        self._shm = None
+        self._frames = None
+        self._processes = []
+        # 프로세스마다 task queue를 따로 둔다. (한 프로세스가 죽어도 다른 프로세스가 queue를 계속 사용할 수 있도록)
+        self._tasks = []
+        self._results = None
+        self._collect_thread = None
+        self._stop_event = threading.Event()
+
+        # 인코딩을 하는 스레드와 얼굴인식 스레드가 모두 start를 호출할 수 있다.
+        self._start_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._free_slots = collections.deque()
+        # 처리중인 frame : {sequence: (slot, 프로세스 번호)}
+        self._in_flight = {}
+        # 처리중인 얼굴인식 : {detection_id: (slot, 프로세스 번호, Future)}
+        self._detecting = {}
+        self._next_detection_id = 1
+        self._next_sequence = 1
+        # 앞의 frame을 기다리느라 결과를 내보내지 못하기 시작한 시간
+        self._blocked_since = None
+
+        self.submitted = 0
+        self.detections = 0
+        # 빈 slot이 없어서 처리하지 못하고 버린 frame 수
+        self.dropped = 0
+        # 너무 늦어서 순서를 지키지 못하고 건너뛴 frame 수
+        self.skipped = 0
+
+    @property
+    def is_running(self):
+        return self._collect_thread is not None and not self._stop_event.is_set()
+
+    def start(self):
+        with self._start_lock:
+            if not self.is_running:
+                self._start()
+        return self
+
+    def _start(self):
+        frame_bytes = int(np.prod(self.frame_shape))
+        self._shm = shared_memory.SharedMemory(create=True, size=frame_bytes * self.slots)
+        self._frames = np.ndarray((self.slots,) + self.frame_shape, dtype=np.uint8, buffer=self._shm.buf)
+        with self._lock:
+            self._free_slots = collections.deque(range(self.slots))
+            self._in_flight = {}
+            self._detecting = {}
+            self._next_sequence = self.submitted + 1
+            self._blocked_since = None
+
+        # 스레드가 있는 프로세스를 fork하면 lock이 잠긴 채로 복사될 수 있기 때문에 spawn을 사용한다.
+        context = multiprocessing.get_context('spawn')
+        self._tasks = [context.Queue() for _ in range(self.workers)]
+        self._results = context.Queue()
+        self._processes = [
+            context.Process(target=_worker_main, daemon=True,
+                            args=(self._shm.name, self.frame_shape, self.slots, tasks, self._results,
+                                  self.detector))
+            for tasks in self._tasks
+        ]
+        for process in self._processes:
+            process.start()
+
+        self._stop_event = threading.Event()
+        self._collect_thread = threading.Thread(target=self._collect, args=(self._stop_event,))
+        self._collect_thread.daemon = True
+        self._collect_thread.start()
+        logger.info({'action': 'start', 'workers': self.workers, 'slots': self.slots})
+
+    # 살아있는 프로세스 중에서 처리중인 frame이 가장 적은 프로세스의 번호 (모두 죽었다면 None)
+    def _pick_worker(self):
+        busy = collections.Counter(worker for _, worker in self._in_flight.values())
+        busy.update(worker for _, worker, _ in self._detecting.values())
+        alive = [i for i, process in enumerate(self._processes) if process.is_alive()]
+        return min(alive, key=lambda i: busy[i]) if alive else None
+
+    # frame을 빈 slot에 복사하고 프로세스에 보낸다. 빈 slot이 없다면 버리고 None을 돌려준다.
+    #   faces : frame에 그릴 얼굴의 위치 ((x, y, w, h), ...)
+    def submit(self, frame, profiles, faces=()):
+        with self._lock:
+            worker = self._pick_worker() if self._free_slots else None
+            if worker is None:
+                self.dropped += 1
+                return None
+            slot = self._free_slots.popleft()
+            sequence = self.submitted + 1
+            self.submitted = sequence
+            self._in_flight[sequence] = (slot, worker)
+        self._frames[slot][...] = frame
+        self._tasks[worker].put(('encode', slot, sequence, tuple(profiles), tuple(faces)))
+        return sequence
+
+    # frame을 빈 slot에 복사하고 프로세스에서 얼굴인식을 한다. 얼굴의 위치를 받을 Future를 돌려준다.
+    # 빈 slot이 없거나 얼굴인식을 설정하지 않았다면 None을 돌려준다. (호출한 곳에서 직접 얼굴인식)
+    def detect(self, frame):
+        if self.detector is None:
+            return None
+        self.start()
+        future = Future()
+        with self._lock:
+            worker = self._pick_worker() if self._free_slots else None
+            if worker is None:
+                return None
+            slot = self._free_slots.popleft()
+            detection_id = self._next_detection_id
+            self._next_detection_id += 1
+            self._detecting[detection_id] = (slot, worker, future)
+        self._frames[slot][...] = frame
+        self._tasks[worker].put(('detect', slot, detection_id))
+        return future
+
+    # 프로세스들의 결과를 모아서 sequence 순서대로 내보낸다.
+    def _collect(self, stop_event):
+        pending = {}
+        while not stop_event.is_set():
+            try:
+                slot, result = self._results.get(timeout=0.1)
+                if isinstance(result, DetectResult):
+                    self._finish_detection(slot, result)
+                    continue
+                with self._lock:
+                    # 이미 건너뛴 frame의 결과라면 slot도 이미 돌려받았다.
+                    if self._in_flight.pop(result.sequence, None) is not None:
+                        self._free_slots.append(slot)
+                        pending[result.sequence] = result
+            except queue.Empty:
+                pass
+            except (EOFError, OSError):
+                break
+            self._flush(pending)
+
+    def _finish_detection(self, slot, result):
+        with self._lock:
+            detecting = self._detecting.pop(result.detection_id, None)
+            if detecting is None:
+                return
+            self._free_slots.append(slot)
+        self.detections += 1
+        future = detecting[2]
+        if result.error is not None:
+            future.set_exception(RuntimeError(result.error))
+        else:
+            future.set_result(result.faces)
+
+    def _flush(self, pending):
+        while True:
+            result = pending.pop(self._next_sequence, None)
+            if result is None:
+                if not self._skip_late(pending):
+                    return
+                continue
+            self._next_sequence += 1
+            self._blocked_since = None
+            if self._on_result is not None:
+                try:
+                    self._on_result(result)
+                except Exception as ex:
+                    logger.error({'action': '_flush', 'ex': ex})
+
+    # 뒤의 frame 결과가 먼저 와서 기다린 시간이 너무 길다면(프로세스가 죽은 경우 등) 앞의 frame은 건너뛰고 slot을 다시 사용한다.
+    # 보낸 시간이 아니라 뒤의 결과가 도착한 시간부터 재기 때문에 CPU가 바빠서 모두 느린 경우에는 건너뛰지 않는다.
+    def _skip_late(self, pending):
+        if not pending:
+            self._blocked_since = None
+            return False
+        now = time.monotonic()
+        if self._blocked_since is None:
+            self._blocked_since = now
+        if now - self._blocked_since < REORDER_TIMEOUT:
+            return False
+        with self._lock:
+            waiting = self._in_flight.pop(self._next_sequence, None)
+            if waiting is not None:
+                self._free_slots.append(waiting[0])
+        self._blocked_since = None
+        self._next_sequence += 1
+        self.skipped += 1
+        return True
+
+    def stop(self, timeout=2):
+        if self._collect_thread is None:
+            return
+        self._stop_event.set()
+        for tasks in self._tasks:
+            tasks.put(None)
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._collect_thread.join(timeout)
+        self._collect_thread = None
+        # 결과를 받지 못한 얼굴인식은 기다리지 않도록 실패로 끝낸다.
+        with self._lock:
+            detecting, self._detecting = self._detecting, {}
+        for _, _, future in detecting.values():
+            future.set_exception(RuntimeError('Pipeline stopped'))
+        self._processes = []
+        self._tasks = []
+        self._frames = None
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+        logger.info({'action': 'stop', 'stats': self.stats()})
+
+    def stats(self):
+        with self._lock:
+            in_flight = len(self._in_flight) + len(self._detecting)
+        return {
+            'workers': self.workers,
+            'slots': self.slots,
+            'alive': sum(process.is_alive() for process in self._processes),
+            'submitted': self.submitted,
+            'detections': self.detections,
+            'in_flight': in_flight,
+            'dropped': self.dropped,
+            'skipped': self.skipped,
+        }
+
+
+# VideoBroadcaster와 같이 시청자들에게 JPEG을 나누어주지만, 얼굴 그리기와 인코딩은 ProcessVideoPipeline의 프로세스에서 한다.
+# frame을 보낼 때의 시청자와 profile을 기억해두었다가 결과가 순서대로 돌아오면 나누어준다.
+class ProcessVideoBroadcaster(VideoBroadcaster):
+    def __init__(self, source, pipeline, faces=None, queue_size=DEFAULT_SUBSCRIBER_QUEUE_SIZE, timer=None):
+        super().__init__(source, None, queue_size=queue_size, timer=timer)
+        self.pipeline = pipeline
+        self.pipeline._on_result = self._publish_result
+        # frame에 그릴 얼굴의 위치를 돌려주는 함수 (ex : FaceDetectionWorker.latest_faces)
+        self._faces = faces or (lambda: ())
+        # {sequence: [(시청자, profile), ...]}
+        self._targets = {}
+
+    def _produce(self):
+        self.pipeline.start()
+        super()._produce()
+
+    def publish(self, frame, subscribers):
+        targets = [(subscriber, subscriber.profile) for subscriber in subscribers]
+        profiles = {profile for _, profile in targets}
+        with self._lock:
+            sequence = self.pipeline.submit(frame, profiles, self._faces())
+            if sequence is not None:
+                self._targets[sequence] = targets
+
+    def _publish_result(self, result):
+        with self._lock:
+            targets = self._targets.pop(result.sequence, ())
+            # 건너뛴 frame의 시청자 정보는 지운다.
+            for sequence in [sequence for sequence in self._targets if sequence < result.sequence]:
+                del self._targets[sequence]
+        self.frames += 1
+        self.encodes += len(result.jpegs)
+        if self.timer is not None and result.encode_seconds is not None:
+            self.timer.observe(result.encode_seconds)
+        for subscriber, profile in targets:
+            jpeg = result.jpegs.get(profile)
+            if jpeg is not None:
+                subscriber.put(jpeg)
+
+    def stats(self):
+        stats = super().stats()
+        stats['pipeline'] = self.pipeline.stats()
+        return stats
@@ -0,0 +1,168 @@
+import json
+import logging
+import threading
+import time
+
+from droneapp.models.base import Multitone
+from droneapp.models.course import TimedCourseRunner
+
+logger = logging.getLogger(__name__)
+
+# 한 명의 참가자가 1초에 보낼 수 있는 최대 shake 수 (폰의 shake 이벤트가 여러번 들어오는 것을 막는다)
+DEFAULT_SHAKE_RATE = 5.0
+# 한번에 몰아서 보낼 수 있는 최대 shake 수
+DEFAULT_SHAKE_BURST = 5
+# 이 시간(초) 동안 shake를 보내지 않은 참가자는 잊는다.
+CLIENT_EXPIRE_SECONDS = 60
+# 상태가 바뀌지 않아도 연결을 유지하기 위해 SSE comment를 보내는 간격(초)
+KEEPALIVE_SECONDS = 15
+
+
+# 코스 하나에 대해 여러 참가자의 shake를 모아서 실행하고, 바뀐 상태를 구독자들에게 알려주는 클래스
+# 참가자는 여러번의 shake를 한번의 요청(push)으로 보내고, 상태는 SSE(stream)로 받는다.
+# 시간(timed) 또는 응답(paced)으로 진행하는 코스도 이 channel이 runner를 하나만 갖고 실행하고 상태를 알린다.
+class ShakeChannel(metaclass=Multitone):
+    instance_key_arguments = ('course',)
+
+    def __init__(self, course, rate=DEFAULT_SHAKE_RATE, burst=DEFAULT_SHAKE_BURST):
+        self.course = course
+        self.rate = rate
+        self.burst = burst
+        # 참가자마다 (남은 token, 마지막으로 token을 채운 시간)
+        self._clients = {}
+        self._condition = threading.Condition()
+        # 'shake', 'timed' 또는 'paced'
+        self.mode = 'shake'
+        # 시간(timed) 또는 응답(paced)으로 코스를 진행하는 TimedCourseRunner와 그 스레드
+        self._runner = None
+        self._runner_thread = None
+        # 상태가 바뀔 때마다 증가하는 번호 (구독자는 마지막으로 받은 번호보다 새로운 상태만 받는다)
+        self.version = 0
+        self._status = self._make_status()
+
+        # 관찰을 위한 값
+        self.received = 0
+        self.accepted = 0
+        self.subscribers = 0
+
+    def _make_status(self):
+        return {
+            'elapsed': self.course.elapsed,
+            'status': self.course.status,
+            'running': self.course.is_running,
+            'mode': self.mode,
+        }
+
+    # TimedCourseRunner가 코스를 진행하고 있는지
+    @property
+    def is_runner_active(self):
+        return self._runner_thread is not None and self._runner_thread.is_alive()
+
+    def _publish(self):
+        with self._condition:
+            self.version += 1
+            self._status = self._make_status()
+            self._condition.notify_all()
+            return self._status
+
+    # shake로 진행하는 코스를 시작한다. runner가 코스를 진행하고 있다면 None
+    def start(self):
+        with self._condition:
+            if self.is_runner_active:
+                return None
+            self.mode = 'shake'
+            self.course.start()
+            self._clients = {}
+        return self._publish()
+
+    # 시간(paced가 False) 또는 응답(paced가 True)으로 코스를 진행하는 runner를 백그라운드에서 시작한다.
+    # 이미 runner가 코스를 진행하고 있다면 새로 만들지 않고 None을 돌려준다. 진행 상태는 구독자에게 알린다.
+    def start_timed(self, paced=False):
+        with self._condition:
+            if self.is_runner_active:
+                return None
+            self.mode = 'paced' if paced else 'timed'
+            self._runner = TimedCourseRunner(self.course, paced=paced, on_progress=self._publish)
+            self._runner_thread = self._runner.run_in_background()
+        logger.info({'action': 'start_timed', 'course': self.course.name, 'mode': self.mode})
+        return self.latest()[1]
+
+    # 진행중인 코스를 멈춘다. (runner가 기다리던 응답이나 시간을 더 기다리지 않는다)
+    def stop(self):
+        with self._condition:
+            runner = self._runner if self.is_runner_active else None
+            self.course.stop()
+        if runner is not None:
+            runner.stop()
+        return self._publish()
+
+    # 참가자가 보낸 count번의 shake 중 허용된 만큼 코스를 진행시키고 현재 상태를 돌려준다.
+    # token bucket으로 참가자마다 1초에 rate번(최대 burst번 몰아서)까지만 허용한다.
+    def push(self, client_id, count=1):
+        now = time.monotonic()
+        with self._condition:
+            tokens, last = self._clients.get(client_id, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            accepted = min(int(tokens), max(0, count))
+            # runner가 진행하는 코스는 shake로 진행시키지 않는다.
+            if self.is_runner_active:
+                accepted = 0
+            self._clients[client_id] = (tokens - accepted, now)
+            self.received += count
+            self.accepted += accepted
+            if len(self._clients) > 1 and accepted:
+                self._expire(now)
+
+            # 여러 참가자의 요청이 동시에 들어와도 코스는 한번에 하나씩 진행된다.
+            for _ in range(accepted):
+                if not self.course.is_running:
+                    break
+                self.course.run()
+        if accepted:
+            return self._publish()
+        return self.latest()[1]
+
+    def _expire(self, now):
+        for client_id, (_, last) in list(self._clients.items()):
+            if now - last > CLIENT_EXPIRE_SECONDS:
+                del self._clients[client_id]
+
+    def latest(self):
+        with self._condition:
+            return self.version, self._status
+
+    # version 보다 새로운 상태가 나올 때까지 기다린다. 시간이 지나면 (version, None)
+    def wait_next(self, version, timeout=None):
+        with self._condition:
+            if not self._condition.wait_for(lambda: self.version > version, timeout):
+                return version, None
+            return self.version, self._status
+
+    # Server-Sent Events 형식으로 상태가 바뀔 때마다 가장 최근 상태만 보낸다.
+    def stream(self, keepalive=KEEPALIVE_SECONDS):
+        with self._condition:
+            self.subscribers += 1
+        try:
+            version, status = self.latest()
+            yield f'data: {json.dumps(status)}\n\n'
+            while True:
+                version, status = self.wait_next(version, timeout=keepalive)
+                if status is None:
+                    yield ': keepalive\n\n'
+                    continue
+                yield f'data: {json.dumps(status)}\n\n'
+        finally:
+            with self._condition:
+                self.subscribers -= 1
+
+    def stats(self):
+        with self._condition:
+            return {
+                'clients': len(self._clients),
+                'subscribers': self.subscribers,
+                'received': self.received,
+                'accepted': self.accepted,
+                'version': self.version,
+                'mode': self.mode,
+                'runner': self._runner.stats() if self._runner is not None else None,
+            }
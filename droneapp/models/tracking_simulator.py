@@ -0,0 +1,191 @@
+import collections
+import logging
+import math
+import random
+
+from droneapp.models.drone_manager import FRAME_X
+from droneapp.models.drone_manager import FRAME_Y
+from droneapp.models.face_detection import DEFAULT_DETECT_RATE
+from droneapp.models.face_follow import AXES
+from droneapp.models.face_follow import DEFAULT_CAMERA_LATENCY
+from droneapp.models.face_follow import FaceFollowController
+from droneapp.models.mission import VirtualClock
+
+logger = logging.getLogger(__name__)
+
+# rc 100일 때의 속도 (m/s, 도/초)
+RC_MAX_SPEED = 1.0
+RC_MAX_YAW_SPEED = 100.0
+# 드론의 속도가 rc 값을 따라가는 시간 상수(초)
+VELOCITY_TIME_CONSTANT = 0.3
+
+# 카메라의 가로 화각(도)
+CAMERA_HFOV = 70.0
+# 얼굴의 폭(m)
+FACE_WIDTH = 0.16
+
+# 한번의 얼굴인식에 걸리는 시간(초)
+DEFAULT_DETECT_SECONDS = 0.03
+# 얼굴인식 결과의 위치 오차(pixel, 표준편차)
+DEFAULT_NOISE = 1.0
+# 물리 계산 간격(초)
+DEFAULT_TIME_STEP = 0.005
+
+# 오차가 이 값보다 작으면 얼굴이 목표 위치에 왔다고 본다. (정규화된 오차)
+SETTLE_ERROR = 0.05
+
+# 시뮬레이션 시나리오
+#   face : 얼굴의 처음 위치 (x, y, z), face_velocity : 얼굴의 속도 (m/s), duration : 실행할 시간(초)
+#   x는 오른쪽, y는 드론의 앞쪽, z는 높이이고 드론은 (0, 0, 1)에서 y 방향을 보고 시작한다.
+Scenario = collections.namedtuple('Scenario', ['face', 'face_velocity', 'duration'])
+
+SCENARIOS = {
+    # 오른쪽 위 2m 앞에 서있는 사람을 화면 가운데로 (계단 응답 : 도달 시간과 overshoot)
+    'offset': Scenario((0.9, 1.8, 1.4), (0.0, 0.0, 0.0), 8.0),
+    # 옆으로 걸어가는 사람을 따라간다. (추적 오차)
+    'walk': Scenario((0.0, 1.0, 1.0), (0.5, 0.0, 0.0), 8.0),
+    # 멀어지는 사람을 따라간다.
+    'retreat': Scenario((0.0, 0.8, 1.0), (0.0, 0.4, 0.0), 8.0),
+}
+
+
+# rc 값에 따라 속도가 바뀌는 드론과 그 카메라에 보이는 얼굴
+class SimulatedScene(object):
+    def __init__(self, scenario, frame_size=(FRAME_X, FRAME_Y), noise=DEFAULT_NOISE, seed=0):
+        self.frame_width, self.frame_height = frame_size
+        self.focal = (self.frame_width / 2) / math.tan(math.radians(CAMERA_HFOV / 2))
+        self.noise = noise
+        self._random = random.Random(seed)
+
+        self.position = [0.0, 0.0, 1.0]
+        # 시계방향 회전 각도(도). 0이면 y 방향을 본다.
+        self.yaw = 0.0
+        # 드론 기준 (오른쪽, 앞, 위) 속도와 회전 속도
+        self.velocity = [0.0, 0.0, 0.0]
+        self.yaw_speed = 0.0
+        self.rc = (0, 0, 0, 0)
+        self.rc_sent = 0
+
+        self.face = list(scenario.face)
+        self.face_velocity = scenario.face_velocity
+
+    # FaceFollowController가 부르는 함수
+    def send_rc(self, left_right, forward_back, up_down, yaw):
+        self.rc = (left_right, forward_back, up_down, yaw)
+        self.rc_sent += 1
+
+    def advance(self, dt):
+        left_right, forward_back, up_down, yaw = self.rc
+        alpha = min(1.0, dt / VELOCITY_TIME_CONSTANT)
+        targets = (left_right / 100 * RC_MAX_SPEED, forward_back / 100 * RC_MAX_SPEED, up_down / 100 * RC_MAX_SPEED)
+        self.velocity = [v + alpha * (target - v) for v, target in zip(self.velocity, targets)]
+        self.yaw_speed += alpha * (yaw / 100 * RC_MAX_YAW_SPEED - self.yaw_speed)
+
+        heading = math.radians(self.yaw)
+        right, forward, up = self.velocity
+        self.position[0] += (right * math.cos(heading) + forward * math.sin(heading)) * dt
+        self.position[1] += (-right * math.sin(heading) + forward * math.cos(heading)) * dt
+        self.position[2] += up * dt
+        self.yaw += self.yaw_speed * dt
+        for i in range(3):
+            self.face[i] += self.face_velocity[i] * dt
+
+    # 지금 카메라에 보이는 얼굴의 (x, y, w, h). 화면 밖이라면 None
+    def face_box(self):
+        heading = math.radians(self.yaw)
+        dx, dy, dz = (self.face[i] - self.position[i] for i in range(3))
+        forward = dx * math.sin(heading) + dy * math.cos(heading)
+        right = dx * math.cos(heading) - dy * math.sin(heading)
+        if forward < 0.1:
+            return None
+        size = self.focal * FACE_WIDTH / forward
+        center_x = self.frame_width / 2 + self.focal * right / forward
+        center_y = self.frame_height / 2 - self.focal * dz / forward
+        if not (0 <= center_x < self.frame_width and 0 <= center_y < self.frame_height):
+            return None
+        return (center_x - size / 2, center_y - size / 2, size, size)
+
+    # 얼굴인식 결과처럼 정수 pixel과 위치 오차가 있는 얼굴 목록
+    def detect(self, box):
+        if box is None:
+            return ()
+        x, y, w, h = box
+        jitter = lambda: self._random.gauss(0, self.noise) if self.noise else 0.0
+        return ((int(round(x + jitter())), int(round(y + jitter())), int(round(w)), int(round(h))),)
+
+
+# 축별 오차 기록에서 도달 시간, 안정 시간, overshoot, 평균 제곱근 오차를 구한다.
+def _axis_metrics(trace, axis):
+    values = [(t, errors[axis]) for t, errors in trace if errors is not None]
+    if not values:
+        return {'reach_seconds': None, 'settle_seconds': None, 'overshoot': None, 'rms': None, 'final': None}
+    first = values[0][1]
+    reach = next((t for t, error in values if abs(error) < SETTLE_ERROR), None)
+    settle = None
+    for t, error in values:
+        if abs(error) >= SETTLE_ERROR:
+            settle = None
+        elif settle is None:
+            settle = t
+    # 처음 오차의 반대쪽으로 넘어간 최대 크기
+    overshoot = max([0.0] + [-error if first > 0 else error for _, error in values])
+    rms = math.sqrt(sum(error * error for _, error in values) / len(values))
+    return {'reach_seconds': reach, 'settle_seconds': settle, 'overshoot': overshoot, 'rms': rms,
+            'final': values[-1][1]}
+
+
+# 시나리오를 가상의 시간으로 끝까지 실행하고 축별 추적 성능을 돌려준다.
+# 얼굴인식은 detect_rate마다 가장 최근 frame에 실행되고, 결과는 camera_latency + detect_seconds 뒤에 도착한다.
+#   controller_options : FaceFollowController의 인자 (rate, gains, compensate, camera_latency 등)
+def simulate_tracking(scenario='offset', controller_options=None, detect_rate=DEFAULT_DETECT_RATE,
+                      detect_seconds=DEFAULT_DETECT_SECONDS, camera_latency=DEFAULT_CAMERA_LATENCY,
+                      noise=DEFAULT_NOISE, duration=None, seed=0, dt=DEFAULT_TIME_STEP):
+    if scenario not in SCENARIOS:
+        raise ValueError(f'Unknown scenario {scenario}')
+    setup = SCENARIOS[scenario]
+    duration = duration or setup.duration
+    clock = VirtualClock()
+    scene = SimulatedScene(setup, noise=noise, seed=seed)
+    controller = FaceFollowController(scene.send_rc, (scene.frame_width, scene.frame_height),
+                                      clock=clock, **(controller_options or {}))
+
+    # 카메라 지연만큼 지난 얼굴 위치를 꺼내기 위한 기록
+    history = collections.deque(maxlen=max(1, int(round(camera_latency / dt))) + 1)
+    # (도착 시간, 얼굴 목록, decoder에서 나온 시간)
+    arrivals = collections.deque()
+    trace = []
+    next_detect = next_control = 0.0
+    steps = int(round(duration / dt))
+    for i in range(steps + 1):
+        now = i * dt
+        clock.now = now
+        box = scene.face_box()
+        history.append(box)
+        trace.append((now, controller.face_errors([box]) if box is not None else None))
+
+        if now >= next_detect:
+            # 지금 decoder에서 나온 frame은 camera_latency 전에 찍힌 frame이다.
+            arrivals.append((now + detect_seconds, scene.detect(history[0]), now))
+            next_detect += 1.0 / detect_rate
+        while arrivals and arrivals[0][0] <= now:
+            _, faces, frame_time = arrivals.popleft()
+            controller.update(faces, frame_time)
+        if now >= next_control:
+            controller.step()
+            next_control += 1.0 / controller.rate
+        scene.advance(dt)
+
+    result = {
+        'scenario': scenario,
+        'duration': duration,
+        'lost_seconds': sum(dt for _, errors in trace if errors is None),
+        'rc_sent': scene.rc_sent,
+        'latency_ms_avg': controller.latency_ms_avg,
+        'controller': {key: value for key, value in controller.stats().items()
+                       if key in ('rate', 'compensate', 'measurements', 'sent')},
+    }
+    for axis in AXES:
+        result[axis] = _axis_metrics(trace, axis)
+    logger.info({'action': 'simulate_tracking', 'scenario': scenario,
+                 'yaw_overshoot': result['yaw']['overshoot'], 'yaw_reach': result['yaw']['reach_seconds']})
+    return result
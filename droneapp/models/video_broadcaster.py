@@ -0,0 +1,197 @@
+import collections
+import logging
+import queue
+import threading
+import time
+
+import cv2 as cv
+
+logger = logging.getLogger(__name__)
+
+# 시청자마다 쌓아둘 수 있는 최대 frame 수 (넘으면 가장 오래된 frame을 버린다)
+DEFAULT_SUBSCRIBER_QUEUE_SIZE = 2
+
+# JPEG 품질(0 ~ 100)과 크기 비율의 기본값
+DEFAULT_JPEG_QUALITY = 80
+DEFAULT_SCALE = 1.0
+
+# 시청자가 늦어질 때 품질을 얼마나, 어디까지 낮출지
+MIN_JPEG_QUALITY = 30
+QUALITY_STEP = 10
+# 이 수만큼의 frame을 버리지 않고 받았다면 품질을 다시 한단계 올린다.
+RECOVER_FRAMES = 30
+
+# 시청자가 원하는 영상의 품질과 크기
+VideoProfile = collections.namedtuple('VideoProfile', ['quality', 'scale'])
+DEFAULT_PROFILE = VideoProfile(DEFAULT_JPEG_QUALITY, DEFAULT_SCALE)
+
+
+def make_profile(quality=None, scale=None):
+    quality = DEFAULT_JPEG_QUALITY if quality is None else int(quality)
+    scale = DEFAULT_SCALE if scale is None else float(scale)
+    return VideoProfile(min(100, max(1, quality)), min(1.0, max(0.1, scale)))
+
+
+# frame을 원하는 품질(quality)과 크기(scale)의 JPEG binary로 바꾼다.
+def encode_jpeg(frame, quality=DEFAULT_JPEG_QUALITY, scale=DEFAULT_SCALE):
+    if scale != 1.0:
+        frame = cv.resize(frame, None, fx=scale, fy=scale, interpolation=cv.INTER_AREA)
+    _, jpeg = cv.imencode('.jpg', frame, [cv.IMWRITE_JPEG_QUALITY, int(quality)])
+    return jpeg.tobytes()
+
+
+# 영상을 보고 있는 한명의 시청자
+class VideoSubscriber(object):
+    def __init__(self, profile=DEFAULT_PROFILE, maxsize=DEFAULT_SUBSCRIBER_QUEUE_SIZE):
+        self.queue = queue.Queue(maxsize=maxsize)
+        # 시청자가 요청한 품질과, 전송 속도에 따라 낮아질 수 있는 현재 품질
+        self.requested = profile
+        self.quality = profile.quality
+        # 시청자가 늦어서 버려진 frame의 수
+        self.dropped = 0
+        self._good_frames = 0
+
+    # 이번 frame을 인코딩할 때 사용할 품질과 크기
+    @property
+    def profile(self):
+        return VideoProfile(self.quality, self.requested.scale)
+
+    # 시청자의 queue가 가득 찼다면 가장 오래된 frame을 버리고 새로운 frame을 넣는다.
+    def put(self, jpeg):
+        is_dropped = False
+        while True:
+            try:
+                self.queue.put_nowait(jpeg)
+                break
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                    is_dropped = True
+                except queue.Empty:
+                    pass
+        self._adapt(is_dropped)
+
+    # 시청자가 frame을 제때 가져가지 못한다면 품질을 낮추고, 다시 따라잡으면 원래대로 올린다.
+    def _adapt(self, is_dropped):
+        if is_dropped:
+            self._good_frames = 0
+            self.quality = max(min(MIN_JPEG_QUALITY, self.requested.quality),
+                               self.quality - QUALITY_STEP)
+            return
+        self._good_frames += 1
+        if self._good_frames >= RECOVER_FRAMES and self.quality < self.requested.quality:
+            self._good_frames = 0
+            self.quality = min(self.requested.quality, self.quality + QUALITY_STEP)
+
+    def stats(self):
+        return {
+            'quality': self.quality,
+            'requested_quality': self.requested.quality,
+            'scale': self.requested.scale,
+            'dropped': self.dropped,
+        }
+
+
+# 하나의 producer가 frame마다 한번만 얼굴인식과 JPEG 인코딩을 한 뒤 모든 시청자에게 나누어준다.
+# 같은 품질과 크기를 원하는 시청자들은 하나의 인코딩 결과를 함께 사용한다.
+class VideoBroadcaster(object):
+    def __init__(self, source, encode, queue_size=DEFAULT_SUBSCRIBER_QUEUE_SIZE, timer=None):
+        # frame을 돌려주는 generator 함수 (ex : DroneManager.video_frame_generator)
+        self._source = source
+        # (frame, quality, scale)을 받아 JPEG binary를 돌려주는 함수
+        self._encode = encode
+        self.queue_size = queue_size
+        # JPEG 인코딩에 걸린 시간을 기록할 histogram (metrics.VIDEO_STAGE의 child)
+        self.timer = timer
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+        # frame 수와 실제로 인코딩한 횟수
+        self.frames = 0
+        self.encodes = 0
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def subscribe(self, profile=DEFAULT_PROFILE):
+        subscriber = VideoSubscriber(profile, self.queue_size)
+        with self._lock:
+            self._subscribers.append(subscriber)
+            # 첫번째 시청자가 들어왔을 때 producer를 실행
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._produce)
+                self._thread.daemon = True
+                self._thread.start()
+        logger.info({'action': 'subscribe', 'subscribers': len(self._subscribers),
+                     'profile': profile})
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+        logger.info({'action': 'unsubscribe', 'dropped': subscriber.dropped})
+
+    def _produce(self):
+        try:
+            for frame in self._source():
+                with self._lock:
+                    subscribers = list(self._subscribers)
+                    # 시청자가 아무도 없다면 인코딩하지 않고 producer를 종료 (다음 시청자가 들어오면 다시 실행)
+                    if not subscribers:
+                        self._thread = None
+                        return
+                self.publish(frame, subscribers)
+        except Exception as ex:
+            logger.error({'action': '_produce', 'ex': ex})
+        with self._lock:
+            self._thread = None
+
+    # frame을 시청자들이 원하는 profile별로 한번씩만 인코딩해서 나누어준다.
+    def publish(self, frame, subscribers):
+        self.frames += 1
+        cache = {}
+        for subscriber in subscribers:
+            profile = subscriber.profile
+            jpeg = cache.get(profile)
+            if jpeg is None:
+                start = time.perf_counter()
+                jpeg = self._encode(frame, profile.quality, profile.scale)
+                if self.timer is not None:
+                    self.timer.observe(time.perf_counter() - start)
+                cache[profile] = jpeg
+                self.encodes += 1
+            subscriber.put(jpeg)
+
+    # 한명의 시청자로 등록한 뒤 JPEG binary를 계속해서 돌려준다.
+    def stream(self, profile=DEFAULT_PROFILE, timeout=1):
+        subscriber = self.subscribe(profile)
+        try:
+            while True:
+                try:
+                    jpeg = subscriber.queue.get(timeout=timeout)
+                except queue.Empty:
+                    continue
+                yield jpeg
+        finally:
+            self.unsubscribe(subscriber)
+
+    # 시청자들의 queue에 쌓여있는 frame 수와 늦어서 버려진 frame 수
+    def queue_stats(self):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        return (sum(subscriber.queue.qsize() for subscriber in subscribers),
+                sum(subscriber.dropped for subscriber in subscribers))
+
+    def stats(self):
+        with self._lock:
+            subscribers = [subscriber.stats() for subscriber in self._subscribers]
+        return {
+            'frames': self.frames,
+            'encodes': self.encodes,
+            'subscribers': subscribers,
+        }
@@ -0,0 +1,169 @@
+import logging
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+# PyAV가 설치되어 있는 경우에만 프로세스 안에서 디코딩할 수 있다.
+try:
+    import av
+except ImportError:
+    av = None
+
+logger = logging.getLogger(__name__)
+
+CMD_FFMPEG = ('ffmpeg -hwaccel auto -hwaccel_device opencl -i pipe:0 '
+              '-pix_fmt bgr24 -s {width}x{height} -f rawvideo pipe:1')
+
+
+# 설정한 decoder를 사용할 수 없을 때를 위한 클래스
+class ErrorVideoDecoderNotAvailable(Exception):
+    """Error video decoder not available"""
+
+
+# H.264 데이터를 받아 디코딩한 BGR frame을 FrameRingBuffer에 넣는 decoder의 기본 틀
+class BaseVideoDecoder(object):
+    name = None
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.frame_buffer = None
+        # 디코딩에 걸린 시간을 기록할 histogram (metrics.VIDEO_STAGE의 child)
+        self.timer = None
+
+    # 디코딩한 frame을 넣을 ring buffer를 받아 decoder를 실행
+    def start(self, frame_buffer):
+        self.frame_buffer = frame_buffer
+
+    # H.264 데이터(access unit 단위)를 decoder에 넣는다.
+    def write(self, data):
+        raise NotImplementedError
+
+    def stop(self):
+        pass
+
+
+# ffmpeg를 subprocess로 실행하고 stdin / stdout pipe로 데이터를 주고받는 decoder
+class FfmpegVideoDecoder(BaseVideoDecoder):
+    name = 'ffmpeg'
+
+    def __init__(self, width, height):
+        super(FfmpegVideoDecoder, self).__init__(width, height)
+        self.proc = None
+        self._read_thread = None
+        # 아직 frame으로 나오지 않은 데이터를 처음 넣은 시간 (ffmpeg 안에서의 디코딩 시간 측정용)
+        self._write_time = None
+
+    def start(self, frame_buffer):
+        super(FfmpegVideoDecoder, self).start(frame_buffer)
+        cmd = CMD_FFMPEG.format(width=self.width, height=self.height)
+        try:
+            self.proc = subprocess.Popen(cmd.split(' '),
+                                         stdin=subprocess.PIPE,
+                                         stdout=subprocess.PIPE)
+        except OSError as ex:
+            raise ErrorVideoDecoderNotAvailable(f'Cannot run ffmpeg : {ex}')
+
+        # FFMPEG의 출력을 frame 단위로 ring buffer에 읽어 넣는 스레드
+        self._read_thread = threading.Thread(target=self._read_frames,
+                                             args=(self.proc.stdout,))
+        self._read_thread.daemon = True
+        self._read_thread.start()
+
+    def _read_frames(self, pipe_out):
+        while True:
+            try:
+                if not self.frame_buffer.read_from(pipe_out):
+                    logger.warning({'action': '_read_frames', 'status': 'eof'})
+                    break
+                write_time = self._write_time
+                if self.timer is not None and write_time is not None:
+                    self._write_time = None
+                    self.timer.observe(time.perf_counter() - write_time)
+            except Exception as ex:
+                logger.error({'action': '_read_frames', 'ex': ex})
+                break
+
+    def write(self, data):
+        if self._write_time is None:
+            self._write_time = time.perf_counter()
+        self.proc.stdin.write(data)
+        self.proc.stdin.flush()
+
+    def stop(self):
+        if self.proc is None or self.proc.poll() is not None:
+            # ffmpeg가 이미 종료된 경우
+            return
+        if sys.platform == 'win32':
+            # Window에서 kill을 실행하는 방법
+            os.kill(self.proc.pid, signal.CTRL_C_EVENT)
+        else:
+            # Linux에서 kill을 실행하는 방법
+            os.kill(self.proc.pid, signal.SIGKILL)
+        self.proc.wait()
+
+
+# PyAV(libavcodec)를 이용해 프로세스 안에서 바로 디코딩하는 decoder (pipe를 거치지 않는다)
+class PyAVVideoDecoder(BaseVideoDecoder):
+    name = 'pyav'
+
+    def __init__(self, width, height):
+        super(PyAVVideoDecoder, self).__init__(width, height)
+        if av is None:
+            raise ErrorVideoDecoderNotAvailable('No module named av (pip install av)')
+        self.codec = av.CodecContext.create('h264', 'r')
+        self._is_flushed = False
+
+    def write(self, data):
+        try:
+            packets = self.codec.parse(bytes(data))
+        except Exception as ex:
+            logger.warning({'action': 'write', 'ex': ex})
+            return
+        for packet in packets:
+            self._decode(packet)
+
+    # packet이 None이라면 decoder 안에 남아있는 frame을 모두 내보낸다.
+    def _decode(self, packet):
+        start = time.perf_counter()
+        try:
+            frames = self.codec.decode(packet)
+        except Exception as ex:
+            # 조각을 잃어버린 frame은 디코딩에 실패할 수 있다.
+            logger.warning({'action': '_decode', 'ex': ex})
+            return
+        for frame in frames:
+            image = frame.to_ndarray(width=self.width, height=self.height, format='bgr24')
+            if self.timer is not None:
+                self.timer.observe(time.perf_counter() - start)
+            self.frame_buffer.write(image)
+
+    # parser와 decoder는 다음 데이터를 기다리며 마지막 몇 frame을 가지고 있기 때문에 멈출 때 내보낸다.
+    def stop(self):
+        if self.frame_buffer is None or self._is_flushed:
+            return
+        self._is_flushed = True
+        try:
+            packets = self.codec.parse(None)
+        except Exception as ex:
+            logger.warning({'action': 'stop', 'ex': ex})
+            packets = []
+        for packet in packets:
+            self._decode(packet)
+        self._decode(None)
+
+
+VIDEO_DECODERS = {
+    FfmpegVideoDecoder.name: FfmpegVideoDecoder,
+    PyAVVideoDecoder.name: PyAVVideoDecoder,
+}
+
+
+# config.VIDEO_DECODER 와 같은 이름으로 decoder를 만든다.
+def create_video_decoder(name, width, height):
+    if name not in VIDEO_DECODERS:
+        raise ErrorVideoDecoderNotAvailable(f'Unknown video decoder {name}')
+    return VIDEO_DECODERS[name](width, height)
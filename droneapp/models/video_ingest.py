@@ -0,0 +1,121 @@
+import select
+import socket
+import time
+
+# Tello는 하나의 frame을 1460 byte 단위로 쪼개서 보내고, 마지막 조각만 1460 byte보다 작다.
+TELLO_VIDEO_PACKET_SIZE = 1460
+
+H264_START_CODE = b'\x00\x00\x00\x01'
+
+# 끝을 알리는 조각을 잃어버려 frame이 끝없이 커지는 것을 막기 위한 최대 크기
+MAX_FRAME_BYTES = 1024 * 1024
+
+# 커널의 수신 버퍼 크기 (Python에서 잠시 늦어져도 패킷을 잃지 않도록 크게 설정)
+VIDEO_RECV_BUFFER_SIZE = 4 * 1024 * 1024
+
+# 한번 깨어났을 때 기다리지 않고 연속해서 읽을 최대 패킷 수
+VIDEO_RECV_BATCH = 64
+
+
+# Tello가 쪼개서 보낸 조각들을 하나의 frame(access unit)으로 다시 모으는 클래스
+class H264FrameAssembler(object):
+    def __init__(self, packet_size=TELLO_VIDEO_PACKET_SIZE):
+        self.packet_size = packet_size
+        self._frame = bytearray()
+
+        self.packets = 0
+        self.bytes = 0
+        self.frames = 0
+        # decoder에 보내지 않고 버린 frame의 수. 첫 조각을 잃어버려 start code로 시작하지 않는 frame과
+        # 끝 조각을 계속 잃어버려 MAX_FRAME_BYTES를 넘은 frame만 센다.
+        # 중간 조각만 잃어버린 frame은 조각의 크기로 구별할 수 없기 때문에 그대로 decoder에 보내고 세지 않는다.
+        # (끝 조각을 잃어버린 frame은 다음 frame과 합쳐져서 함께 보내진다) 실제 손실은 이 값보다 많을 수 있다.
+        self.dropped_frames = 0
+        # decoder로 보낸 횟수
+        self.writes = 0
+        # frame의 첫 조각부터 마지막 조각까지 걸린 시간을 기록할 histogram (metrics.VIDEO_STAGE의 child)
+        self.timer = None
+        self._frame_start = None
+        # 완성된 frame을 받을 함수 (ex : StreamRecorder.write)
+        self.on_frame = None
+
+    # 조각 하나를 추가하고, frame이 완성되었다면 out에 이어 붙인 뒤 True를 돌려준다.
+    def feed(self, data, out):
+        size = len(data)
+        self.packets += 1
+        self.bytes += size
+        if not self._frame and self.timer is not None:
+            self._frame_start = time.perf_counter()
+        self._frame += data
+
+        if size == self.packet_size:
+            if len(self._frame) > MAX_FRAME_BYTES:
+                self.dropped_frames += 1
+                self._frame.clear()
+            return False
+
+        # 첫 조각을 잃어버려 frame이 start code로 시작하지 않는다면 decoder에 보내지 않는다.
+        # 중간 조각을 잃어버린 frame은 여기서 알 수 없고, 깨진 부분은 decoder가 처리한다.
+        is_complete = self._frame.startswith(H264_START_CODE)
+        if is_complete:
+            out += self._frame
+            self.frames += 1
+            if self.timer is not None and self._frame_start is not None:
+                self.timer.observe(time.perf_counter() - self._frame_start)
+            if self.on_frame is not None:
+                self.on_frame(self._frame)
+        else:
+            self.dropped_frames += 1
+        self._frame.clear()
+        return is_complete
+
+    def stats(self):
+        return {
+            'packets': self.packets,
+            'bytes': self.bytes,
+            'frames': self.frames,
+            'dropped_frames': self.dropped_frames,
+            'writes': self.writes,
+        }
+
+
+# H.264 byte stream을 start code를 포함한 NAL unit 단위로 나눈다.
+def split_nal_units(data):
+    return [H264_START_CODE + unit for unit in bytes(data).split(H264_START_CODE) if unit]
+
+
+# 화면 하나를 담고 있는 NAL unit인지 (1 : 일반 slice, 5 : keyframe(IDR) slice)
+def is_picture_unit(unit):
+    return len(unit) > 4 and unit[4] & 0x1f in (1, 5)
+
+
+def is_keyframe_unit(unit):
+    return len(unit) > 4 and unit[4] & 0x1f in (5, 7)
+
+
+# 수신 버퍼를 크게 만든 video socket (기다리는 것은 receive_batch에서 select로 한다)
+def open_video_socket(host_ip, video_port):
+    sock_video = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock_video.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock_video.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, VIDEO_RECV_BUFFER_SIZE)
+    sock_video.setblocking(False)
+    sock_video.bind((host_ip, video_port))
+    return sock_video
+
+
+# 패킷이 도착할 때까지 기다린 뒤, 이미 도착해 있는 패킷들을 최대 batch개까지 한번에 읽는다.
+def receive_batch(sock_video, packet, assembler, out, timeout=.5, batch=VIDEO_RECV_BATCH):
+    readable, _, _ = select.select([sock_video], [], [], timeout)
+    if not readable:
+        raise socket.timeout('timed out')
+
+    view = memoryview(packet)
+    count = 0
+    while count < batch:
+        try:
+            size = sock_video.recv_into(packet)
+        except (BlockingIOError, InterruptedError):
+            break
+        assembler.feed(view[:size], out)
+        count += 1
+    return count
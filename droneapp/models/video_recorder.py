@@ -0,0 +1,264 @@
+import bisect
+import collections
+import json
+import logging
+import os
+import threading
+import time
+
+from droneapp.models.video_ingest import H264_START_CODE
+from droneapp.models.video_ingest import is_keyframe_unit
+
+logger = logging.getLogger(__name__)
+
+# 하나의 파일(segment)에 저장할 최대 시간(초). 다음 keyframe부터 새로운 파일에 저장한다.
+DEFAULT_SEGMENT_SECONDS = 60
+# 디스크가 느려서 쓰지 못하고 쌓인 데이터가 이 크기를 넘으면 새로운 frame은 버린다.
+DEFAULT_MAX_PENDING_BYTES = 64 * 1024 * 1024
+# 파일에 쓰기 전에 모아두는 크기
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+INDEX_FILE = 'index.jsonl'
+SEGMENT_FILE = 'segment_{:05d}.h264'
+
+
+# frame(access unit)에 keyframe(SPS 또는 IDR)이 들어있는지
+def contains_keyframe(frame):
+    return any(is_keyframe_unit(H264_START_CODE + unit)
+               for unit in bytes(frame[:256]).split(H264_START_CODE)[1:3])
+
+
+# 수신한 H.264 frame을 그대로 파일에 저장하는 클래스
+# write()는 queue에 넣기만 하고, 파일 쓰기는 별도의 스레드에서 하기 때문에 영상 수신이 멈추지 않는다.
+# 각 frame의 시간, 파일, 위치, keyframe 여부는 index.jsonl에 한줄씩 기록한다.
+class StreamRecorder(object):
+    def __init__(self, directory, segment_seconds=DEFAULT_SEGMENT_SECONDS,
+                 max_pending_bytes=DEFAULT_MAX_PENDING_BYTES):
+        self.directory = directory
+        self.segment_seconds = segment_seconds
+        self.max_pending_bytes = max_pending_bytes
+
+        self._queue = collections.deque()
+        self._pending_bytes = 0
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._start_time = None
+
+        self.frames = 0
+        self.bytes = 0
+        self.segments = 0
+        # 디스크가 따라오지 못해 저장하지 못한 frame의 수
+        self.dropped = 0
+
+    @property
+    def is_recording(self):
+        return self._thread is not None and not self._stop_event.is_set()
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._start_time = time.monotonic()
+        self._thread = threading.Thread(target=self._write_loop)
+        self._thread.daemon = True
+        self._thread.start()
+        logger.info({'action': 'start', 'directory': self.directory})
+        return self
+
+    # 영상 수신 스레드에서 호출된다. 복사해서 queue에 넣기만 한다.
+    def write(self, frame, timestamp=None):
+        if self._stop_event.is_set():
+            return False
+        size = len(frame)
+        if timestamp is None:
+            timestamp = time.monotonic()
+        with self._condition:
+            if self._pending_bytes + size > self.max_pending_bytes:
+                self.dropped += 1
+                return False
+            self._queue.append((timestamp - self._start_time, bytes(frame)))
+            self._pending_bytes += size
+            self._condition.notify()
+        return True
+
+    # 남아있는 frame을 모두 저장한 뒤 종료
+    def stop(self, timeout=5):
+        self._stop_event.set()
+        with self._condition:
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        logger.info({'action': 'stop', 'directory': self.directory, 'stats': self.stats()})
+
+    def _next_batch(self):
+        with self._condition:
+            while not self._queue and not self._stop_event.is_set():
+                self._condition.wait(timeout=1)
+            batch = list(self._queue)
+            self._queue.clear()
+        # _pending_bytes는 파일에 쓴 뒤에 줄인다. (꺼낸 batch도 쓰기 전까지는 메모리에 있다)
+        return batch
+
+    def _write_loop(self):
+        segment = None
+        segment_start = None
+        offset = 0
+        with open(os.path.join(self.directory, INDEX_FILE), 'w', buffering=WRITE_BUFFER_SIZE) as index:
+            try:
+                while True:
+                    batch = self._next_batch()
+                    if not batch and self._stop_event.is_set():
+                        break
+                    for elapsed, frame in batch:
+                        keyframe = contains_keyframe(frame)
+                        # 새로운 파일은 keyframe으로 시작해야 따로 재생하거나 디코딩할 수 있다.
+                        if segment is None or (keyframe and elapsed - segment_start >= self.segment_seconds):
+                            if segment is not None:
+                                segment.close()
+                            name = SEGMENT_FILE.format(self.segments)
+                            segment = open(os.path.join(self.directory, name), 'wb',
+                                           buffering=WRITE_BUFFER_SIZE)
+                            segment_start = elapsed
+                            offset = 0
+                            self.segments += 1
+                        segment.write(frame)
+                        index.write(json.dumps({'t': round(elapsed, 4), 'segment': self.segments - 1,
+                                                'offset': offset, 'size': len(frame),
+                                                'keyframe': keyframe}) + '\n')
+                        offset += len(frame)
+                        self.frames += 1
+                        self.bytes += len(frame)
+                        with self._condition:
+                            self._pending_bytes -= len(frame)
+            except Exception as ex:
+                logger.error({'action': '_write_loop', 'ex': ex})
+            finally:
+                if segment is not None:
+                    segment.close()
+
+    def stats(self):
+        return {
+            'directory': self.directory,
+            'recording': self.is_recording,
+            'frames': self.frames,
+            'bytes': self.bytes,
+            'segments': self.segments,
+            'dropped': self.dropped,
+            'pending_bytes': self._pending_bytes,
+        }
+
+
+# StreamRecorder로 저장한 녹화본을 index를 이용해 읽는 클래스
+class VideoRecording(object):
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, INDEX_FILE)) as f:
+            self.entries = [json.loads(line) for line in f if line.strip()]
+        self.times = [entry['t'] for entry in self.entries]
+        # keyframe인 entry의 위치 (seek할 때 사용)
+        self.keyframes = [i for i, entry in enumerate(self.entries) if entry['keyframe']]
+
+    @property
+    def duration(self):
+        return self.times[-1] if self.times else 0.0
+
+    # seconds 이전의 가장 가까운 keyframe의 위치 (디코딩은 keyframe부터 시작해야 한다)
+    def seek(self, seconds):
+        position = bisect.bisect_right(self.times, seconds) - 1
+        index = bisect.bisect_right(self.keyframes, max(position, 0)) - 1
+        return self.keyframes[index] if index >= 0 else 0
+
+    # position번째 frame부터 (녹화 시간, frame)을 돌려준다.
+    def frames(self, position=0):
+        files = {}
+        try:
+            for entry in self.entries[position:]:
+                f = files.get(entry['segment'])
+                if f is None:
+                    for old in files.values():
+                        old.close()
+                    f = open(os.path.join(self.directory, SEGMENT_FILE.format(entry['segment'])), 'rb')
+                    files = {entry['segment']: f}
+                f.seek(entry['offset'])
+                yield entry['t'], f.read(entry['size'])
+        finally:
+            for f in files.values():
+                f.close()
+
+
+# 녹화본을 decoder에 다시 넣는 클래스 (실시간 또는 최대한 빠르게, index로 원하는 시간으로 이동)
+class ReplaySource(object):
+    def __init__(self, recording, write, realtime=True, start=0.0, loop=False):
+        self.recording = recording
+        # H.264 데이터를 받는 함수 (ex : decoder.write)
+        self._write = write
+        self.realtime = realtime
+        self.loop = loop
+        self.position = recording.seek(start)
+        self._seek_to = None
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.frames = 0
+
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    # 재생 스레드가 끝날 때까지(decoder에 넣는 중인 frame이 끝날 때까지) 기다린다.
+    def stop(self, timeout=2):
+        self._stop_event.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    # 재생중에 원하는 시간(초)으로 이동한다.
+    def seek(self, seconds):
+        self._seek_to = seconds
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            if not self._play(self.position):
+                self.position = 0
+                if not self.loop:
+                    break
+        logger.info({'action': 'replay', 'status': 'done', 'frames': self.frames})
+
+    # 끝까지 재생했다면 False, seek으로 중간에 멈췄다면 True
+    def _play(self, position):
+        wall_start = time.monotonic()
+        record_start = None
+        for t, frame in self.recording.frames(position):
+            if self._stop_event.is_set():
+                return True
+            if self._seek_to is not None:
+                self.position = self.recording.seek(self._seek_to)
+                self._seek_to = None
+                return True
+            if record_start is None:
+                record_start = t
+            if self.realtime:
+                wait = (t - record_start) - (time.monotonic() - wall_start)
+                if wait > 0:
+                    self._stop_event.wait(wait)
+            try:
+                self._write(frame)
+            except Exception as ex:
+                logger.error({'action': 'replay', 'ex': ex})
+                self._stop_event.set()
+                return True
+            self.frames += 1
+            self.position += 1
+        return False
+
+    def stats(self):
+        return {
+            'directory': self.recording.directory,
+            'running': self.is_running,
+            'position': self.position,
+            'frames': self.frames,
+            'duration': self.recording.duration,
+        }
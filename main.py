@@ -1,14 +1,22 @@
 import logging
 import sys
 
-import droneapp.controller.server
+import config
+from droneapp.models.log_pipeline import setup_logging
 
-# 로깅설정
-logging.basicConfig(level = logging.INFO, stream = sys.stdout)
 
+# 영상 처리 프로세스(spawn)는 이 모듈을 다시 import하기 때문에 로깅설정과 Flask app 생성은
+# __main__으로 실행했을 때만 한다. (프로세스마다 로그 스레드와 웹 서버가 만들어지지 않도록)
+def main():
+    # 로깅설정 : 로그를 부른 스레드는 queue에 넣기만 하고, 별도의 스레드가 LOG_FILE과 화면에 기록한다.
+    setup_logging(level = logging.INFO, log_file = config.LOG_FILE, stream = sys.stdout, rate = config.LOG_RATE)
 
-if __name__ =='__main__':
+    import droneapp.controller.server
     droneapp.controller.server.run()
 
 
-# FireWall을 Off 해야만 Video를 문제없이 수신할 수 있다.
\ No newline at end of file
+if __name__ =='__main__':
+    main()
+
+
+# FireWall을 Off 해야만 Video를 문제없이 수신할 수 있다.
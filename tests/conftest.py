@@ -0,0 +1,48 @@
+import socket
+
+import numpy as np
+import pytest
+
+from droneapp.models import async_drone_manager
+from droneapp.models import drone_manager
+from droneapp.models.drone_manager import FRAME_SHAPE
+from droneapp.models.video_decoder import BaseVideoDecoder
+
+
+# 받은 데이터마다 빈 frame을 ring buffer에 넣는 decoder (ffmpeg 없이 시험하기 위해)
+class FakeVideoDecoder(BaseVideoDecoder):
+    name = 'fake'
+
+    def __init__(self, width, height):
+        super().__init__(width, height)
+        self.writes = 0
+
+    def write(self, data):
+        self.writes += 1
+        self.frame_buffer.write(np.zeros(FRAME_SHAPE, dtype=np.uint8))
+
+
+# DroneManager와 AsyncDroneManager가 ffmpeg 대신 FakeVideoDecoder를 사용한다.
+@pytest.fixture
+def fake_video_decoder(monkeypatch):
+    for module in (drone_manager, async_drone_manager):
+        monkeypatch.setattr(module, 'create_video_decoder',
+                            lambda name, width, height: FakeVideoDecoder(width, height))
+    return FakeVideoDecoder
+
+
+def _free_udp_ports(count):
+    sockets = [socket.socket(socket.AF_INET, socket.SOCK_DGRAM) for _ in range(count)]
+    try:
+        for sock in sockets:
+            sock.bind(('127.0.0.1', 0))
+        return [sock.getsockname()[1] for sock in sockets]
+    finally:
+        for sock in sockets:
+            sock.close()
+
+
+# 비어있는 UDP port를 count개 돌려주는 함수 (시뮬레이터와 드론이 사용할 port)
+@pytest.fixture
+def free_udp_ports():
+    return _free_udp_ports
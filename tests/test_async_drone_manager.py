@@ -0,0 +1,31 @@
+import asyncio
+
+from droneapp.models.async_drone_manager import AsyncDroneManager
+from droneapp.models.drone_manager import FRAME_SHAPE
+from droneapp.models.video_ingest import H264_START_CODE
+from tools.tello_simulator import TelloSimulator
+
+
+def test_frames_then_stop_removes_frame_listener(tmp_path, fake_video_decoder, free_udp_ports):
+    video_file = tmp_path / 'video.h264'
+    video_file.write_bytes((H264_START_CODE + b'\x65' + b'\x11' * 20) * 3)
+    drone_port, host_port, state_port, video_port = free_udp_ports(4)
+
+    async def scenario(drone):
+        async with drone:
+            assert len(drone.frame_buffer._listeners) == 1
+            frames = drone.frames()
+            sequence, frame = await asyncio.wait_for(frames.__anext__(), 5)
+            await frames.aclose()
+        return sequence, frame
+
+    with TelloSimulator(command_port=drone_port, state_port=state_port, video_port=video_port,
+                        video_file=str(video_file), video_fps=50):
+        drone = AsyncDroneManager(host_ip='127.0.0.1', host_port=host_port, drone_ip='127.0.0.1',
+                                  drone_port=drone_port, state_port=state_port, video_port=video_port)
+        sequence, frame = asyncio.run(scenario(drone))
+
+    assert sequence >= 1 and frame.shape == FRAME_SHAPE
+    assert drone.frame_buffer._listeners == []
+    # event loop가 닫힌 뒤에 decoder가 frame을 넣어도 예외가 발생하지 않는다.
+    drone.video_decoder.write(b'')
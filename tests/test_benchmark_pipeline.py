@@ -0,0 +1,12 @@
+import json
+
+from tools import benchmark_pipeline
+
+
+def test_main_compares_threads_and_processes(tmp_path):
+    output = tmp_path / 'pipeline.json'
+    benchmark_pipeline.main(['--frames', '5', '--workers', '1', '--output', str(output)])
+    results = json.loads(output.read_text())['results']
+    assert results['cpus'] >= 1
+    assert results['threads']['fps'] > 0
+    assert results['processes=1']['submitted'] == 5 and results['processes=1']['detections'] >= 1
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from tools import benchmark_video
+from tools.benchmark_util import percentile
+from tools.benchmark_util import summarize
+
+
+class CountingDetector(object):
+    def __init__(self):
+        self.calls = 0
+
+    def detect(self, frame):
+        self.calls += 1
+        return [(2, 2, 8, 8)]
+
+
+def test_percentile_interpolates():
+    assert percentile([], 50) is None
+    assert percentile([1, 2, 3, 4], 50) == 2.5
+    assert percentile([1, 2, 3, 4], 100) == 4
+    assert summarize([0.002, 0.001]) == {'count': 2, 'mean_ms': 1.5, 'min_ms': 1.0, 'p50_ms': 1.5,
+                                         'p90_ms': pytest.approx(1.9), 'p99_ms': pytest.approx(1.99),
+                                         'max_ms': 2.0}
+    assert summarize([]) == {'count': 0}
+
+
+def test_synthetic_frames_move_and_hover_frames_do_not():
+    assert benchmark_video.parse_resolution('320X240') == (320, 240)
+    frames = benchmark_video.synthetic_frames(64, 48, count=4)
+    assert len(frames) == 4 and frames[0].shape == (48, 64, 3)
+    assert (frames[0] != frames[1]).any()
+    hover = benchmark_video.hover_frames(64, 48, count=3)
+    assert abs(hover[0].astype(int) - hover[1].astype(int)).max() < 20
+
+
+def test_run_reports_stages_and_motion_gate_skips():
+    detector = CountingDetector()
+    frames = benchmark_video.hover_frames(64, 48, count=5)
+    results = benchmark_video.run(detector, frames, count=10, quality=50, memory_frames=2,
+                                  use_motion_gate=True)
+    assert results['count'] == 10 and results['faces_per_frame'] == 1.0
+    # 화면이 바뀌지 않았기 때문에 시간 측정 중에는 첫 frame만 얼굴인식을 한다. (나머지 2번은 메모리 측정)
+    assert detector.calls == 1 + 2 and results['skip_ratio'] == 0.9
+    assert results['jpeg_kb'] > 0 and results['peak_memory_kb'] > 0
+
+
+def test_main_saves_results(tmp_path):
+    output = tmp_path / 'video.json'
+    benchmark_video.main(['--resolution', '64x48', '--frames', '3', '--memory-frames', '1',
+                          '--output', str(output)])
+    data = json.loads(output.read_text())
+    assert data['benchmark'] == 'video'
+    assert set(data['results']) == {'synthetic@64x48', 'hover@64x48'}
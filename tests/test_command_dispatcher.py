@@ -0,0 +1,109 @@
+import threading
+
+import pytest
+
+from droneapp.models.command_dispatcher import CommandDispatcher
+
+
+# 첫 명령어의 응답을 release 전까지 기다리게 해서 queue에 명령어를 쌓아두는 드론
+class BlockingDrone(object):
+    def __init__(self):
+        self.executed = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.preempted = 0
+
+    def execute(self, command):
+        self.executed.append(command)
+        self.started.set()
+        if command == 'fail':
+            raise RuntimeError('socket closed')
+        self.release.wait(5)
+        return 'ok'
+
+    def preempt(self):
+        self.preempted += 1
+        self.release.set()
+
+
+@pytest.fixture
+def drone():
+    return BlockingDrone()
+
+
+@pytest.fixture
+def dispatcher(drone):
+    dispatcher = CommandDispatcher(drone.execute, drone.preempt, maxsize=3)
+    yield dispatcher
+    drone.release.set()
+    dispatcher.stop()
+
+
+def occupy(dispatcher, drone):
+    first = dispatcher.submit('takeoff')
+    assert drone.started.wait(5)
+    return first
+
+
+def test_land_preempts_and_runs_first(dispatcher, drone):
+    first = occupy(dispatcher, drone)
+    forward = dispatcher.submit('forward 20')
+    land = dispatcher.submit('land')
+    assert first.result(5) == 'ok'
+    assert land.result(5) == 'ok' and forward.result(5) == 'ok'
+    # 응답을 기다리던 takeoff를 중단시키고 먼저 기다리던 forward보다 land를 먼저 보낸다.
+    assert drone.preempted == 1
+    assert drone.executed == ['takeoff', 'land', 'forward 20']
+
+
+def test_pending_go_and_rc_are_coalesced(dispatcher, drone):
+    occupy(dispatcher, drone)
+    old_go = dispatcher.submit('go 10 0 0 10')
+    old_rc = dispatcher.submit('rc 0 0 0 10')
+    new_go = dispatcher.submit('go 20 0 0 10')
+    new_rc = dispatcher.submit('rc 0 0 0 20')
+    assert dispatcher.depth == 2
+    # 대신된 명령어는 보내지 않고 None으로 끝난다.
+    assert old_go.result(1) is None and old_rc.result(1) is None
+    drone.release.set()
+    assert new_go.result(5) == 'ok' and new_rc.result(5) == 'ok'
+    assert drone.executed == ['takeoff', 'go 20 0 0 10', 'rc 0 0 0 20']
+    assert dispatcher.stats()['coalesced'] == 2
+
+
+def test_full_queue_drops_normal_commands_but_not_safety(dispatcher, drone):
+    occupy(dispatcher, drone)
+    queued = [dispatcher.submit(f'up {20 + i}') for i in range(3)]
+    dropped = dispatcher.submit('up 50')
+    assert dropped.result(1) is None
+    assert dispatcher.dropped == 1
+    # land와 emergency는 queue가 가득 차도 버리지 않는다.
+    emergency = dispatcher.submit('emergency')
+    assert emergency.result(5) == 'ok'
+    assert [future.result(5) for future in queued] == ['ok'] * 3
+    assert dispatcher.stats()['max_depth'] == 4
+
+
+def test_non_blocking_command_is_dropped_while_busy(dispatcher, drone):
+    occupy(dispatcher, drone)
+    assert dispatcher.submit('cw 30', blocking=False).result(1) is None
+    drone.release.set()
+    assert dispatcher.dropped == 1
+
+
+def test_execute_error_is_set_on_future(dispatcher, drone):
+    drone.release.set()
+    future = dispatcher.submit('fail')
+    with pytest.raises(RuntimeError):
+        future.result(5)
+    assert dispatcher.submit('command').result(5) == 'ok'
+
+
+def test_stop_resolves_pending_commands(drone):
+    dispatcher = CommandDispatcher(drone.execute, drone.preempt)
+    occupy(dispatcher, drone)
+    pending = dispatcher.submit('forward 20')
+    dispatcher.stop()
+    assert pending.result(1) is None
+    assert dispatcher.depth == 0
+    drone.release.set()
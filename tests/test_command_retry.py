@@ -0,0 +1,103 @@
+import threading
+import time
+import types
+
+from droneapp.models.command_dispatcher import CommandDispatcher
+from droneapp.models.drone_manager import command_retry
+from droneapp.models.drone_manager import command_timeout
+from droneapp.models.drone_manager import DEFAULT_COMMAND_RETRY
+from droneapp.models.drone_manager import DroneManager
+from droneapp.models.drone_manager import MOTION_COMMAND_TIMEOUT
+from droneapp.models.drone_manager import MOTION_TIMEOUT_MARGIN
+from droneapp.models.log_pipeline import LogThrottle
+
+
+class FakeSocket(object):
+    def __init__(self):
+        self.sent = []
+
+    def sendto(self, data, address):
+        self.sent.append(data.decode('utf-8'))
+
+
+# _send_command가 사용하는 속성만 가진 가짜 드론 (응답은 오지 않는다)
+def fake_drone(speed=10):
+    drone = types.SimpleNamespace(
+        speed=speed,
+        socket=FakeSocket(),
+        drone_address=('127.0.0.1', 8889),
+        metrics_label='test',
+        _command_semaphore=threading.Semaphore(1),
+        _log_command=LogThrottle(),
+        _response_lock=threading.Lock(),
+        _pending_response=None,
+        command_dispatcher=types.SimpleNamespace(is_preempted=False),
+    )
+    drone.command_timeout = lambda command: command_timeout(command, drone.speed)
+    return drone
+
+
+def test_motion_commands_are_not_retried():
+    for command in ('forward 100', 'cw 90', 'flip f', 'go 50 0 0 20', 'takeoff'):
+        assert command_retry(command) == 0
+    for command in ('speed 10', 'battery?', 'command', 'streamon'):
+        assert command_retry(command) == DEFAULT_COMMAND_RETRY
+
+
+def test_timed_out_motion_command_is_sent_once():
+    drone = fake_drone()
+    assert DroneManager._send_command(drone, 'forward 100', timeout=0.01) is None
+    assert drone.socket.sent == ['forward 100']
+
+
+def test_timed_out_setting_command_is_retried():
+    drone = fake_drone()
+    assert DroneManager._send_command(drone, 'speed 10', timeout=0.01) is None
+    assert drone.socket.sent == ['speed 10'] * (DEFAULT_COMMAND_RETRY + 1)
+
+
+def test_motion_timeout_scales_with_distance_and_speed():
+    assert command_timeout('battery?') < MOTION_COMMAND_TIMEOUT
+    assert command_timeout('forward 20', speed=10) == MOTION_COMMAND_TIMEOUT
+    assert command_timeout('forward 200', speed=10) == 20 + MOTION_TIMEOUT_MARGIN
+    assert command_timeout('forward 200', speed=50) == MOTION_COMMAND_TIMEOUT
+    assert command_timeout('go 300 400 0 25') == 20 + MOTION_TIMEOUT_MARGIN
+    assert command_timeout('forward abc') == MOTION_COMMAND_TIMEOUT
+
+
+# 명령어를 꺼낸 뒤 응답을 기다리기 전에 멈추는 semaphore
+class GateSemaphore(object):
+    def __init__(self):
+        self.entered = threading.Event()
+        self.gate = threading.Event()
+        self.semaphore = threading.Semaphore(1)
+
+    def acquire(self, blocking=True):
+        self.entered.set()
+        self.gate.wait(5)
+        return self.semaphore.acquire(blocking)
+
+    def release(self):
+        self.semaphore.release()
+
+
+def test_command_preempted_before_it_is_sent_bails_out():
+    drone = fake_drone()
+    drone._command_semaphore = GateSemaphore()
+    drone.command_dispatcher = CommandDispatcher(
+        lambda command: DroneManager._send_command(drone, command, timeout=5 if command == 'forward 100' else 0.01),
+        lambda: DroneManager._preempt_command(drone))
+    try:
+        forward = drone.command_dispatcher.submit('forward 100')
+        assert drone._command_semaphore.entered.wait(5)
+        # forward가 _pending_response를 정하기 전에 land가 들어오면 중단시킬 응답이 아직 없다.
+        land = drone.command_dispatcher.submit('land')
+        start = time.monotonic()
+        drone._command_semaphore.gate.set()
+        assert forward.result(5) is None
+        assert land.result(5) is None
+        # forward는 보내지 않고 응답 시간(5초)을 기다리지 않고 land를 보낸다.
+        assert time.monotonic() - start < 2
+        assert drone.socket.sent == ['land']
+    finally:
+        drone.command_dispatcher.stop()
@@ -0,0 +1,46 @@
+import pytest
+
+from droneapp.models.course import CourseA
+from droneapp.models.course import CourseB
+from droneapp.models.course import CourseSchedule
+from droneapp.models.course import Step
+from droneapp.models.course_simulator import simulate_course
+
+
+def test_schedule_indexes_steps_by_count_and_time():
+    steps = (Step(1, 0, 'takeoff'), Step(5, None, None, jump_to=9), Step(5, 8, 'flip_left'),
+             Step(9, 4, 'land', end=True))
+    schedule = CourseSchedule(steps)
+    assert schedule.steps_for(5) == steps[1:3]
+    assert schedule.steps_for(2) == ()
+    assert [step.action for step in schedule.timed_steps] == ['takeoff', 'land', 'flip_left']
+    assert schedule.last_count == 9
+
+
+def test_schedule_is_compiled_once_per_class():
+    assert CourseA.compile() is CourseA.compile()
+    assert CourseA.compile() is not CourseB.compile()
+
+
+@pytest.mark.parametrize('course_class', [CourseA, CourseB])
+@pytest.mark.parametrize('mode', ['timed', 'paced', 'shake'])
+def test_courses_finish_without_errors(course_class, mode):
+    result = simulate_course(course_class, mode)
+    assert result['errors'] == [] and result['late_steps'] == []
+    assert result['commands'][0]['command'] == 'takeoff'
+    assert result['commands'][-1]['command'] == 'land'
+
+
+def test_paced_course_is_shorter_than_timed():
+    assert simulate_course(CourseA, 'paced')['duration'] < simulate_course(CourseA, 'timed')['duration']
+
+
+def test_course_b_jumps_when_shaken_within_window():
+    # 10번째 shake가 10 ~ 15초 사이라면 flip_right를 건너뛰고 45번으로 간다.
+    commands = [command['command'] for command in simulate_course(CourseB, 'shake', 1.2)['commands']]
+    assert commands == ['takeoff', 'flip f', 'flip l', 'land']
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        simulate_course(CourseA, 'random')
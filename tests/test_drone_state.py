@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from droneapp.models.drone_state import DroneStateBuffer
+from droneapp.models.drone_state import STATE_FIELDS
+
+
+def packet(height, battery=80, pitch='0'):
+    return (f'pitch:{pitch};roll:0;yaw:5;vgx:0;vgy:0;vgz:0;templ:60;temph:62;tof:10;h:{height};'
+            f'bat:{battery};baro:1.5;time:0;agx:0.00;agy:0.00;agz:-1000.00;\r\n').encode('ascii')
+
+
+def test_latest_parses_fields():
+    state = DroneStateBuffer()
+    assert state.latest() is None
+    state.append(packet(30, pitch='x') + b'unknown:1;', timestamp=10.0)
+    latest = state.latest()
+    assert set(latest) == {'timestamp'} | set(STATE_FIELDS)
+    assert latest['timestamp'] == 10.0 and latest['h'] == 30 and latest['bat'] == 80
+    assert latest['agz'] == -1000.0
+    # 숫자가 아닌 값은 None
+    assert latest['pitch'] is None
+
+
+@pytest.mark.parametrize('value', ['nan', 'inf', '-inf', '1e39'])
+def test_non_finite_values_are_none(value):
+    state = DroneStateBuffer()
+    state.append(packet(30, pitch=value), timestamp=1.0)
+    latest = state.latest()
+    assert latest['pitch'] is None and latest['h'] == 30
+    # JSON으로 바꿀 수 있어야 한다. (NaN은 JSON이 아니다)
+    json.dumps(latest, allow_nan=False)
+    json.dumps(state.history(), allow_nan=False)
+
+
+def test_ring_keeps_newest_samples_in_order():
+    state = DroneStateBuffer(capacity=3)
+    for i in range(5):
+        state.append(packet(i), timestamp=float(i))
+    assert len(state) == 3 and state.count == 5
+    history = state.history(points=None, fields=['h'])
+    assert history == {'timestamp': [2.0, 3.0, 4.0], 'h': [2.0, 3.0, 4.0]}
+
+
+def test_history_window_and_downsampling():
+    state = DroneStateBuffer()
+    for i in range(10):
+        state.append(packet(i * 10), timestamp=float(i))
+    # 최근 3초 (6 ~ 9초)
+    assert state.history(seconds=3, fields=['h'])['h'] == [60.0, 70.0, 80.0, 90.0]
+    # 10개의 샘플을 5개 구간의 평균으로
+    history = state.history(points=5, fields=['h', 'not_a_field'])
+    assert set(history) == {'timestamp', 'h'}
+    assert history['h'] == [5.0, 25.0, 45.0, 65.0, 85.0]
+
+
+def test_history_skips_missing_values_in_average():
+    state = DroneStateBuffer()
+    for i, pitch in enumerate(['x', 'x', '2', 'x']):
+        state.append(packet(0, pitch=pitch), timestamp=float(i))
+    assert state.history(points=None, fields=['pitch'])['pitch'] == [None, None, 2.0, None]
+    assert state.history(points=2, fields=['pitch'])['pitch'] == [None, 2.0]
+
+
+@pytest.mark.parametrize('options', [{'seconds': 0}, {'seconds': -1}, {'seconds': float('nan')},
+                                     {'points': 0}, {'points': -5}])
+def test_history_rejects_non_positive_options(options):
+    with pytest.raises(ValueError):
+        DroneStateBuffer().history(**options)
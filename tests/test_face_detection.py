@@ -0,0 +1,69 @@
+import queue
+import time
+
+import numpy as np
+
+from droneapp.models.face_detection import FaceDetectionWorker
+from droneapp.models.frame_buffer import FrameRingBuffer
+
+SHAPE = (48, 64, 3)
+
+
+def frame(value):
+    return np.full(SHAPE, value, dtype=np.uint8)
+
+
+def start_worker(detect, **options):
+    buffer = FrameRingBuffer(SHAPE)
+    results = queue.Queue()
+    worker = FaceDetectionWorker(buffer, detect, on_faces=lambda faces, sequence: results.put((faces, sequence)),
+                                 rate=1000, **options)
+    worker.start()
+    return buffer, worker, results
+
+
+def test_detects_latest_frame_and_reports_sequence():
+    buffer, worker, results = start_worker(lambda frame: [(1.6, 2, 3, 4)])
+    try:
+        buffer.write(frame(1))
+        faces, sequence = results.get(timeout=5)
+    finally:
+        worker.stop()
+    assert faces == ((1, 2, 3, 4),) and sequence == 1
+    assert worker.face_sequence == 1 and worker.detections == 1
+    assert worker.stats()['detect_ms'] is not None
+
+
+def test_latest_faces_expire():
+    buffer, worker, results = start_worker(lambda frame: [(1, 2, 3, 4)])
+    try:
+        buffer.write(frame(1))
+        results.get(timeout=5)
+        assert worker.latest_faces() == ((1, 2, 3, 4),)
+        assert worker.latest_faces(max_age=-1) == ()
+    finally:
+        worker.stop()
+    assert worker.latest_faces() == ()
+
+
+def test_detect_error_does_not_stop_worker():
+    calls = []
+
+    def detect(frame):
+        calls.append(frame[0, 0, 0])
+        if len(calls) == 1:
+            raise RuntimeError('model not loaded')
+        return []
+
+    buffer, worker, results = start_worker(detect)
+    try:
+        buffer.write(frame(1))
+        deadline = time.monotonic() + 5
+        while not calls and time.monotonic() < deadline:
+            time.sleep(0.01)
+        buffer.write(frame(2))
+        faces, sequence = results.get(timeout=5)
+        assert worker.is_running
+    finally:
+        worker.stop()
+    assert faces == () and sequence == 2
@@ -0,0 +1,88 @@
+import os
+
+import numpy as np
+import pytest
+
+from droneapp.models.face_detector import create_face_detector
+from droneapp.models.face_detector import DNN_INPUT_SIZE
+from droneapp.models.face_detector import DnnFaceDetector
+from droneapp.models.face_detector import draw_faces
+from droneapp.models.face_detector import ErrorFaceDetectorNotAvailable
+from droneapp.models.face_detector import ErrorNoFaceDetectXMLFile
+from droneapp.models.face_detector import HAAR_XML_FILE
+from droneapp.models.face_detector import HaarFaceDetector
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+XML_FILE = os.path.join(ROOT, HAAR_XML_FILE)
+
+
+def test_haar_finds_no_face_in_blank_frame():
+    detector = create_face_detector('haar', xml_file=XML_FILE, min_neighbors=3)
+    assert isinstance(detector, HaarFaceDetector)
+    assert detector.load() is detector
+    frames = [np.zeros((120, 160, 3), dtype=np.uint8), np.zeros((120, 160), dtype=np.uint8)]
+    assert [len(faces) for faces in detector.detect_batch(frames)] == [0, 0]
+    assert detector.options() == {'scale_factor': 1.3, 'min_neighbors': 3}
+
+
+def test_unknown_or_missing_detector():
+    with pytest.raises(ErrorFaceDetectorNotAvailable):
+        create_face_detector('yolo')
+    with pytest.raises(ErrorFaceDetectorNotAvailable):
+        create_face_detector('dnn', model_file=os.path.join(ROOT, 'missing.caffemodel'))
+    with pytest.raises(ErrorNoFaceDetectXMLFile):
+        create_face_detector('haar', xml_file=os.path.join(ROOT, 'missing.xml'))
+
+
+def test_draw_faces_copies_frame():
+    frame = np.zeros((40, 40, 3), dtype=np.uint8)
+    drawn = draw_faces(frame, [(5, 5, 10, 10)])
+    assert drawn is not frame and drawn[5, 5, 0] == 255 and not frame.any()
+    assert draw_faces(frame, []) is frame
+    assert draw_faces(frame, [(5, 5, 10, 10)], copy=False) is frame and frame.any()
+
+
+# 모델 파일은 저장소에 없기 때문에 net.forward의 결과를 정해둔다.
+class FakeNet(object):
+    def __init__(self, detections):
+        self.detections = np.array(detections, dtype=np.float32).reshape(1, 1, -1, 7)
+        self.blob = None
+
+    def setInput(self, blob):
+        self.blob = blob
+
+    def forward(self):
+        return self.detections
+
+
+def dnn_detector(tmp_path, detections):
+    for name in ('model.caffemodel', 'deploy.prototxt'):
+        (tmp_path / name).write_bytes(b'')
+    detector = DnnFaceDetector(str(tmp_path / 'model.caffemodel'), str(tmp_path / 'deploy.prototxt'))
+    detector.net = FakeNet(detections)
+    return detector
+
+
+def test_dnn_detect_batch_scales_boxes_per_image(tmp_path):
+    detector = dnn_detector(tmp_path, [
+        [0, 1, 0.9, 0.25, 0.5, 0.75, 1.0],
+        # confidence가 낮은 결과는 버린다.
+        [0, 1, 0.3, 0.0, 0.0, 0.5, 0.5],
+        # 화면 밖으로 나간 좌표는 화면 안으로 자른다.
+        [1, 1, 0.8, -0.1, 0.5, 0.5, 1.2],
+        # 크기가 없는 상자는 버린다.
+        [1, 1, 0.8, 0.5, 0.5, 0.5, 0.6],
+    ])
+    images = [np.zeros((100, 200, 3), dtype=np.uint8), np.zeros((40, 60), dtype=np.uint8),
+              np.zeros((10, 10, 3), dtype=np.uint8)]
+    faces = detector.detect_batch(images)
+    # 흑백 이미지도 BGR로 바꿔서 하나의 blob으로 처리한다.
+    assert detector.net.blob.shape == (3, 3, DNN_INPUT_SIZE[1], DNN_INPUT_SIZE[0])
+    assert [face.tolist() for face in faces] == [[[50, 50, 100, 50]], [[0, 20, 30, 20]], []]
+    assert all(face.shape[1] == 4 for face in faces)
+    assert detector.detect_batch([]) == []
+
+
+def test_dnn_detect_single_image(tmp_path):
+    detector = dnn_detector(tmp_path, [[0, 1, 0.6, 0.1, 0.2, 0.3, 0.4]])
+    assert detector.detect(np.zeros((50, 100, 3), dtype=np.uint8)).tolist() == [[10, 10, 20, 10]]
@@ -0,0 +1,73 @@
+import pytest
+
+from droneapp.models.face_follow import FaceFollowController
+from droneapp.models.face_follow import PID
+from droneapp.models.mission import VirtualClock
+from droneapp.models.tracking_simulator import simulate_tracking
+
+# 100x100 화면에서 20x20 얼굴이 목표 크기가 되도록 한다.
+FRAME = (100, 100)
+TARGET = 0.04
+
+
+def make_controller(**options):
+    sent = []
+    clock = VirtualClock(10.0)
+    controller = FaceFollowController(lambda *rc: sent.append(rc), FRAME, target_face_ratio=TARGET,
+                                      clock=clock, **options)
+    return controller, clock, sent
+
+
+def test_pid_does_not_wind_up_while_saturated():
+    pid = PID(1.0, ki=1.0, limit=1.0)
+    assert pid.update(10.0, 0.0, 1.0) == 1.0
+    assert pid.integral == 0.0
+    assert pid.update(-0.1, 0.0, 1.0) == pytest.approx(-0.2)
+
+
+def test_face_errors_are_normalized():
+    controller, _, _ = make_controller()
+    errors = controller.face_errors([(0, 0, 10, 10), (40, 40, 20, 20)])
+    assert errors == {'yaw': 0.0, 'up_down': 0.0, 'forward_back': 0.0}
+    errors = controller.face_errors([(70, 0, 10, 10)])
+    assert errors['yaw'] == 0.5 and errors['up_down'] == 0.9 and errors['forward_back'] == 1.0
+
+
+def test_step_turns_toward_face_and_measures_latency():
+    controller, clock, sent = make_controller()
+    controller.update([(70, 40, 20, 20)], frame_time=clock.time())
+    left_right, forward_back, up_down, yaw = controller.step()
+    assert left_right == forward_back == up_down == 0
+    assert yaw == 60 and sent == [(0, 0, 0, 60)]
+    assert controller.latency_ms == pytest.approx(controller.camera_latency * 1000)
+
+
+def test_dead_zone_keeps_drone_still():
+    controller, clock, _ = make_controller()
+    controller.update([(41, 40, 20, 20)], frame_time=clock.time())
+    assert controller.step() == (0, 0, 0, 0)
+    assert controller.last_errors['yaw'] == pytest.approx(0.02)
+
+
+def test_lost_face_stops_once():
+    controller, clock, sent = make_controller()
+    controller.update([(70, 40, 20, 20)], frame_time=clock.time())
+    controller.step()
+    clock.now += controller.lost_timeout + controller.camera_latency + 0.1
+    assert controller.step() == (0, 0, 0, 0)
+    controller.step()
+    # 멈추라는 rc는 한번만 보낸다.
+    assert sent[1:] == [(0, 0, 0, 0)]
+    assert all(pid.integral == 0.0 for pid in controller.pids.values())
+
+
+def test_compensation_reduces_overshoot():
+    compensated = simulate_tracking('offset', {'compensate': True})
+    uncompensated = simulate_tracking('offset', {'compensate': False})
+    assert compensated['yaw']['overshoot'] < uncompensated['yaw']['overshoot']
+    assert abs(compensated['yaw']['final']) < 0.05
+
+
+def test_unknown_scenario():
+    with pytest.raises(ValueError):
+        simulate_tracking('spin')
@@ -0,0 +1,64 @@
+import numpy as np
+
+from droneapp.models.face_tracker import FaceTracker
+
+SHAPE = (120, 160)
+FACE = 30
+
+
+# 무늬가 있는 얼굴 크기의 사각형을 (x, y)에 둔 흑백 이미지
+def image(x, y, seed=1):
+    gray = np.full(SHAPE, 40, dtype=np.uint8)
+    pattern = np.random.default_rng(seed).integers(60, 255, (FACE, FACE), dtype=np.uint8)
+    gray[y:y + FACE, x:x + FACE] = pattern
+    return gray
+
+
+class FakeDetector(object):
+    def __init__(self):
+        self.calls = []
+        self.box = None
+
+    def __call__(self, gray):
+        self.calls.append(gray.shape)
+        if self.box is None:
+            return []
+        x, y = self.box
+        return [(x, y, FACE, FACE)]
+
+
+def test_tracks_between_detections():
+    detector = FakeDetector()
+    detector.box = (50, 40)
+    tracker = FaceTracker(detector, detect_interval=3)
+    assert tracker.update(image(50, 40)) == [(50, 40, FACE, FACE)]
+    # 얼굴이 움직여도 얼굴인식 없이 template matching으로 따라간다.
+    assert tracker.update(image(54, 42)) == [(54, 42, FACE, FACE)]
+    assert tracker.update(image(58, 44)) == [(58, 44, FACE, FACE)]
+    assert len(detector.calls) == 1 and tracker.tracks == 2
+    assert tracker.confidence > 0.9
+
+
+def test_detects_around_last_face_after_interval():
+    detector = FakeDetector()
+    detector.box = (50, 40)
+    tracker = FaceTracker(detector, detect_interval=1)
+    tracker.update(image(50, 40))
+    tracker.update(image(50, 40))
+    # interval이 지나면 마지막 얼굴 주변만 다시 얼굴인식을 한다. (detector는 주변 영역 안의 좌표를 돌려준다)
+    detector.box = (30, 30)
+    assert tracker.update(image(50, 40)) == [(50, 40, FACE, FACE)]
+    assert tracker.roi_detections == 1 and tracker.full_detections == 1
+    assert detector.calls[-1] == (90, 90)
+
+
+def test_lost_face_falls_back_to_full_detection_and_resets():
+    detector = FakeDetector()
+    detector.box = (50, 40)
+    tracker = FaceTracker(detector, detect_interval=5)
+    tracker.update(image(50, 40))
+    detector.box = None
+    # 얼굴이 사라지면 template matching이 실패하고, 주변과 전체 화면에서도 찾지 못한다.
+    assert tracker.update(np.full(SHAPE, 40, dtype=np.uint8)) == []
+    assert tracker.box is None
+    assert tracker.stats()['full_detections'] == 2 and tracker.roi_detections == 1
@@ -0,0 +1,56 @@
+import pytest
+
+from droneapp.models.base import Singletone
+from droneapp.models.drone_manager import DroneManager
+from droneapp.models.fleet import ErrorUnknownDrone
+from droneapp.models.fleet import FleetManager
+from tools.tello_simulator import TelloSimulator
+
+
+@pytest.fixture
+def fleet(monkeypatch, free_udp_ports):
+    # FleetManager는 Singletone이기 때문에 시험마다 새로 만든다.
+    monkeypatch.setattr(Singletone, '_instances', {})
+    simulators, drones = [], {}
+    for drone_id in ('tello1', 'tello2'):
+        drone_port, host_port, state_port, video_port = free_udp_ports(4)
+        simulator = TelloSimulator(command_port=drone_port, state_port=state_port, video_port=video_port)
+        simulator.battery = 50 + len(simulators)
+        simulator.start()
+        simulators.append(simulator)
+        drones[drone_id] = {'host_ip': '127.0.0.1', 'host_port': host_port, 'drone_ip': '127.0.0.1',
+                            'drone_port': drone_port, 'state_port': state_port, 'video_port': video_port,
+                            'video_workers': 0}
+    fleet = FleetManager(drones)
+    yield fleet
+    for drone_id in fleet.drone_ids:
+        fleet.remove(drone_id)
+    for simulator in simulators:
+        simulator.stop()
+
+
+def test_fan_out_sends_to_every_drone(fleet):
+    results = fleet.fan_out('battery?', timeout=5)
+    assert {drone_id: result['response'] for drone_id, result in results.items()} == \
+        {'tello1': '50', 'tello2': '51'}
+    assert all(result['latency_ms'] >= 0 for result in results.values())
+
+    results = fleet.fan_out('battery?', drone_ids=['tello2'], timeout=5)
+    assert list(results) == ['tello2']
+
+
+def test_unknown_drone(fleet):
+    with pytest.raises(ErrorUnknownDrone):
+        fleet.get('tello3')
+    with pytest.raises(ErrorUnknownDrone):
+        fleet.fan_out('battery?', drone_ids=['tello3'])
+
+
+def test_remove_stops_drone(fleet):
+    drone = fleet.get('tello1')
+    fleet.remove('tello1')
+    assert fleet.drone_ids == ['tello2']
+    assert drone.stop_event.is_set()
+    assert DroneManager.remove_instance(*drone.drone_address) is None
+    with pytest.raises(ErrorUnknownDrone):
+        fleet.remove('tello1')
@@ -0,0 +1,86 @@
+import io
+import threading
+
+import numpy as np
+import pytest
+
+from droneapp.models.frame_buffer import FrameRingBuffer
+
+SHAPE = (2, 3, 3)
+
+
+def frame(value):
+    return np.full(SHAPE, value, dtype=np.uint8)
+
+
+def test_latest_returns_newest_view():
+    buffer = FrameRingBuffer(SHAPE, size=3)
+    assert buffer.latest() == (0, None)
+    buffer.write(frame(1))
+    buffer.write(frame(2))
+    sequence, view = buffer.latest()
+    assert sequence == 2 and (view == 2).all()
+    # 복사본이 아닌 ring buffer의 view
+    assert np.shares_memory(view, buffer._frames)
+
+
+def test_dropped_counts_frames_never_read():
+    buffer = FrameRingBuffer(SHAPE, size=3)
+    buffer.write(frame(1))
+    buffer.latest()
+    for value in range(2, 6):
+        buffer.write(frame(value))
+    sequence, view = buffer.latest()
+    assert sequence == 5 and (view == 5).all()
+    assert buffer.dropped == 3
+    # 같은 frame을 다시 읽어도 늘어나지 않는다.
+    buffer.latest()
+    assert buffer.dropped == 3
+
+
+def test_wait_next_blocks_until_newer_frame():
+    buffer = FrameRingBuffer(SHAPE)
+    assert buffer.wait_next(0, timeout=0.01) == (0, None)
+    timer = threading.Timer(0.05, buffer.write, args=(frame(7),))
+    timer.start()
+    sequence, view = buffer.wait_next(0, timeout=5)
+    timer.join()
+    assert sequence == 1 and (view == 7).all()
+
+
+def test_read_from_stream_fills_slots():
+    buffer = FrameRingBuffer(SHAPE)
+    data = frame(3).tobytes() + frame(4).tobytes() + b'\x00' * 5
+    stream = io.BufferedReader(io.BytesIO(data), buffer_size=4)
+    assert buffer.read_from(stream)
+    assert buffer.read_from(stream)
+    # frame 하나를 다 채우지 못하고 끝났다.
+    assert not buffer.read_from(stream)
+    sequence, view = buffer.latest()
+    assert sequence == 2 and (view == 4).all()
+
+
+def test_frame_time_only_for_frames_in_ring():
+    buffer = FrameRingBuffer(SHAPE, size=2)
+    for value in range(3):
+        buffer.write(frame(value))
+    assert buffer.frame_time(0) is None
+    assert buffer.frame_time(1) is None
+    assert buffer.frame_time(2) <= buffer.frame_time(3)
+    # 아직 들어오지 않은 frame
+    assert buffer.frame_time(4) is None
+
+
+def test_listeners_receive_sequence():
+    buffer = FrameRingBuffer(SHAPE)
+    received = []
+    buffer.add_listener(received.append)
+    buffer.write(frame(1))
+    buffer.remove_listener(received.append)
+    buffer.write(frame(2))
+    assert received == [1]
+
+
+def test_ring_size_must_hold_two_frames():
+    with pytest.raises(ValueError):
+        FrameRingBuffer(SHAPE, size=1)
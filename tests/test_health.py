@@ -0,0 +1,37 @@
+from concurrent.futures import Future
+import time
+
+from droneapp.models.drone_manager import DroneManager
+from tools.tello_simulator import TelloSimulator
+
+
+def test_future_status():
+    future = Future()
+    assert DroneManager._future_status(future) == 'starting'
+    future.set_exception(RuntimeError('no ffmpeg'))
+    assert DroneManager._future_status(future) == 'error'
+    future = Future()
+    future.set_result(None)
+    assert DroneManager._future_status(future) == 'ready'
+
+
+def test_health_becomes_ready_with_simulator(fake_video_decoder, free_udp_ports):
+    drone_port, host_port, state_port, video_port = free_udp_ports(4)
+    with TelloSimulator(command_port=drone_port, state_port=state_port, video_port=video_port):
+        drone = DroneManager(host_ip='127.0.0.1', host_port=host_port, drone_ip='127.0.0.1',
+                             drone_port=drone_port, state_port=state_port, video_port=video_port,
+                             video_workers=0)
+        try:
+            deadline = time.monotonic() + 5
+            health = drone.health()
+            while not (health['ready'] and health['components']['state'] == 'ready'):
+                assert time.monotonic() < deadline, health
+                time.sleep(0.05)
+                health = drone.health()
+        finally:
+            drone.stop()
+            DroneManager.remove_instance(*drone.drone_address)
+    assert health['components'] == {'command': 'ready', 'state': 'ready', 'decoder': 'ready',
+                                     'detector': 'ready'}
+    # 영상은 첫번째 시청자가 요청할 때까지 받지 않는다.
+    assert health['video'] == 'idle'
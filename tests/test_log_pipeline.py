@@ -0,0 +1,91 @@
+import io
+import logging
+import queue
+import types
+
+import pytest
+
+from droneapp.models import log_pipeline
+from droneapp.models.log_pipeline import LazyQueueHandler
+from droneapp.models.log_pipeline import LogThrottle
+from droneapp.models.log_pipeline import RateLimitFilter
+from droneapp.models.log_pipeline import setup_logging
+from droneapp.models.log_pipeline import stop_logging
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = types.SimpleNamespace(value=100.0)
+    monkeypatch.setattr(log_pipeline, 'time', types.SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+
+def record(lineno=10, level=logging.INFO, msg='message'):
+    return logging.LogRecord('test', level, 'path.py', lineno, msg, None, None)
+
+
+def test_rate_limit_per_call_site(clock):
+    limit = RateLimitFilter(rate=1, burst=2)
+    assert [limit.filter(record()) for _ in range(4)] == [True, True, False, False]
+    # 다른 곳의 log와 ERROR는 제한하지 않는다.
+    assert limit.filter(record(lineno=11))
+    assert limit.filter(record(level=logging.ERROR))
+    assert limit.stats() == {'path.py:10': 2}
+
+    # 시간이 지나 token이 채워지면 버린 수를 다음 log에 적는다.
+    clock.value += 1
+    allowed = record()
+    assert limit.filter(allowed)
+    assert allowed.suppressed == 2
+    assert limit.stats() == {}
+
+
+def test_throttle_counts_suppressed(clock):
+    throttle = LogThrottle(rate=2, burst=1)
+    assert throttle.allow()
+    assert not throttle.allow() and not throttle.allow()
+    clock.value += 0.5
+    assert throttle.allow()
+    assert throttle.extra() == {'suppressed': 2}
+    assert throttle.extra() == {'suppressed': 0}
+
+
+def test_queue_handler_drops_when_full():
+    handler = LazyQueueHandler(queue.Queue(1))
+    message = {'action': 'takeoff'}
+    handler.emit(record(msg=message))
+    handler.emit(record())
+    assert handler.dropped == 1
+    # format은 기록하는 스레드에서 하기 때문에 dict 그대로 넘긴다.
+    assert handler.queue.get_nowait().msg is message
+
+
+def test_setup_logging_writes_through_listener(clock):
+    root = logging.getLogger()
+    saved = (list(root.handlers), root.level)
+    stream = io.StringIO()
+    listener = setup_logging(stream=stream, rate=1, burst=1)
+    try:
+        logger = logging.getLogger('droneapp.test')
+
+        # 같은 곳(줄)에서 남기는 log
+        def log():
+            logger.info({'action': 'send_command', 'command': 'battery?'})
+
+        for _ in range(3):
+            log()
+        clock.value += 1
+        log()
+        stop_logging(listener)
+        stop_logging(listener)
+    finally:
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        for handler in saved[0]:
+            root.addHandler(handler)
+        root.setLevel(saved[1])
+
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 2
+    assert "'command': 'battery?'" in lines[0] and 'droneapp.test' in lines[0]
+    assert lines[1].endswith('(suppressed 2)')
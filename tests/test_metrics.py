@@ -0,0 +1,51 @@
+from droneapp.models.metrics import Counter
+from droneapp.models.metrics import Histogram
+from droneapp.models.metrics import Registry
+from droneapp.models.metrics import Sample
+
+
+def test_counter_renders_labels():
+    registry = Registry()
+    counter = registry.register(Counter('tello_test_total', 'Test counter', ('drone', 'command')))
+    counter.labels('tello0', 'say "hi"').inc()
+    counter.labels('tello0', 'say "hi"').inc(2)
+    lines = registry.render().splitlines()
+    assert lines == ['# HELP tello_test_total Test counter', '# TYPE tello_test_total counter',
+                     'tello_test_total{drone="tello0",command="say \\"hi\\""} 3.0']
+
+    counter.remove('tello0', 'say "hi"')
+    assert len(registry.render().splitlines()) == 2
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('tello_test_seconds', 'Test histogram', ('stage',), buckets=(1, 0.1))
+    child = histogram.labels('decode')
+    for seconds in (0.05, 0.1, 0.5, 3):
+        child.observe(seconds)
+    with child.time():
+        pass
+    assert histogram.render()[2:] == [
+        'tello_test_seconds_bucket{stage="decode",le="0.1"} 3',
+        'tello_test_seconds_bucket{stage="decode",le="1.0"} 4',
+        'tello_test_seconds_bucket{stage="decode",le="+Inf"} 5',
+        f'tello_test_seconds_sum{{stage="decode"}} {repr(child.sum)}',
+        'tello_test_seconds_count{stage="decode"} 5',
+    ]
+
+
+def test_collectors_are_grouped_by_name():
+    registry = Registry()
+
+    def collector(drone, value):
+        return lambda: [Sample('tello_test_battery', 'gauge', 'Battery', {'drone': drone}, value)]
+
+    first, second = collector('tello0', 80), collector('tello1', None)
+    registry.register_collector(first)
+    registry.register_collector(second)
+    assert registry.render().splitlines() == [
+        '# HELP tello_test_battery Battery', '# TYPE tello_test_battery gauge',
+        'tello_test_battery{drone="tello0"} 80.0', 'tello_test_battery{drone="tello1"} NaN']
+
+    registry.unregister_collector(first)
+    registry.unregister_collector(second)
+    assert registry.render() == '\n'
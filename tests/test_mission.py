@@ -0,0 +1,101 @@
+from concurrent.futures import Future
+import threading
+
+from droneapp.models.course_simulator import MockDrone
+from droneapp.models.drone_manager import DEFAULT_SPEED
+from droneapp.models.drone_manager import MOTION_COMMAND_TIMEOUT
+from droneapp.models.drone_manager import command_timeout
+from droneapp.models.mission import MISSIONS
+from droneapp.models.mission import MissionRunner
+from droneapp.models.mission import MissionStep
+from droneapp.models.mission import VirtualClock
+from droneapp.models.mission import create_mission
+
+
+def flying_drone(clock):
+    drone = MockDrone(clock)
+    drone.is_flying = True
+    return drone
+
+
+# 응답을 정해진 값으로 돌려주는 드론 (None이면 응답이 오지 않는 Future)
+class ReplyDrone(object):
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.futures = []
+
+    def up(self, *args):
+        future = Future()
+        reply = self.replies.pop(0)
+        if reply is not None:
+            future.set_result(reply)
+        self.futures.append(future)
+        return future
+
+
+def test_mission_runs_every_step_in_order():
+    clock = VirtualClock()
+    drone = flying_drone(clock)
+    runner = create_mission('panorama', drone, loops=2, clock=clock)
+    runner.run()
+    assert runner.result == 'done'
+    assert [command for _, command, _ in drone.commands] == ['cw 90'] * 8
+    assert [timing.status for timing in runner.timings] == ['ok'] * 8
+    assert len(runner.cycle_seconds) == 2
+
+
+def test_mission_keeps_min_spacing_between_commands():
+    clock = VirtualClock()
+    drone = MockDrone(clock, blocking=False)
+    drone.is_flying = True
+    runner = MissionRunner(drone, [MissionStep('up'), MissionStep('up')], min_spacing=0.5, clock=clock)
+    runner.run()
+    starts = [timing.start for timing in runner.timings]
+    assert starts[1] - starts[0] >= 0.5
+
+
+def test_error_response_aborts_mission():
+    runner = MissionRunner(ReplyDrone(['ok', 'error', 'ok']), [MissionStep('up')] * 3, min_spacing=0,
+                           clock=VirtualClock())
+    runner.run()
+    assert runner.result == 'error'
+    assert len(runner.timings) == 2
+
+
+def test_missing_response_times_out():
+    runner = MissionRunner(ReplyDrone([None]), [MissionStep('up', timeout=0.01)], min_spacing=0)
+    runner.run()
+    assert runner.result == 'timeout'
+
+
+def test_abort_stops_waiting_for_response():
+    drone = ReplyDrone([None])
+    runner = MissionRunner(drone, [MissionStep('up')], min_spacing=0)
+    thread = runner.run_in_background()
+    while not drone.futures:
+        threading.Event().wait(0.01)
+    runner.abort()
+    thread.join(1)
+    assert not thread.is_alive()
+    assert runner.result == 'aborted'
+
+
+# 기본 속도에서도 응답을 기다리는 시간 안에 끝나는 거리만 움직인다. (늦은 응답으로 두번 움직이지 않도록)
+def test_mission_steps_finish_within_motion_timeout():
+    for name in MISSIONS:
+        clock = VirtualClock()
+        drone = flying_drone(clock)
+        create_mission(name, drone, clock=clock).run()
+        for _, command, _ in drone.commands:
+            assert command_timeout(command, DEFAULT_SPEED) == MOTION_COMMAND_TIMEOUT, (name, command)
+
+
+def test_abort_before_background_thread_starts():
+    drone = ReplyDrone([None])
+    runner = MissionRunner(drone, [MissionStep('up', (20,))])
+    # 스레드가 run을 시작하기 전에 abort가 들어오는 경우
+    runner._prepare()
+    runner.abort()
+    runner.run()
+    assert runner.result == 'aborted'
+    assert drone.futures == []
@@ -0,0 +1,63 @@
+import queue
+
+import numpy as np
+
+from droneapp.models.face_detection import FaceDetectionWorker
+from droneapp.models.frame_buffer import FrameRingBuffer
+from droneapp.models.motion_gate import MotionGate
+
+SHAPE = (96, 128, 3)
+
+
+def scene(shift=0):
+    frame = np.zeros(SHAPE, dtype=np.uint8)
+    frame[30:60, 40 + shift:70 + shift] = 200
+    return frame
+
+
+def test_skips_unchanged_frames_until_scene_moves():
+    gate = MotionGate()
+    assert gate.should_detect(scene())
+    assert not gate.should_detect(scene())
+    # 조금의 noise는 무시한다.
+    noisy = scene()
+    noisy[0, 0] = 255
+    assert not gate.should_detect(noisy)
+    assert gate.should_detect(scene(shift=20))
+    assert gate.stats()['skipped'] == 2 and gate.skip_ratio == 0.5
+
+
+def test_detects_after_max_skip_frames():
+    gate = MotionGate(max_skip_frames=2)
+    results = [gate.should_detect(scene()) for _ in range(6)]
+    assert results == [True, False, False, True, False, False]
+
+
+def test_reset_forces_detection():
+    gate = MotionGate()
+    gate.should_detect(scene())
+    gate.reset()
+    assert gate.should_detect(scene())
+
+
+def test_worker_reuses_last_faces_for_unchanged_frames():
+    buffer = FrameRingBuffer(SHAPE)
+    detected = []
+    results = queue.Queue()
+
+    def detect(frame):
+        detected.append(frame)
+        return [(40, 30, 30, 30)]
+
+    worker = FaceDetectionWorker(buffer, detect, on_faces=lambda faces, sequence: results.put((faces, sequence)),
+                                 rate=1000, motion_gate=MotionGate())
+    worker.start()
+    try:
+        for sequence in (1, 2):
+            buffer.write(scene())
+            assert results.get(timeout=5) == (((40, 30, 30, 30),), sequence)
+    finally:
+        worker.stop()
+    # 두번째 frame은 얼굴인식을 하지 않고 마지막 결과를 다시 알린다.
+    assert len(detected) == 1 and worker.detections == 1
+    assert worker.stats()['motion_gate']['skipped'] == 1
@@ -0,0 +1,113 @@
+from concurrent.futures import Future
+import os
+import threading
+import types
+
+import cv2 as cv
+import numpy as np
+import pytest
+
+from droneapp.models.drone_manager import DroneManager
+from droneapp.models.face_detector import HAAR_XML_FILE
+from droneapp.models.process_pipeline import ProcessVideoPipeline
+from droneapp.models.video_broadcaster import DEFAULT_PROFILE
+
+FRAME_SHAPE = (48, 64, 3)
+FRAMES = 12
+XML_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), HAAR_XML_FILE)
+
+
+def test_results_in_order_with_passed_faces():
+    results = []
+    done = threading.Event()
+
+    def on_result(result):
+        results.append(result)
+        if len(results) == FRAMES:
+            done.set()
+
+    pipeline = ProcessVideoPipeline(FRAME_SHAPE, workers=2, slots=FRAMES, on_result=on_result).start()
+    try:
+        frame = np.zeros(FRAME_SHAPE, dtype=np.uint8)
+        for i in range(FRAMES):
+            # 짝수 frame에만 얼굴 위치를 넘긴다.
+            faces = ((10, 10, 20, 20),) if i % 2 == 0 else ()
+            assert pipeline.submit(frame, [DEFAULT_PROFILE], faces) == i + 1
+        assert done.wait(30)
+    finally:
+        pipeline.stop()
+
+    assert [result.sequence for result in results] == list(range(1, FRAMES + 1))
+    assert pipeline.stats()['dropped'] == 0 and pipeline.skipped == 0
+    for result in results:
+        image = cv.imdecode(np.frombuffer(result.jpegs[DEFAULT_PROFILE], np.uint8), cv.IMREAD_COLOR)
+        # 인코딩 task는 넘긴 얼굴만 그리고 얼굴인식은 하지 않는다.
+        drawn = image[10:31, 10:31].max() > 100
+        assert drawn == (result.sequence % 2 == 1)
+
+
+def test_drop_when_no_free_slot():
+    pipeline = ProcessVideoPipeline(FRAME_SHAPE, workers=1, slots=1).start()
+    try:
+        frame = np.zeros(FRAME_SHAPE, dtype=np.uint8)
+        # 모든 slot이 처리중인 경우
+        with pipeline._lock:
+            pipeline._free_slots.clear()
+        assert pipeline.submit(frame, [DEFAULT_PROFILE]) is None
+        assert pipeline.dropped == 1
+    finally:
+        pipeline.stop()
+
+
+def test_detect_runs_in_worker():
+    pipeline = ProcessVideoPipeline(FRAME_SHAPE, workers=1, detector=('haar', {'xml_file': XML_FILE}))
+    try:
+        # 처음 호출할 때 프로세스를 시작한다.
+        future = pipeline.detect(np.zeros(FRAME_SHAPE, dtype=np.uint8))
+        assert future.result(timeout=30) == ()
+        assert pipeline.stats()['detections'] == 1 and pipeline.stats()['in_flight'] == 0
+        assert len(pipeline._free_slots) == pipeline.slots
+    finally:
+        pipeline.stop()
+
+
+def test_detect_error_is_returned_and_worker_keeps_encoding():
+    results = []
+    done = threading.Event()
+    pipeline = ProcessVideoPipeline(FRAME_SHAPE, workers=1, detector=('haar', {'xml_file': 'missing.xml'}),
+                                    on_result=lambda result: (results.append(result), done.set())).start()
+    try:
+        frame = np.zeros(FRAME_SHAPE, dtype=np.uint8)
+        with pytest.raises(RuntimeError):
+            pipeline.detect(frame).result(timeout=30)
+        pipeline.submit(frame, [DEFAULT_PROFILE])
+        assert done.wait(30)
+    finally:
+        pipeline.stop()
+    assert DEFAULT_PROFILE in results[0].jpegs
+
+
+def test_detect_without_detector():
+    pipeline = ProcessVideoPipeline(FRAME_SHAPE, workers=1)
+    assert pipeline.detect(np.zeros(FRAME_SHAPE, dtype=np.uint8)) is None
+    assert not pipeline.is_running
+
+
+class FakePipeline(object):
+    def __init__(self, faces):
+        self.faces = faces
+
+    def detect(self, frame):
+        if self.faces is None:
+            return None
+        future = Future()
+        future.set_result(self.faces)
+        return future
+
+
+@pytest.mark.parametrize('pipeline_faces, expected', [(((1, 2, 3, 4),), ((1, 2, 3, 4),)), (None, 'local')])
+def test_drone_detects_faces_in_pipeline(pipeline_faces, expected):
+    # 빈 slot이 없다면(None) 얼굴인식 스레드에서 직접 한다.
+    drone = types.SimpleNamespace(is_face_tracking=False, video_pipeline=FakePipeline(pipeline_faces),
+                                  _detect=lambda frame: 'local')
+    assert DroneManager.detect_faces(drone, np.zeros(FRAME_SHAPE, dtype=np.uint8)) == expected
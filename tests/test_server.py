@@ -0,0 +1,90 @@
+import types
+
+import pytest
+
+from droneapp.controller import server
+from droneapp.controller.server import app
+from droneapp.models.course import CourseA
+from droneapp.models.course import CourseB
+from droneapp.models.course_simulator import MockDrone
+from droneapp.models.drone_state import DroneStateBuffer
+from droneapp.models.mission import VirtualClock
+from droneapp.models.shake_channel import ShakeChannel
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    return app.test_client()
+
+
+# 실제 드론 대신 MockDrone으로 코스를 만든다.
+@pytest.fixture
+def drone(monkeypatch):
+    drone = MockDrone(VirtualClock())
+    monkeypatch.setattr(server, 'get_drone', lambda drone_id=None: drone)
+    yield drone
+    for course_class in (CourseA, CourseB):
+        course = course_class.remove_instance(drone)
+        if course is not None:
+            ShakeChannel.remove_instance(course)
+
+
+@pytest.mark.parametrize('query', ['', '?id=', '?id=abc', '?id=1.5'])
+def test_shake_simulate_rejects_bad_id(client, query):
+    response = client.get('/api/shake/simulate' + query)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+@pytest.mark.parametrize('course_id', ['0', '-1', '3'])
+def test_shake_simulate_unknown_course(client, drone, course_id):
+    response = client.get('/api/shake/simulate?id=' + course_id)
+    assert response.status_code == 404
+    assert 'error' in response.get_json()
+
+
+def test_shake_simulate_runs_course(client, drone):
+    response = client.get('/api/shake/simulate?id=1&mode=paced')
+    assert response.status_code == 200
+    assert response.get_json()['course'] == 'CourseA'
+
+
+@pytest.mark.parametrize('path', ['stats', 'stream', 'run', 'stop', 'start'])
+@pytest.mark.parametrize('course_id', ['0', '-1', '3', 'abc'])
+def test_shake_channel_unknown_course(client, drone, path, course_id):
+    response = client.get(f'/api/shake/{path}?id={course_id}')
+    assert response.status_code == 404
+    response = client.post('/api/shake/events', data={'id': course_id})
+    assert response.status_code == 404
+
+
+def test_shake_stats_for_known_course(client, drone):
+    response = client.get('/api/shake/stats?id=2')
+    assert response.status_code == 200
+    assert response.get_json()['runner'] is None
+
+
+@pytest.fixture
+def state(monkeypatch):
+    state = DroneStateBuffer()
+    monkeypatch.setattr(server, 'get_drone', lambda drone_id=None: types.SimpleNamespace(state=state))
+    return state
+
+
+@pytest.mark.parametrize('query', ['seconds=0', 'seconds=-3', 'seconds=nan', 'seconds=abc', 'points=0',
+                                   'points=-1', 'points=1.5'])
+def test_state_history_rejects_bad_query(client, state, query):
+    response = client.get('/api/state/history?' + query)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_state_is_valid_json_with_missing_values(client, state):
+    state.append(b'pitch:nan;h:30;bat:inf;', timestamp=5.0)
+    response = client.get('/api/state')
+    assert b'NaN' not in response.data and b'Infinity' not in response.data
+    assert response.get_json()['pitch'] is None and response.get_json()['h'] == 30
+    response = client.get('/api/state/history?seconds=10&points=5&fields=bat,h')
+    assert response.status_code == 200
+    assert response.get_json() == {'timestamp': [5.0], 'bat': [None], 'h': [30.0]}
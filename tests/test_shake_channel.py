@@ -0,0 +1,86 @@
+from concurrent.futures import Future
+import json
+import time
+
+from droneapp.models.course import CourseA
+from droneapp.models.course_simulator import MockDrone
+from droneapp.models.mission import VirtualClock
+from droneapp.models.shake_channel import ShakeChannel
+
+
+# 응답이 오지 않는 드론 (runner가 첫 단계의 응답을 계속 기다린다)
+class SilentDrone(object):
+    def __init__(self):
+        self.commands = []
+
+    def __getattr__(self, name):
+        def send(*args):
+            self.commands.append(name)
+            return Future()
+        return send
+
+
+def test_push_is_limited_per_client():
+    clock = VirtualClock()
+    channel = ShakeChannel(CourseA('Course A', MockDrone(clock), clock=clock), rate=1.0, burst=3)
+    channel.start()
+    status = channel.push('a', 10)
+    assert channel.stats()['accepted'] == 3
+    assert status['status'] == 3 and status['running']
+    # 다른 참가자는 따로 계산한다.
+    channel.push('b', 2)
+    assert channel.stats()['accepted'] == 5 and channel.stats()['clients'] == 2
+
+
+def test_stream_sends_latest_status():
+    clock = VirtualClock()
+    channel = ShakeChannel(CourseA('Course A', MockDrone(clock), clock=clock))
+    stream = channel.stream()
+    assert json.loads(next(stream)[len('data: '):])['running'] is False
+    channel.start()
+    assert json.loads(next(stream)[len('data: '):])['running'] is True
+    stream.close()
+    assert channel.stats()['subscribers'] == 0
+
+
+def test_timed_course_publishes_progress():
+    clock = VirtualClock()
+    drone = MockDrone(clock)
+    channel = ShakeChannel(CourseA('Course A', drone, clock=clock))
+    version = channel.latest()[0]
+    assert channel.start_timed() is not None
+    channel._runner.join(5)
+
+    assert not channel.is_runner_active
+    assert [command for _, command, _ in drone.commands][0] == 'takeoff'
+    assert drone.commands[-1][1] == 'land'
+    # 시작, 단계마다, 끝날 때 상태를 알린다.
+    assert channel.version - version >= len(CourseA.steps) + 2
+    status = channel.latest()[1]
+    assert status['mode'] == 'timed' and status['running'] is False
+    assert channel.stats()['runner']['result'] == 'done'
+
+
+def test_running_runner_is_not_replaced_and_can_be_stopped():
+    drone = SilentDrone()
+    channel = ShakeChannel(CourseA('Course A', drone))
+    assert channel.start_timed(paced=True) is not None
+    try:
+        deadline = time.monotonic() + 5
+        while not drone.commands and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert channel.latest()[1]['running']
+        # 두번째 시작과 shake는 진행중인 runner를 방해하지 않는다.
+        assert channel.start_timed() is None
+        assert channel.start() is None
+        channel.push('a', 3)
+        assert channel.stats()['accepted'] == 0
+    finally:
+        status = channel.stop()
+    channel._runner.join(5)
+
+    assert not channel.is_runner_active
+    assert status['running'] is False
+    assert channel.latest()[1]['mode'] == 'paced'
+    assert channel.stats()['runner']['result'] == 'aborted'
+    assert drone.commands == ['takeoff']
@@ -0,0 +1,52 @@
+import socket
+
+import pytest
+
+from tools.tello_simulator import TelloSimulator
+
+
+@pytest.fixture
+def make_simulator(free_udp_ports):
+    def make(**options):
+        command_port, state_port, video_port = free_udp_ports(3)
+        return TelloSimulator(command_port=command_port, state_port=state_port, video_port=video_port,
+                              **options)
+    return make
+
+
+def test_handle_command_tracks_drone_state(make_simulator):
+    simulator = make_simulator()
+    try:
+        assert simulator.handle_command('command\r\n') == 'ok'
+        assert simulator.handle_command('takeoff') == 'ok' and simulator.is_flying
+        assert simulator.handle_command('up 40') == 'ok'
+        assert simulator.handle_command('height?') == '12dm'
+        assert simulator.handle_command('speed 55.5') == 'ok'
+        assert simulator.handle_command('speed?') == '55'
+        assert simulator.handle_command('speed fast') == 'error'
+        # rc는 실제 드론처럼 응답하지 않는다.
+        assert simulator.handle_command('rc 0 0 0 10') is None
+        assert simulator.handle_command('land') == 'ok' and simulator.height == 0
+        assert simulator.handle_command('dance') == 'error'
+    finally:
+        simulator.socket.close()
+
+
+def test_replies_over_udp_and_drops_lost_commands(make_simulator):
+    client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    client.settimeout(2)
+    try:
+        with make_simulator() as simulator:
+            client.sendto(b'battery?', ('127.0.0.1', simulator.command_port))
+            assert client.recvfrom(1024)[0] == b'87'
+        with make_simulator(loss=1.0) as simulator:
+            client.settimeout(0.3)
+            client.sendto(b'battery?', ('127.0.0.1', simulator.command_port))
+            try:
+                client.recvfrom(1024)
+                replied = True
+            except socket.timeout:
+                replied = False
+        assert not replied and simulator.received == simulator.dropped == 1
+    finally:
+        client.close()
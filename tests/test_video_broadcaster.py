@@ -0,0 +1,117 @@
+import queue
+import threading
+
+import cv2 as cv
+import numpy as np
+
+from droneapp.models.video_broadcaster import DEFAULT_PROFILE
+from droneapp.models.video_broadcaster import encode_jpeg
+from droneapp.models.video_broadcaster import make_profile
+from droneapp.models.video_broadcaster import MIN_JPEG_QUALITY
+from droneapp.models.video_broadcaster import QUALITY_STEP
+from droneapp.models.video_broadcaster import RECOVER_FRAMES
+from droneapp.models.video_broadcaster import VideoBroadcaster
+from droneapp.models.video_broadcaster import VideoProfile
+from droneapp.models.video_broadcaster import VideoSubscriber
+
+
+# 정해진 frame을 차례로 돌려주는 source. 시청자가 frame을 받아갈 때까지 다음 frame을 만들지 않는다.
+class StepSource(object):
+    def __init__(self):
+        self.frames = queue.Queue()
+
+    def __call__(self):
+        while True:
+            frame = self.frames.get(timeout=5)
+            if frame is None:
+                return
+            yield frame
+
+
+class CountingEncoder(object):
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, frame, quality, scale):
+        with self.lock:
+            self.calls.append((frame, quality, scale))
+        return f'{frame}@{quality}x{scale}'.encode('ascii')
+
+
+def test_one_encode_is_shared_by_all_viewers():
+    source, encode = StepSource(), CountingEncoder()
+    broadcaster = VideoBroadcaster(source, encode)
+    viewers = [broadcaster.subscribe() for _ in range(3)]
+    source.frames.put('frame1')
+    assert [viewer.queue.get(timeout=5) for viewer in viewers] == [b'frame1@80x1.0'] * 3
+    assert len(encode.calls) == 1
+    assert broadcaster.stats()['frames'] == 1 and broadcaster.encodes == 1
+    source.frames.put(None)
+
+
+def test_producer_stops_without_viewers_and_restarts():
+    source, encode = StepSource(), CountingEncoder()
+    broadcaster = VideoBroadcaster(source, encode)
+    stream = broadcaster.stream(timeout=0.05)
+    source.frames.put('frame1')
+    assert next(stream) == b'frame1@80x1.0'
+    stream.close()
+    assert broadcaster.subscriber_count == 0
+    # 시청자가 없다면 다음 frame은 인코딩하지 않고 producer를 끝낸다.
+    thread = broadcaster._thread
+    source.frames.put('frame2')
+    thread.join(5)
+    assert broadcaster._thread is None and len(encode.calls) == 1
+
+    viewer = broadcaster.subscribe()
+    source.frames.put('frame3')
+    assert viewer.queue.get(timeout=5) == b'frame3@80x1.0'
+    source.frames.put(None)
+
+
+def test_slow_viewer_keeps_newest_frames():
+    broadcaster = VideoBroadcaster(lambda: iter(()), CountingEncoder(), queue_size=2)
+    viewer = broadcaster.subscribe()
+    for i in range(5):
+        broadcaster.publish(f'frame{i}', [viewer])
+    assert viewer.dropped == 3
+    assert broadcaster.queue_stats() == (2, 3)
+    assert viewer.queue.get_nowait().startswith(b'frame3')
+
+
+def test_profiles_are_encoded_once_each():
+    encode = CountingEncoder()
+    broadcaster = VideoBroadcaster(lambda: iter(()), encode)
+    small = make_profile(50, 0.5)
+    viewers = [broadcaster.subscribe(), broadcaster.subscribe(small), broadcaster.subscribe(small)]
+    broadcaster.publish('frame', viewers)
+    assert sorted(call[1:] for call in encode.calls) == [(50, 0.5), (80, 1.0)]
+    jpegs = [viewer.queue.get_nowait() for viewer in viewers]
+    assert jpegs == [b'frame@80x1.0', b'frame@50x0.5', b'frame@50x0.5']
+
+
+def test_make_profile_clamps_values():
+    assert make_profile() == DEFAULT_PROFILE
+    assert make_profile('500', '0') == VideoProfile(100, 0.1)
+    assert make_profile(-5, 3) == VideoProfile(1, 1.0)
+
+
+def test_quality_drops_for_slow_viewer_and_recovers():
+    viewer = VideoSubscriber(make_profile(70), maxsize=1)
+    viewer.put(b'0')
+    for _ in range(5):
+        viewer.put(b'late')
+    # 늦을 때마다 한단계씩 낮추지만 MIN_JPEG_QUALITY보다 낮추지 않는다.
+    assert viewer.profile == VideoProfile(MIN_JPEG_QUALITY, 1.0)
+    for _ in range(RECOVER_FRAMES):
+        viewer.queue.get_nowait()
+        viewer.put(b'on time')
+    assert viewer.quality == MIN_JPEG_QUALITY + QUALITY_STEP
+    assert viewer.stats()['requested_quality'] == 70
+
+
+def test_encode_jpeg_scales_frame():
+    frame = np.zeros((40, 60, 3), dtype=np.uint8)
+    image = cv.imdecode(np.frombuffer(encode_jpeg(frame, 50, 0.5), np.uint8), cv.IMREAD_COLOR)
+    assert image.shape == (20, 30, 3)
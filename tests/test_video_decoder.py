@@ -0,0 +1,94 @@
+import shutil
+
+import numpy as np
+import pytest
+
+from droneapp.models import video_decoder
+from droneapp.models.frame_buffer import FrameRingBuffer
+from droneapp.models.video_decoder import create_video_decoder
+from droneapp.models.video_decoder import ErrorVideoDecoderNotAvailable
+from droneapp.models.video_decoder import FfmpegVideoDecoder
+
+WIDTH, HEIGHT = 4, 2
+
+
+class Timer(object):
+    def __init__(self):
+        self.observed = []
+
+    def observe(self, seconds):
+        self.observed.append(seconds)
+
+
+def test_unknown_decoder():
+    with pytest.raises(ErrorVideoDecoderNotAvailable):
+        create_video_decoder('gstreamer', WIDTH, HEIGHT)
+
+
+def test_pyav_not_installed(monkeypatch):
+    monkeypatch.setattr(video_decoder, 'av', None)
+    with pytest.raises(ErrorVideoDecoderNotAvailable):
+        create_video_decoder('pyav', WIDTH, HEIGHT)
+
+
+def test_ffmpeg_not_installed(monkeypatch):
+    monkeypatch.setattr(video_decoder, 'CMD_FFMPEG', 'no-such-ffmpeg -i pipe:0')
+    decoder = create_video_decoder('ffmpeg', WIDTH, HEIGHT)
+    with pytest.raises(ErrorVideoDecoderNotAvailable):
+        decoder.start(FrameRingBuffer((HEIGHT, WIDTH, 3)))
+
+
+@pytest.mark.skipif(shutil.which('cat') is None, reason='needs cat')
+def test_ffmpeg_output_is_read_into_frame_buffer(monkeypatch):
+    # ffmpeg 대신 받은 데이터를 그대로 돌려주는 cat으로 pipe와 frame 단위 읽기를 시험한다.
+    monkeypatch.setattr(video_decoder, 'CMD_FFMPEG', 'cat')
+    buffer = FrameRingBuffer((HEIGHT, WIDTH, 3))
+    decoder = FfmpegVideoDecoder(WIDTH, HEIGHT)
+    decoder.timer = Timer()
+    decoder.start(buffer)
+    try:
+        frame = np.arange(HEIGHT * WIDTH * 3, dtype=np.uint8).reshape(HEIGHT, WIDTH, 3)
+        decoder.write(frame.tobytes())
+        sequence, latest = buffer.wait_next(0, timeout=5)
+        assert sequence == 1 and (latest == frame).all()
+    finally:
+        decoder.stop()
+    decoder._read_thread.join(5)
+    assert decoder.proc.poll() is not None
+    assert len(decoder.timer.observed) == 1
+    # 이미 종료된 decoder를 다시 멈춰도 된다.
+    decoder.stop()
+
+
+# libx264로 만든 H.264 stream (Annex B). 밝기가 frame마다 달라진다.
+def h264_stream(av, count, width=64, height=48):
+    encoder = av.CodecContext.create('libx264', 'w')
+    encoder.width, encoder.height, encoder.pix_fmt = width, height, 'yuv420p'
+    data = b''
+    for i in range(count):
+        frame = av.VideoFrame.from_ndarray(np.full((height, width, 3), i * 8, dtype=np.uint8), format='bgr24')
+        frame = frame.reformat(format='yuv420p')
+        frame.pts = i
+        data += b''.join(bytes(packet) for packet in encoder.encode(frame))
+    data += b''.join(bytes(packet) for packet in encoder.encode(None))
+    return data
+
+
+def test_pyav_decodes_every_frame_after_stop():
+    av = pytest.importorskip('av')
+    if 'libx264' not in av.codecs_available:
+        pytest.skip('needs libx264 to make a stream')
+    data = h264_stream(av, 30)
+    buffer = FrameRingBuffer((HEIGHT * 12, WIDTH * 16, 3), size=32)
+    decoder = create_video_decoder('pyav', WIDTH * 16, HEIGHT * 12)
+    decoder.timer = Timer()
+    decoder.start(buffer)
+    for i in range(0, len(data), 500):
+        decoder.write(data[i:i + 500])
+    # parser와 decoder 안에 남아있는 마지막 frame들은 stop에서 나온다.
+    assert buffer.sequence < 30
+    decoder.stop()
+    assert buffer.sequence == 30 and len(decoder.timer.observed) == 30
+    assert buffer.latest()[1].mean() > 200
+    decoder.stop()
+    assert buffer.sequence == 30
@@ -0,0 +1,97 @@
+import socket
+
+import pytest
+
+from droneapp.models import video_ingest
+from droneapp.models.video_ingest import H264_START_CODE
+from droneapp.models.video_ingest import H264FrameAssembler
+from droneapp.models.video_ingest import is_keyframe_unit
+from droneapp.models.video_ingest import is_picture_unit
+from droneapp.models.video_ingest import open_video_socket
+from droneapp.models.video_ingest import receive_batch
+from droneapp.models.video_ingest import split_nal_units
+
+PACKET_SIZE = 8
+
+
+# frame을 Tello처럼 packet_size 단위의 조각으로 나눈다. (마지막 조각만 작다)
+def fragments(frame, size=PACKET_SIZE):
+    return [frame[i:i + size] for i in range(0, len(frame), size)]
+
+
+def make_frame(length, fill=b'\x41'):
+    return H264_START_CODE + (fill * length)[:length - len(H264_START_CODE)]
+
+
+def feed_all(assembler, pieces):
+    out = bytearray()
+    completed = [assembler.feed(piece, out) for piece in pieces]
+    return out, completed
+
+
+def test_reassembles_fragments_into_frames():
+    first, second = make_frame(21), make_frame(5, b'\x65')
+    frames = []
+    assembler = H264FrameAssembler(PACKET_SIZE)
+    assembler.on_frame = lambda frame: frames.append(bytes(frame))
+    out, completed = feed_all(assembler, fragments(first) + fragments(second))
+    assert completed == [False, False, True, True]
+    assert bytes(out) == first + second
+    assert frames == [first, second]
+    assert assembler.stats() == {'packets': 4, 'bytes': 26, 'frames': 2, 'dropped_frames': 0, 'writes': 0}
+
+
+def test_lost_first_fragment_is_dropped():
+    frame = make_frame(21)
+    assembler = H264FrameAssembler(PACKET_SIZE)
+    out, completed = feed_all(assembler, fragments(frame)[1:] + fragments(make_frame(5)))
+    assert completed == [False, False, True]
+    assert bytes(out) == make_frame(5)
+    assert assembler.dropped_frames == 1 and assembler.frames == 1
+
+
+def test_lost_middle_fragment_is_not_counted():
+    # 조각의 크기만으로는 중간 조각을 잃어버린 것을 알 수 없어서 decoder에 그대로 보낸다.
+    pieces = fragments(make_frame(21))
+    assembler = H264FrameAssembler(PACKET_SIZE)
+    out, completed = feed_all(assembler, [pieces[0], pieces[2]])
+    assert completed == [False, True]
+    assert bytes(out) == pieces[0] + pieces[2]
+    assert assembler.dropped_frames == 0
+
+
+def test_frame_without_end_is_dropped_at_max_size(monkeypatch):
+    monkeypatch.setattr(video_ingest, 'MAX_FRAME_BYTES', PACKET_SIZE * 2)
+    assembler = H264FrameAssembler(PACKET_SIZE)
+    out, _ = feed_all(assembler, [make_frame(PACKET_SIZE)] * 3 + fragments(make_frame(5)))
+    assert assembler.dropped_frames == 1
+    assert bytes(out) == make_frame(5)
+
+
+def test_nal_units():
+    sps, idr, slice_ = H264_START_CODE + b'\x67\x01', H264_START_CODE + b'\x65\x02', H264_START_CODE + b'\x41\x03'
+    assert split_nal_units(sps + idr + slice_) == [sps, idr, slice_]
+    assert [is_keyframe_unit(unit) for unit in (sps, idr, slice_)] == [True, True, False]
+    assert [is_picture_unit(unit) for unit in (sps, idr, slice_)] == [False, True, True]
+
+
+def test_receive_batch_reads_waiting_packets():
+    sock_video = open_video_socket('127.0.0.1', 0)
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        address = sock_video.getsockname()
+        frame = make_frame(21)
+        for piece in fragments(frame):
+            sender.sendto(piece, address)
+        assembler = H264FrameAssembler(PACKET_SIZE)
+        out = bytearray()
+        received = 0
+        while received < 3:
+            received += receive_batch(sock_video, bytearray(64), assembler, out, timeout=1)
+        assert bytes(out) == frame
+
+        with pytest.raises(socket.timeout):
+            receive_batch(sock_video, bytearray(64), assembler, out, timeout=0.01)
+    finally:
+        sender.close()
+        sock_video.close()
@@ -0,0 +1,39 @@
+import threading
+
+from droneapp.models import video_recorder
+from droneapp.models.video_ingest import H264_START_CODE
+from droneapp.models.video_recorder import StreamRecorder
+from droneapp.models.video_recorder import VideoRecording
+
+IDR_FRAME = H264_START_CODE + b'\x65' + b'\x11' * 11
+P_FRAME = H264_START_CODE + b'\x41' + b'\x22' * 11
+
+
+def test_pending_bytes_include_batch_being_written(tmp_path, monkeypatch):
+    writing = threading.Event()
+    release = threading.Event()
+
+    # 첫 frame을 쓰는 도중에 디스크가 멈춘 것처럼 기다린다.
+    def slow_contains_keyframe(frame):
+        writing.set()
+        release.wait(5)
+        return frame.startswith(IDR_FRAME[:5])
+
+    monkeypatch.setattr(video_recorder, 'contains_keyframe', slow_contains_keyframe)
+    recorder = StreamRecorder(str(tmp_path), max_pending_bytes=len(IDR_FRAME) * 2).start()
+    assert recorder.write(IDR_FRAME, recorder._start_time)
+    assert writing.wait(5)
+    # 꺼내간 frame도 아직 쓰지 않았기 때문에 한도에 포함된다.
+    assert recorder.write(P_FRAME, recorder._start_time + 0.1)
+    assert not recorder.write(P_FRAME, recorder._start_time + 0.2)
+    assert recorder.stats()['pending_bytes'] == len(IDR_FRAME) + len(P_FRAME)
+
+    release.set()
+    recorder.stop()
+    stats = recorder.stats()
+    assert stats['pending_bytes'] == 0
+    assert stats['frames'] == 2 and stats['dropped'] == 1
+
+    recording = VideoRecording(str(tmp_path))
+    assert [frame for _, frame in recording.frames()] == [IDR_FRAME, P_FRAME]
+    assert recording.keyframes == [0]
@@ -0,0 +1,92 @@
+import socket
+import threading
+import time
+import types
+
+from droneapp.models.drone_manager import DroneManager
+from droneapp.models.log_pipeline import LogThrottle
+from droneapp.models.video_ingest import H264_START_CODE
+from droneapp.models.video_ingest import H264FrameAssembler
+from droneapp.models.video_recorder import StreamRecorder
+
+IDR_FRAME = H264_START_CODE + b'\x65' + b'\x11' * 11
+P_FRAME = H264_START_CODE + b'\x41' + b'\x22' * 11
+
+
+def live_frame(number):
+    return H264_START_CODE + b'\x41' + bytes([number]) * 11
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('timed out')
+        time.sleep(0.01)
+
+
+class FakeDecoder(object):
+    def __init__(self):
+        self.frames = []
+
+    def write(self, data):
+        self.frames.append(bytes(data))
+
+
+# 영상 수신과 재생에 필요한 속성만 가진 가짜 드론
+def fake_drone():
+    return types.SimpleNamespace(
+        video_decoder=FakeDecoder(),
+        video_ingest=H264FrameAssembler(),
+        video_replay=None,
+        _log_video=LogThrottle(),
+        _video_lock=threading.Lock(),
+        _live_video_lock=threading.Lock(),
+        _live_video_paused=threading.Event(),
+    )
+
+
+def record(directory, frames):
+    recorder = StreamRecorder(directory).start()
+    for i, frame in enumerate(frames):
+        recorder.write(frame, recorder._start_time + i * 0.01)
+    recorder.stop()
+
+
+def test_replay_pauses_live_video(tmp_path, free_udp_ports):
+    record(str(tmp_path), [IDR_FRAME, P_FRAME])
+    drone = fake_drone()
+    port, = free_udp_ports(1)
+    stop_event = threading.Event()
+    thread = threading.Thread(target=DroneManager.receive_video, args=(drone, stop_event, '127.0.0.1', port))
+    thread.daemon = True
+    thread.start()
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def send_live(number):
+        frames = drone.video_ingest.frames
+        sender.sendto(live_frame(number), ('127.0.0.1', port))
+        wait_until(lambda: drone.video_ingest.frames > frames)
+
+    try:
+        wait_until(lambda: thread.is_alive())
+        time.sleep(0.1)
+        send_live(1)
+        wait_until(lambda: len(drone.video_decoder.frames) == 1)
+
+        replay = DroneManager.start_replay(drone, str(tmp_path), realtime=False)
+        # 재생하는 동안 받은 드론의 영상은 decoder에 넣지 않는다.
+        send_live(2)
+        wait_until(lambda: not replay.is_running)
+        send_live(3)
+
+        DroneManager.stop_replay(drone)
+        assert not drone._live_video_paused.is_set()
+        send_live(4)
+        wait_until(lambda: len(drone.video_decoder.frames) == 4)
+    finally:
+        stop_event.set()
+        sender.close()
+        thread.join(2)
+
+    assert drone.video_decoder.frames == [live_frame(1), IDR_FRAME, P_FRAME, live_frame(4)]
@@ -0,0 +1,81 @@
+import argparse
+import logging
+import sys
+import time
+
+from droneapp.models.drone_manager import DroneManager
+from tools.benchmark_util import print_results
+from tools.benchmark_util import save_results
+from tools.benchmark_util import summarize
+from tools.tello_simulator import TelloSimulator
+
+# 프로젝트 루트에서 실행 : python -m tools.benchmark_command --count 200 --delay 0.005
+
+
+# DroneManager의 실제 코드(_send_command / receive_response)를 통해 명령어 왕복시간을 측정
+# dispatcher가 True라면 send_command(priority queue + dispatcher 스레드)를 거쳐서 측정
+def run(drone, command, count, dispatcher=False):
+    latencies = []
+    timeouts = 0
+    start = time.perf_counter()
+    for _ in range(count):
+        t = time.perf_counter()
+        if dispatcher:
+            response = drone.send_command(command).result()
+        else:
+            response = drone._send_command(command)
+        latencies.append(time.perf_counter() - t)
+        if response is None:
+            timeouts += 1
+    total = time.perf_counter() - start
+
+    results = summarize(latencies)
+    results['timeouts'] = timeouts
+    results['total_s'] = total
+    results['commands_per_sec'] = count / total if total else 0.0
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='DroneManager command round-trip benchmark')
+    parser.add_argument('--count', type=int, default=100)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--command', default='battery?')
+    parser.add_argument('--delay', type=float, default=0.005, help='simulator reply delay in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='simulator reply jitter in seconds')
+    parser.add_argument('--loss', type=float, default=0.0, help='simulator command loss probability')
+    parser.add_argument('--ip', default='127.0.0.1')
+    parser.add_argument('--drone-port', type=int, default=8889)
+    parser.add_argument('--host-port', type=int, default=9889)
+    parser.add_argument('--dispatcher', action='store_true',
+                        help='go through send_command and the command dispatcher')
+    parser.add_argument('--output', default=None, help='save results as json')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, stream=sys.stdout)
+
+    simulator = TelloSimulator(ip=args.ip, command_port=args.drone_port,
+                               reply_delay=args.delay, jitter=args.jitter,
+                               loss=args.loss).start()
+    drone = DroneManager(host_ip=args.ip, host_port=args.host_port,
+                         drone_ip=args.ip, drone_port=args.drone_port)
+    try:
+        # 초기화때 보낸 command / streamon / speed의 응답을 기다린다.
+        drone.set_speed(drone.speed).result()
+
+        run(drone, args.command, args.warmup, args.dispatcher)
+        results = run(drone, args.command, args.count, args.dispatcher)
+        results['dispatcher'] = drone.command_dispatcher.stats()
+        results.update({'command': args.command, 'delay_s': args.delay,
+                        'jitter_s': args.jitter, 'loss': args.loss})
+    finally:
+        drone.stop()
+        simulator.stop()
+
+    print_results('command round-trip', results)
+    if args.output:
+        save_results(args.output, 'command', results)
+
+
+if __name__ == '__main__':
+    main()
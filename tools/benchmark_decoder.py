@@ -0,0 +1,111 @@
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+
+from droneapp.models.drone_manager import FRAME_SHAPE
+from droneapp.models.drone_manager import FRAME_X
+from droneapp.models.drone_manager import FRAME_Y
+from droneapp.models.frame_buffer import FrameRingBuffer
+from droneapp.models.video_decoder import VIDEO_DECODERS
+from droneapp.models.video_decoder import create_video_decoder
+from droneapp.models.video_ingest import is_picture_unit
+from droneapp.models.video_ingest import split_nal_units
+from tools.benchmark_util import print_results
+from tools.benchmark_util import save_results
+from tools.benchmark_util import summarize
+
+# 프로젝트 루트에서 실행 : python -m tools.benchmark_decoder flight.h264 --decoder ffmpeg --decoder pyav
+
+
+# 디코딩된 frame이 ring buffer에 들어온 시간을 기록하는 스레드
+def record_frames(frame_buffer, times, stop_event):
+    sequence = 0
+    while not stop_event.is_set():
+        new_sequence, frame = frame_buffer.wait_next(sequence, timeout=0.1)
+        if frame is None:
+            continue
+        now = time.perf_counter()
+        # 건너뛴 frame도 같은 시간에 디코딩이 끝났다고 본다.
+        times.extend([now] * (new_sequence - sequence))
+        sequence = new_sequence
+
+
+# 화면 하나(picture NAL unit)를 넣은 시간부터 해당 frame이 나올 때까지를 latency로 본다.
+def run(name, units, fps):
+    frame_buffer = FrameRingBuffer(FRAME_SHAPE)
+    decoder = create_video_decoder(name, FRAME_X, FRAME_Y)
+    decoder.start(frame_buffer)
+
+    write_times = []
+    frame_times = []
+    stop_event = threading.Event()
+    recorder = threading.Thread(target=record_frames, args=(frame_buffer, frame_times, stop_event))
+    recorder.daemon = True
+    recorder.start()
+
+    cpu_start = time.process_time()
+    children_start = os.times()
+    start = time.perf_counter()
+    interval = 1.0 / fps if fps else 0
+    for unit in units:
+        if is_picture_unit(unit):
+            write_times.append(time.perf_counter())
+        decoder.write(unit)
+        if interval:
+            time.sleep(interval if is_picture_unit(unit) else 0)
+
+    # 남아 있는 frame이 모두 나올 때까지 기다린다.
+    deadline = time.perf_counter() + 5
+    while len(frame_times) < len(write_times) and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    total = time.perf_counter() - start
+    stop_event.set()
+    decoder.stop()
+
+    children_end = os.times()
+    cpu = time.process_time() - cpu_start
+    # ffmpeg subprocess가 사용한 CPU 시간
+    cpu += ((children_end.children_user - children_start.children_user) +
+            (children_end.children_system - children_start.children_system))
+
+    decoded = len(frame_times)
+    latencies = [f - w for w, f in zip(write_times, frame_times)]
+    results = summarize(latencies)
+    results.update({
+        'decoder': name,
+        'pictures': len(write_times),
+        'decoded': decoded,
+        'decode_fps': decoded / total if total else 0.0,
+        'cpu_ms_per_frame': cpu / decoded * 1000 if decoded else None,
+    })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Video decoder backend benchmark')
+    parser.add_argument('video_file', help='raw H.264 file (ex : recorded Tello stream)')
+    parser.add_argument('--decoder', action='append', choices=sorted(VIDEO_DECODERS),
+                        help='decoder to benchmark (repeatable, default : all)')
+    parser.add_argument('--fps', type=float, default=30,
+                        help='feed rate in pictures/sec, 0 = as fast as possible')
+    parser.add_argument('--output', default=None, help='save results as json')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, stream=sys.stdout)
+
+    with open(args.video_file, 'rb') as f:
+        units = split_nal_units(f.read())
+
+    results = {}
+    for name in args.decoder or sorted(VIDEO_DECODERS):
+        results[name] = run(name, units, args.fps)
+        print_results(f'decoder {name}', results[name])
+    if args.output:
+        save_results(args.output, 'decoder', results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+import cv2 as cv
+
+from droneapp.models.drone_manager import FRAME_X
+from droneapp.models.drone_manager import FRAME_Y
+from droneapp.models.face_detector import create_face_detector
+from droneapp.models.face_detector import DNN_CONFIDENCE
+from droneapp.models.face_detector import DNN_THREADS
+from droneapp.models.face_detector import FACE_DETECTORS
+from droneapp.models.face_detector import HAAR_MIN_NEIGHBORS
+from tools.benchmark_util import print_results
+from tools.benchmark_util import save_results
+from tools.benchmark_util import summarize
+from tools.benchmark_video import parse_resolution
+from tools.benchmark_video import synthetic_box
+from tools.benchmark_video import synthetic_frames
+
+# 프로젝트 루트에서 실행 :
+#   python -m tools.benchmark_detector --face-image face.jpg --detector haar --detector dnn \
+#       --min-neighbors 3 --min-neighbors 5 --confidence 0.3 --confidence 0.5 --batch 1 --batch 4
+#   python -m tools.benchmark_detector --images faces/ --annotations faces.json --output detector.json
+# 얼굴인식 방법과 설정별로 frame당 시간과 recall(찾아낸 얼굴의 비율)을 함께 측정한다.
+# 같은 recall에서 어느 쪽이 더 싼지 비교할 수 있도록 min_neighbors / confidence를 여러 값으로 실행한다.
+# annotations 파일 : {"image.jpg": [[x, y, w, h], ...], ...}
+
+
+# 얼굴 사진이 움직이는 합성 frame과 각 frame의 얼굴 위치
+def synthetic_samples(width, height, face_image):
+    frames = synthetic_frames(width, height, face_image)
+    boxes = [[synthetic_box(width, height, i, len(frames), face=True)] for i in range(len(frames))]
+    return list(zip(frames, boxes))
+
+
+# 폴더의 이미지와 annotations에 적힌 얼굴 위치
+def annotated_samples(directory, annotations_file):
+    with open(annotations_file) as f:
+        annotations = json.load(f)
+    samples = []
+    for name, boxes in sorted(annotations.items()):
+        image = cv.imread(os.path.join(directory, name))
+        if image is None:
+            raise ValueError(f'Cannot read {name}')
+        samples.append((image, [tuple(box) for box in boxes]))
+    return samples
+
+
+# 인식된 사각형의 중심이 정답 사각형 안에 있다면 찾은 것으로 본다. (정답 하나에 하나씩)
+def match_faces(faces, boxes):
+    unmatched = [tuple(face) for face in faces]
+    found = 0
+    for bx, by, bw, bh in boxes:
+        for face in unmatched:
+            x, y, w, h = face
+            if bx <= x + w / 2 <= bx + bw and by <= y + h / 2 <= by + bh:
+                unmatched.remove(face)
+                found += 1
+                break
+    return found, len(unmatched)
+
+
+# 측정할 (이름, 얼굴인식 방법, 인자) 목록
+def detector_configs(args):
+    configs = []
+    for name in args.detector or sorted(FACE_DETECTORS):
+        if name == 'haar':
+            for min_neighbors in args.min_neighbors or [HAAR_MIN_NEIGHBORS]:
+                configs.append((f'haar min_neighbors={min_neighbors}', name,
+                                {'min_neighbors': min_neighbors}))
+        elif name == 'dnn':
+            for confidence in args.confidence or [DNN_CONFIDENCE]:
+                for threads in args.threads or [DNN_THREADS]:
+                    configs.append((f'dnn confidence={confidence} threads={threads}', name,
+                                    {'confidence': confidence, 'threads': threads}))
+        else:
+            configs.append((name, name, {}))
+    return configs
+
+
+def run(detector, samples, count, batch):
+    latencies = []
+    total_boxes = found = false_positives = 0
+    start = time.perf_counter()
+    for i in range(0, count, batch):
+        chunk = [samples[j % len(samples)] for j in range(i, min(i + batch, count))]
+        batch_start = time.perf_counter()
+        results = detector.detect_batch([image for image, _ in chunk])
+        cost = time.perf_counter() - batch_start
+        # batch의 시간을 frame 수로 나누어서 frame당 시간으로 기록
+        latencies.extend([cost / len(chunk)] * len(chunk))
+        for faces, (_, boxes) in zip(results, chunk):
+            matched, extra = match_faces(faces, boxes)
+            total_boxes += len(boxes)
+            found += matched
+            false_positives += extra
+    elapsed = time.perf_counter() - start
+
+    results = summarize(latencies)
+    results.update({
+        'fps': count / elapsed if elapsed else 0.0,
+        'recall': found / total_boxes if total_boxes else None,
+        'false_positives_per_frame': false_positives / count if count else 0.0,
+    })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Face detector cost / recall benchmark')
+    parser.add_argument('--detector', action='append', choices=sorted(FACE_DETECTORS),
+                        help='face detector (repeatable, default : all)')
+    parser.add_argument('--face-image', default=None,
+                        help='photo of a face to paste into synthetic frames')
+    parser.add_argument('--resolution', action='append',
+                        help=f'WIDTHxHEIGHT of synthetic frames (repeatable, default : {FRAME_X}x{FRAME_Y})')
+    parser.add_argument('--images', default=None, help='directory of images with faces')
+    parser.add_argument('--annotations', default=None, help='json face boxes of --images')
+    parser.add_argument('--min-neighbors', type=int, action='append', help='haar (repeatable)')
+    parser.add_argument('--confidence', type=float, action='append', help='dnn (repeatable)')
+    parser.add_argument('--threads', type=int, action='append', help='dnn cpu threads (repeatable)')
+    parser.add_argument('--batch', type=int, action='append',
+                        help='frames per detect_batch call (repeatable, default : 1)')
+    parser.add_argument('--frames', type=int, default=200, help='frames per run')
+    parser.add_argument('--output', default=None, help='save results as json')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, stream=sys.stdout)
+
+    sources = {}
+    if args.face_image:
+        face_image = cv.imread(args.face_image)
+        if face_image is None:
+            parser.error(f'Cannot read {args.face_image}')
+        for resolution in args.resolution or [f'{FRAME_X}x{FRAME_Y}']:
+            width, height = parse_resolution(resolution)
+            sources[f'synthetic_face@{width}x{height}'] = synthetic_samples(width, height, face_image)
+    if args.images:
+        if not args.annotations:
+            parser.error('--images needs --annotations')
+        sources[os.path.basename(os.path.normpath(args.images))] = annotated_samples(
+            args.images, args.annotations)
+    if not sources:
+        parser.error('give --face-image and/or --images with --annotations')
+
+    results = {}
+    for config_name, detector_name, options in detector_configs(args):
+        try:
+            detector = create_face_detector(detector_name, **options).load()
+        except Exception as ex:
+            print(f'skip {config_name} : {ex}')
+            continue
+        for source, samples in sources.items():
+            for batch in args.batch or [1]:
+                name = f'{config_name} batch={batch} {source}'
+                results[name] = run(detector, samples, args.frames, max(1, batch))
+                results[name].update({'detector': detector_name, 'options': detector.options(),
+                                      'batch': batch, 'source': source})
+                print_results(name, results[name])
+    if args.output:
+        save_results(args.output, 'detector', results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+
+import config
+from droneapp.models.drone_manager import FRAME_SHAPE
+from droneapp.models.face_detector import create_face_detector
+from droneapp.models.face_detector import draw_faces
+from droneapp.models.face_detector import FACE_DETECTORS
+from droneapp.models.process_pipeline import ProcessVideoPipeline
+from droneapp.models.video_broadcaster import DEFAULT_PROFILE
+from droneapp.models.video_broadcaster import encode_jpeg
+from tools.benchmark_util import print_results
+from tools.benchmark_util import save_results
+from tools.benchmark_util import summarize
+from tools.benchmark_video import synthetic_frames
+
+# 프로젝트 루트에서 실행 : python -m tools.benchmark_pipeline --workers 2 --workers 4 --output pipeline.json
+# DroneManager와 같이 얼굴인식 스레드와 인코딩 스레드를 함께 실행해서
+# 스레드로만 처리할 때(VIDEO_PROCESS_WORKERS = 0)와 프로세스에 나누어 처리할 때의 처리량을 비교한다.
+
+
+# 얼굴인식 스레드가 계속 얼굴인식을 하는 동안 인코딩 스레드가 count개의 frame을 인코딩한다.
+#   detect(frame) : 얼굴의 위치, encode(frame, faces) : 인코딩을 시작, wait_encoded() : 모든 인코딩이 끝날 때까지 기다린다.
+def _run(frames, count, detect, encode, wait_encoded):
+    latest = {'faces': ()}
+    detect_seconds = []
+    stop_event = threading.Event()
+
+    def detect_loop():
+        i = 0
+        while not stop_event.is_set():
+            start = time.perf_counter()
+            latest['faces'] = detect(frames[i % len(frames)])
+            detect_seconds.append(time.perf_counter() - start)
+            i += 1
+
+    thread = threading.Thread(target=detect_loop)
+    thread.daemon = True
+    start = time.perf_counter()
+    thread.start()
+    for i in range(count):
+        encode(frames[i % len(frames)], latest['faces'])
+    wait_encoded()
+    elapsed = time.perf_counter() - start
+    stop_event.set()
+    thread.join()
+
+    results = {'fps': count / elapsed if elapsed else 0.0,
+               'detect_per_second': len(detect_seconds) / elapsed if elapsed else 0.0}
+    results.update({f'detect_{key}': value for key, value in summarize(detect_seconds).items()
+                    if key in ('p50_ms', 'p90_ms')})
+    return results
+
+
+def run_threads(detector, frames, count, quality):
+    def encode(frame, faces):
+        encode_jpeg(draw_faces(frame, faces), quality)
+    return _run(frames, count, detector.detect, encode, lambda: None)
+
+
+def run_processes(detector_spec, frames, count, quality, workers):
+    profile = DEFAULT_PROFILE._replace(quality=quality)
+    done = threading.Semaphore(0)
+    submitted = []
+
+    def on_result(result):
+        slots.release()
+        done.release()
+
+    pipeline = ProcessVideoPipeline(FRAME_SHAPE, workers=workers, on_result=on_result, detector=detector_spec)
+    # 얼굴인식을 위한 slot이 남도록 인코딩은 slot 수보다 하나 적게 보낸다.
+    slots = threading.Semaphore(pipeline.slots - 1)
+
+    def detect(frame):
+        future = pipeline.detect(frame)
+        return future.result(timeout=10) if future is not None else ()
+
+    def encode(frame, faces):
+        slots.acquire()
+        while pipeline.submit(frame, [profile], faces) is None:
+            time.sleep(0.001)
+        submitted.append(1)
+
+    def wait_encoded():
+        for _ in submitted:
+            done.acquire()
+
+    pipeline.start()
+    try:
+        # 프로세스가 모델을 읽는 시간은 측정하지 않는다.
+        detect(frames[0])
+        results = _run(frames, count, detect, encode, wait_encoded)
+        results.update(pipeline.stats())
+    finally:
+        pipeline.stop()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Thread vs process video pipeline benchmark')
+    parser.add_argument('--workers', type=int, action='append', help='process count (repeatable, default : 2)')
+    parser.add_argument('--frames', type=int, default=300, help='frames to encode per run')
+    parser.add_argument('--quality', type=int, default=DEFAULT_PROFILE.quality)
+    parser.add_argument('--detector', choices=sorted(FACE_DETECTORS), default=config.FACE_DETECTOR)
+    parser.add_argument('--output', default=None, help='save results as json')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, stream=sys.stdout)
+
+    options = config.FACE_DETECTOR_OPTIONS if args.detector == config.FACE_DETECTOR else {}
+    try:
+        detector = create_face_detector(args.detector, **options).load()
+    except Exception as ex:
+        parser.error(f'Cannot load face detector {args.detector} : {ex} (run from the project root)')
+    frames = synthetic_frames(FRAME_SHAPE[1], FRAME_SHAPE[0])
+
+    # 프로세스가 사용할 수 있는 core 수 (1개라면 프로세스로 나누어도 빨라지지 않는다)
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    print(f'cpus : {cpus}')
+    results = {'cpus': cpus}
+    results['threads'] = run_threads(detector, frames, args.frames, args.quality)
+    print_results('threads', results['threads'])
+    for workers in args.workers or [2]:
+        name = f'processes={workers}'
+        results[name] = run_processes((args.detector, options), frames, args.frames, args.quality, workers)
+        print_results(name, results[name])
+    if args.output:
+        save_results(args.output, 'pipeline', results)
+
+
+if __name__ == '__main__':
+    main()
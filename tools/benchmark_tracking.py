@@ -0,0 +1,72 @@
+import argparse
+import logging
+import sys
+
+from droneapp.models.face_detection import DEFAULT_DETECT_RATE
+from droneapp.models.face_follow import AXES
+from droneapp.models.face_follow import DEFAULT_CAMERA_LATENCY
+from droneapp.models.face_follow import DEFAULT_CONTROL_RATE
+from droneapp.models.tracking_simulator import DEFAULT_DETECT_SECONDS
+from droneapp.models.tracking_simulator import DEFAULT_NOISE
+from droneapp.models.tracking_simulator import SCENARIOS
+from droneapp.models.tracking_simulator import simulate_tracking
+from tools.benchmark_util import print_results
+from tools.benchmark_util import save_results
+
+# 프로젝트 루트에서 실행 :
+#   python -m tools.benchmark_tracking --scenario offset --scenario walk --latency 0.1 --latency 0.3
+#   python -m tools.benchmark_tracking --rate 10 --rate 20 --detect-rate 5 --output tracking.json
+# 드론 없이 rc 속도 모델과 얼굴인식 지연을 가상의 시간으로 실행해서 얼굴 따라가기의 성능을 측정한다.
+#   reach_seconds : 오차가 처음으로 작아지기까지 걸린 시간, settle_seconds : 그 뒤로 계속 작게 유지되기 시작한 시간
+#   overshoot : 처음 오차의 반대쪽으로 넘어간 최대 크기, rms : 평균 제곱근 오차 (오차는 화면 절반에 대한 비율)
+# 지연 보정을 켠 경우(compensation=on)와 끈 경우를 함께 비교한다.
+
+
+# 축별 결과를 print_results로 출력할 수 있도록 한 단계로 펼친다.
+def flatten(result):
+    flat = {key: value for key, value in result.items() if key not in AXES and key != 'controller'}
+    for axis in AXES:
+        for key, value in result[axis].items():
+            flat[f'{axis}_{key}'] = value
+    return flat
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Closed-loop face follow benchmark against a simulated drone')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='scenario (repeatable, default : all)')
+    parser.add_argument('--latency', type=float, action='append',
+                        help=f'camera to decoder latency in seconds (repeatable, default : {DEFAULT_CAMERA_LATENCY})')
+    parser.add_argument('--rate', type=float, action='append',
+                        help=f'rc commands per second (repeatable, default : {DEFAULT_CONTROL_RATE})')
+    parser.add_argument('--detect-rate', type=float, default=DEFAULT_DETECT_RATE, help='face detections per second')
+    parser.add_argument('--detect-seconds', type=float, default=DEFAULT_DETECT_SECONDS,
+                        help='time of one face detection')
+    parser.add_argument('--compensation', choices=('on', 'off'), action='append',
+                        help='latency compensation (repeatable, default : on and off)')
+    parser.add_argument('--noise', type=float, default=DEFAULT_NOISE, help='detection jitter in pixels')
+    parser.add_argument('--duration', type=float, default=None, help='seconds per run (default : per scenario)')
+    parser.add_argument('--output', default=None, help='save results as json')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, stream=sys.stdout)
+
+    results = {}
+    for scenario in args.scenario or sorted(SCENARIOS):
+        for latency in args.latency or [DEFAULT_CAMERA_LATENCY]:
+            for rate in args.rate or [DEFAULT_CONTROL_RATE]:
+                for compensation in args.compensation or ['on', 'off']:
+                    name = f'{scenario} latency={latency} rate={rate} compensation={compensation}'
+                    # 컨트롤러는 카메라 지연을 정확히 알고 있다고 가정한다.
+                    options = {'rate': rate, 'camera_latency': latency, 'compensate': compensation == 'on'}
+                    result = simulate_tracking(scenario, options, detect_rate=args.detect_rate,
+                                               detect_seconds=args.detect_seconds, camera_latency=latency,
+                                               noise=args.noise, duration=args.duration)
+                    results[name] = flatten(result)
+                    print_results(name, results[name])
+    if args.output:
+        save_results(args.output, 'tracking', results)
+
+
+if __name__ == '__main__':
+    main()
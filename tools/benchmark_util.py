@@ -0,0 +1,54 @@
+import json
+import math
+import platform
+import time
+
+
+# 정렬된 값에서 원하는 percentile 값을 구한다. (선형 보간)
+def percentile(sorted_values, percent):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * (percent / 100.0)
+    low = math.floor(k)
+    high = math.ceil(k)
+    if low == high:
+        return sorted_values[int(k)]
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (k - low)
+
+
+# 측정한 시간(초) 목록을 ms 단위 통계로 요약
+def summarize(latencies):
+    values = sorted(latencies)
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'mean_ms': sum(values) / len(values) * 1000,
+        'min_ms': values[0] * 1000,
+        'p50_ms': percentile(values, 50) * 1000,
+        'p90_ms': percentile(values, 90) * 1000,
+        'p99_ms': percentile(values, 99) * 1000,
+        'max_ms': values[-1] * 1000,
+    }
+
+
+# 결과를 사람이 읽을 수 있는 형태로 출력
+def print_results(name, results):
+    print(f'== {name} ==')
+    for key, value in results.items():
+        if isinstance(value, float):
+            value = f'{value:.3f}'
+        print(f'{key:>16} : {value}')
+
+
+# 버전간 비교를 위해 결과를 json으로 저장
+def save_results(path, name, results):
+    data = {
+        'benchmark': name,
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
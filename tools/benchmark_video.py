@@ -0,0 +1,210 @@
+import argparse
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+import cv2 as cv
+import numpy as np
+
+import config
+from droneapp.models.drone_manager import DroneManager
+from droneapp.models.drone_manager import FRAME_X
+from droneapp.models.drone_manager import FRAME_Y
+from droneapp.models.face_detector import create_face_detector
+from droneapp.models.face_detector import FACE_DETECTORS
+from droneapp.models.motion_gate import MotionGate
+from droneapp.models.video_broadcaster import DEFAULT_JPEG_QUALITY
+from tools.benchmark_util import print_results
+from tools.benchmark_util import save_results
+from tools.benchmark_util import summarize
+
+# 프로젝트 루트에서 실행 :
+#   python -m tools.benchmark_video --resolution 320x240 --resolution 960x720 \
+#       --face-image face.jpg --clip flight.mp4 --output video.json
+# video_jpeg_generator가 frame마다 하는 일(얼굴인식, 얼굴 그리기, JPEG 인코딩)을 그대로 실행해 측정한다.
+
+DEFAULT_RESOLUTIONS = (f'{FRAME_X}x{FRAME_Y}', '480x360', '960x720')
+
+# 미리 만들어두고 반복해서 사용할 합성 frame 수
+SYNTHETIC_FRAMES = 30
+
+
+def parse_resolution(value):
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
+
+# 합성 frame에서 i번째 사각형(얼굴 사진)의 위치 (x, y, w, h)
+def synthetic_box(width, height, i, count=SYNTHETIC_FRAMES, face=False):
+    x = int((width // 2) * (1 + np.sin(2 * np.pi * i / count)) / 2)
+    y = int((height // 3) * (1 + np.cos(2 * np.pi * i / count)) / 2)
+    if face:
+        size = min(width, height) // 3
+        return x, y, size, size
+    return x, y, width // 4, height // 4
+
+
+# 잡음 배경 위로 사각형이 움직이는 frame들 (face_image가 있다면 사각형 대신 얼굴 사진이 움직인다)
+def synthetic_frames(width, height, face_image=None, count=SYNTHETIC_FRAMES, seed=0):
+    random = np.random.RandomState(seed)
+    background = random.randint(0, 256, (height, width, 3), dtype=np.uint8)
+    background = cv.GaussianBlur(background, (0, 0), 3)
+    if face_image is not None:
+        size = min(width, height) // 3
+        face_image = cv.resize(face_image, (size, size), interpolation=cv.INTER_AREA)
+    frames = []
+    for i in range(count):
+        frame = background.copy()
+        x, y, _, _ = synthetic_box(width, height, i, count)
+        if face_image is not None:
+            frame[y:y + face_image.shape[0], x:x + face_image.shape[1]] = face_image
+        else:
+            cv.rectangle(frame, (x, y), (x + width // 4, y + height // 4), (200, 200, 200), -1)
+        frames.append(frame)
+    return frames
+
+
+# 제자리 비행 : 같은 장면에 카메라 잡음만 있는 frame들
+def hover_frames(width, height, face_image=None, count=SYNTHETIC_FRAMES, noise=2.0, seed=0):
+    frame = synthetic_frames(width, height, face_image, count=1, seed=seed)[0]
+    random = np.random.RandomState(seed + 1)
+    frames = []
+    for _ in range(count):
+        noisy = frame.astype(np.float32) + random.normal(0, noise, frame.shape)
+        frames.append(np.clip(noisy, 0, 255).astype(np.uint8))
+    return frames
+
+
+# 녹화된 영상(cv.VideoCapture로 읽을 수 있는 파일)의 frame을 원하는 크기로 바꿔서 읽는다.
+def clip_frames(path, width, height, limit):
+    capture = cv.VideoCapture(path)
+    frames = []
+    while len(frames) < limit:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        frames.append(cv.resize(frame, (width, height), interpolation=cv.INTER_AREA))
+    capture.release()
+    if not frames:
+        raise ValueError(f'Cannot read frames from {path}')
+    return frames
+
+
+# 얼굴인식 -> 얼굴 그리기 -> JPEG 인코딩을 한 frame에 대해 실행하고 단계별 시간을 돌려준다.
+# motion_gate가 있다면 화면이 바뀌지 않은 frame은 얼굴인식 대신 last_faces를 사용한다.
+def process_frame(detector, frame, quality, motion_gate=None, last_faces=()):
+    start = time.perf_counter()
+    if motion_gate is None or motion_gate.should_detect(frame):
+        faces = detector.detect(frame)
+    else:
+        faces = last_faces
+    detected = time.perf_counter()
+    frame = DroneManager.draw_faces(frame, faces)
+    drawn = time.perf_counter()
+    jpeg = DroneManager.encode_jpeg(frame, quality)
+    encoded = time.perf_counter()
+    return (detected - start, drawn - detected, encoded - drawn), faces, len(jpeg)
+
+
+def run(detector, frames, count, quality, memory_frames, use_motion_gate=False):
+    motion_gate = MotionGate() if use_motion_gate else None
+    detect, overlay, encode, total = [], [], [], []
+    faces = 0
+    jpeg_bytes = 0
+    last_faces = ()
+    start = time.perf_counter()
+    for i in range(count):
+        (d, o, e), last_faces, size = process_frame(detector, frames[i % len(frames)], quality,
+                                                    motion_gate, last_faces)
+        detect.append(d)
+        overlay.append(o)
+        encode.append(e)
+        total.append(d + o + e)
+        faces += len(last_faces)
+        jpeg_bytes += size
+    elapsed = time.perf_counter() - start
+
+    # tracemalloc은 실행 속도를 느리게 하기 때문에 시간 측정과 따로 실행한다.
+    tracemalloc.start()
+    for i in range(memory_frames):
+        process_frame(detector, frames[i % len(frames)], quality)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    results = summarize(total)
+    results.update({
+        'fps': count / elapsed if elapsed else 0.0,
+        'detect_p50_ms': summarize(detect).get('p50_ms'),
+        'overlay_p50_ms': summarize(overlay).get('p50_ms'),
+        'encode_p50_ms': summarize(encode).get('p50_ms'),
+        'faces_per_frame': faces / count if count else 0.0,
+        'jpeg_kb': jpeg_bytes / count / 1024 if count else 0.0,
+        'peak_memory_kb': peak / 1024,
+    })
+    if motion_gate is not None:
+        results['skip_ratio'] = motion_gate.skip_ratio
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Face detect, overlay and JPEG encode benchmark')
+    parser.add_argument('--resolution', action='append', help='WIDTHxHEIGHT (repeatable)')
+    parser.add_argument('--face-image', default=None,
+                        help='photo of a face to paste into synthetic frames')
+    parser.add_argument('--clip', action='append', default=[],
+                        help='recorded video readable by OpenCV (repeatable)')
+    parser.add_argument('--frames', type=int, default=200, help='frames per run')
+    parser.add_argument('--memory-frames', type=int, default=20,
+                        help='frames to run under tracemalloc for peak memory')
+    parser.add_argument('--quality', type=int, default=DEFAULT_JPEG_QUALITY)
+    parser.add_argument('--detector', action='append', choices=sorted(FACE_DETECTORS),
+                        help='face detector (repeatable, default : config.FACE_DETECTOR)')
+    parser.add_argument('--motion-gate', action='store_true',
+                        help='skip detection on frames that did not change (reports skip_ratio)')
+    parser.add_argument('--output', default=None, help='save results as json')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, stream=sys.stdout)
+
+    detectors = {}
+    for name in args.detector or [config.FACE_DETECTOR]:
+        # config.FACE_DETECTOR_OPTIONS는 config에서 선택한 얼굴인식에만 적용한다.
+        options = config.FACE_DETECTOR_OPTIONS if name == config.FACE_DETECTOR else {}
+        try:
+            detectors[name] = create_face_detector(name, **options).load()
+        except Exception as ex:
+            parser.error(f'Cannot load face detector {name} : {ex} (run from the project root)')
+    face_image = None
+    if args.face_image:
+        face_image = cv.imread(args.face_image)
+        if face_image is None:
+            parser.error(f'Cannot read {args.face_image}')
+
+    results = {}
+    for resolution in args.resolution or DEFAULT_RESOLUTIONS:
+        width, height = parse_resolution(resolution)
+        sources = {'synthetic': synthetic_frames(width, height),
+                   'hover': hover_frames(width, height, face_image)}
+        if face_image is not None:
+            sources['synthetic_face'] = synthetic_frames(width, height, face_image)
+        for path in args.clip:
+            sources[os.path.basename(path)] = clip_frames(path, width, height, args.frames)
+
+        for source, frames in sources.items():
+            for detector_name, detector in detectors.items():
+                name = f'{source}@{width}x{height}'
+                if len(detectors) > 1:
+                    name = f'{name}/{detector_name}'
+                results[name] = run(detector, frames, args.frames, args.quality, args.memory_frames,
+                                    args.motion_gate)
+                results[name].update({'source': source, 'width': width, 'height': height,
+                                      'detector': detector_name})
+                print_results(name, results[name])
+    if args.output:
+        save_results(args.output, 'video', results)
+
+
+if __name__ == '__main__':
+    main()
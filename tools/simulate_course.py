@@ -0,0 +1,47 @@
+import argparse
+import json
+import logging
+import sys
+
+from droneapp.models.course import BaseCourse
+import droneapp.models.course
+from droneapp.models.course_simulator import DEFAULT_SHAKE_INTERVAL
+from droneapp.models.course_simulator import simulate_course
+
+# 프로젝트 루트에서 실행 : python -m tools.simulate_course CourseA CourseB --mode shake --shake-interval 0.5
+# 드론 없이 가상의 시간으로 코스를 끝까지 실행하고, 명령어 순서와 걸린 시간, 문제점을 출력한다.
+
+
+def main():
+    courses = {name: value for name, value in vars(droneapp.models.course).items()
+               if isinstance(value, type) and issubclass(value, BaseCourse) and value is not BaseCourse}
+    parser = argparse.ArgumentParser(description='Fast-forward courses against a mock drone')
+    parser.add_argument('courses', nargs='*', help=f'courses to run (default : all of {sorted(courses)})')
+    parser.add_argument('--mode', choices=('timed', 'paced', 'shake'), default='timed')
+    parser.add_argument('--shake-interval', type=float, default=DEFAULT_SHAKE_INTERVAL)
+    parser.add_argument('--json', action='store_true', help='print the full result as JSON')
+    args = parser.parse_args()
+    for name in args.courses:
+        if name not in courses:
+            parser.error(f'unknown course {name}')
+
+    failed = False
+    for name in args.courses or sorted(courses):
+        result = simulate_course(courses[name], args.mode, args.shake_interval)
+        failed = failed or bool(result['errors'])
+        if args.json:
+            print(json.dumps(result, indent=2))
+            continue
+        print(f"{name} ({args.mode}) : {result['duration']:.1f}s")
+        for command in result['commands']:
+            print(f"  {command['time']:7.2f}s  {command['command']:<12} {command['response']}")
+        for late in result['late_steps']:
+            print(f"  late : {late['action']} at {late['at']}s (+{late['late']:.2f}s)")
+        for error in result['errors']:
+            print(f"  error : {error['command']} at {error['time']:.2f}s ({error['reason']})")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING, stream=sys.stdout)
+    sys.exit(main())
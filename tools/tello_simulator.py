@@ -0,0 +1,267 @@
+import argparse
+import logging
+import random
+import socket
+import sys
+import threading
+import time
+
+from droneapp.models.video_ingest import split_nal_units
+
+# 실제 드론(192.168.10.1)이 없어도 DroneManager를 시험하기 위한 가짜 Tello
+# command port : 8889, state port : 8890, video port : 11111 (Tello SDK 문서 기준)
+DEFAULT_COMMAND_PORT = 8889
+DEFAULT_STATE_PORT = 8890
+DEFAULT_VIDEO_PORT = 11111
+
+# Tello는 영상 데이터를 1460 byte 단위로 쪼개서 전송한다.
+VIDEO_PACKET_SIZE = 1460
+DEFAULT_VIDEO_FPS = 30
+
+# state port로 전달하는 주기 (Tello는 약 10Hz)
+STATE_INTERVAL = 0.1
+
+logger = logging.getLogger(__name__)
+
+
+# 실제 드론처럼 명령어에 응답하고 state와 video를 전송하는 클래스
+class TelloSimulator(object):
+    def __init__(self, ip='127.0.0.1', command_port=DEFAULT_COMMAND_PORT,
+                 state_port=DEFAULT_STATE_PORT, video_port=DEFAULT_VIDEO_PORT,
+                 reply_delay=0.0, jitter=0.0, loss=0.0,
+                 video_file=None, video_fps=DEFAULT_VIDEO_FPS, seed=None):
+        self.ip = ip
+        self.command_port = command_port
+        # state와 video는 드론이 명령을 보낸 host의 해당 port로 전달한다.
+        self.state_port = state_port
+        self.video_port = video_port
+
+        # 응답 지연(초), 지연에 더해질 랜덤 흔들림(초), 명령어 유실 확률(0 ~ 1)
+        self.reply_delay = reply_delay
+        self.jitter = jitter
+        self.loss = loss
+        self._random = random.Random(seed)
+
+        self.video_file = video_file
+        self.video_fps = video_fps
+
+        # 드론의 상태값
+        self.battery = 87
+        self.speed = 10
+        # 높이(cm). height?에는 실제 드론처럼 dm로 응답한다.
+        self.height = 0
+        self.is_flying = False
+        self.is_streaming = False
+
+        # 명령을 보낸 host의 주소 (state와 video를 보내기 위해 필요)
+        self.client_address = None
+
+        # 수신한 명령어와 응답하지 않은(유실) 명령어의 수
+        self.received = 0
+        self.dropped = 0
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.settimeout(.5)
+        self.socket.bind((self.ip, self.command_port))
+
+        self.stop_event = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for target in (self._receive_command, self._send_state, self._send_video):
+            thread = threading.Thread(target=target, args=(self.stop_event,))
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+        logger.info({'action': 'start', 'ip': self.ip, 'command_port': self.command_port})
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        for thread in self._threads:
+            thread.join(timeout=2)
+        self.socket.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # 명령어를 받아 실제 드론이 응답할 문자열을 돌려준다.
+    def handle_command(self, command):
+        command = command.strip()
+        name, _, args = command.partition(' ')
+
+        if name.endswith('?'):
+            return self._query(name)
+
+        if name == 'command':
+            return 'ok'
+        if name == 'streamon':
+            self.is_streaming = True
+            return 'ok'
+        if name == 'streamoff':
+            self.is_streaming = False
+            return 'ok'
+        if name == 'takeoff':
+            self.is_flying = True
+            self.height = 80
+            return 'ok'
+        if name in ('land', 'emergency'):
+            self.is_flying = False
+            self.height = 0
+            return 'ok'
+        if name == 'speed':
+            try:
+                self.speed = int(float(args))
+            except ValueError:
+                return 'error'
+            return 'ok'
+        if name in ('up', 'down', 'left', 'right', 'forward', 'back',
+                    'cw', 'ccw', 'flip', 'go', 'curve', 'stop'):
+            if name == 'up':
+                self.height += int(args or 0)
+            if name == 'down':
+                self.height = max(0, self.height - int(args or 0))
+            return 'ok'
+        # rc 명령은 실제 드론에서도 응답이 없다.
+        if name == 'rc':
+            return None
+        return 'error'
+
+    def _query(self, name):
+        if name == 'battery?':
+            return str(self.battery)
+        if name == 'speed?':
+            return str(self.speed)
+        if name == 'height?':
+            return f'{self.height // 10}dm'
+        if name == 'time?':
+            return '0s'
+        return 'error'
+
+    def _reply_wait(self):
+        wait = self.reply_delay
+        if self.jitter:
+            wait += self._random.uniform(0, self.jitter)
+        return wait
+
+    def _receive_command(self, stop_event):
+        while not stop_event.is_set():
+            try:
+                data, address = self.socket.recvfrom(1024)
+            except socket.timeout:
+                continue
+            except socket.error as ex:
+                logger.warning({'action': '_receive_command', 'ex': ex})
+                break
+
+            self.received += 1
+            self.client_address = address
+            # 설정한 확률로 명령어를 유실시킨다.
+            if self.loss and self._random.random() < self.loss:
+                self.dropped += 1
+                continue
+
+            response = self.handle_command(data.decode('utf-8', errors='replace'))
+            if response is None:
+                continue
+
+            wait = self._reply_wait()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                self.socket.sendto(response.encode('utf-8'), address)
+            except socket.error as ex:
+                logger.warning({'action': '_receive_command', 'ex': ex})
+
+    def state_packet(self):
+        return (f'pitch:0;roll:0;yaw:0;vgx:0;vgy:0;vgz:0;templ:60;temph:63;'
+                f'tof:{self.height + 10};h:{self.height};bat:{self.battery};baro:0.00;'
+                f'time:0;agx:0.00;agy:0.00;agz:-1000.00;\r\n').encode('utf-8')
+
+    def _send_state(self, stop_event):
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock_state:
+            while not stop_event.wait(STATE_INTERVAL):
+                if self.client_address is None:
+                    continue
+                try:
+                    sock_state.sendto(self.state_packet(),
+                                      (self.client_address[0], self.state_port))
+                except socket.error as ex:
+                    logger.warning({'action': '_send_state', 'ex': ex})
+
+    # H.264 파일을 NAL 단위로 나눈 뒤 Tello처럼 1460 byte씩 잘라서 돌려준다.
+    def video_frames(self):
+        with open(self.video_file, 'rb') as f:
+            units = split_nal_units(f.read())
+        frames = []
+        for unit in units:
+            packets = [unit[i:i + VIDEO_PACKET_SIZE]
+                       for i in range(0, len(unit), VIDEO_PACKET_SIZE)]
+            frames.append(packets)
+        return frames
+
+    def _send_video(self, stop_event):
+        if not self.video_file:
+            return
+        frames = self.video_frames()
+        if not frames:
+            logger.warning({'action': '_send_video', 'status': 'empty', 'file': self.video_file})
+            return
+
+        interval = 1.0 / self.video_fps
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock_video:
+            index = 0
+            next_time = time.monotonic()
+            while not stop_event.is_set():
+                if not self.is_streaming or self.client_address is None:
+                    stop_event.wait(interval)
+                    next_time = time.monotonic()
+                    continue
+
+                address = (self.client_address[0], self.video_port)
+                try:
+                    for packet in frames[index]:
+                        sock_video.sendto(packet, address)
+                except socket.error as ex:
+                    logger.warning({'action': '_send_video', 'ex': ex})
+                # 파일의 끝까지 보냈다면 처음부터 반복해서 전송
+                index = (index + 1) % len(frames)
+
+                next_time += interval
+                wait = next_time - time.monotonic()
+                if wait > 0:
+                    stop_event.wait(wait)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Local stand-in Tello drone')
+    parser.add_argument('--ip', default='127.0.0.1')
+    parser.add_argument('--command-port', type=int, default=DEFAULT_COMMAND_PORT)
+    parser.add_argument('--state-port', type=int, default=DEFAULT_STATE_PORT)
+    parser.add_argument('--video-port', type=int, default=DEFAULT_VIDEO_PORT)
+    parser.add_argument('--delay', type=float, default=0.0, help='reply delay in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='random extra delay in seconds')
+    parser.add_argument('--loss', type=float, default=0.0, help='command loss probability (0-1)')
+    parser.add_argument('--video-file', default=None, help='raw H.264 file to stream')
+    parser.add_argument('--fps', type=float, default=DEFAULT_VIDEO_FPS)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout)
+    simulator = TelloSimulator(ip=args.ip, command_port=args.command_port,
+                               state_port=args.state_port, video_port=args.video_port,
+                               reply_delay=args.delay, jitter=args.jitter, loss=args.loss,
+                               video_file=args.video_file, video_fps=args.fps)
+    simulator.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        simulator.stop()
+
+
+if __name__ == '__main__':
+    main()